@@ -51,7 +51,12 @@ public:
     CM_Hypers get_hypers_i(int idx) const;
     std::set<int> get_row_indices_set() const;
     std::vector<int> get_row_indices_vector() const;
+    int get_row_idx(int position) const;
     std::vector<double> get_draw(int random_seed) const;
+    static ComponentModel *new_component_model(const std::string &col_datatype,
+        const CM_Hypers &hypers);
+    // whether the component models changed since clear_changed was called
+    bool get_changed() const;
     //
     // calculators
     std::vector<double> calc_marginal_logps() const;
@@ -60,7 +65,7 @@ public:
     std::vector<double> calc_hyper_conditionals(int which_col,
         const std::string &which_hyper,
         const std::vector<double> &hyper_grid) const;
-    double calc_column_predictive_logp(const std::vector<double> &column_data,
+    double calc_column_predictive_logp(const ColumnD &column_data,
         const std::string &col_datatype,
         const std::vector<int> &data_global_row_indices,
         const CM_Hypers &hypers);
@@ -68,13 +73,17 @@ public:
     // mutators
     double insert_row(const std::vector<double> &values, int row_idx);
     double remove_row(const std::vector<double> &values, int row_idx);
+    double remove_row(const std::vector<double> &values, int row_idx,
+        int position);
     double remove_col(int col_idx);
-    double insert_col(const std::vector<double> &data,
+    double insert_col(const ColumnD &data,
         const std::string &col_datatype,
         const std::vector<int> &data_global_row_indices,
         const CM_Hypers &hypers);
+    double insert_col(ComponentModel *p_cm);
     double incorporate_hyper_update(int which_col);
     void delete_component_models(bool check_empty = true);
+    void clear_changed();
     //
     // helpers
     friend std::ostream &operator<<(std::ostream &os, const Cluster &c);
@@ -85,8 +94,10 @@ public:
     std::vector<ComponentModel *> p_model_v;
 private:
     double score;
+    bool changed;
     void init_columns(const std::vector<CM_Hypers *> &hypers_v);
-    std::set<int> row_indices;
+    // unordered; a row's position changes when another row is removed
+    std::vector<int> row_indices;
 };
 
 #endif // GUARD_cluster_h
@@ -50,6 +50,9 @@ public:
     virtual double calc_element_predictive_logp(double element) const = 0;
     virtual double calc_element_predictive_logp_constrained(double element,
         const std::vector<double> &constraints) const = 0;
+    virtual std::vector<double> calc_element_predictive_logps_constrained(
+        const std::vector<double> &elements,
+        const std::vector<double> &constraints) const = 0;
     virtual std::vector<double> calc_hyper_conditionals(
         const std::string &which_hyper,
         const std::vector<double> &hyper_grid) const = 0;
@@ -36,6 +36,8 @@ public:
     // getters
     void get_suffstats(int &count_out, double &sum_x, double &sum_x_sq) const;
     void get_hyper_doubles(double &r, double &nu, double &s, double &mu) const;
+    void get_predictive_constants(double &mu, double &r_ratio, double &s,
+        double &exponent, double &log_const) const;
     std::map<std::string, double> get_hypers() const;
     std::map<std::string, double> get_suffstats() const;
     std::map<std::string, double> _get_suffstats() const;
@@ -50,6 +52,9 @@ public:
     double calc_element_predictive_logp(double element) const;
     double calc_element_predictive_logp_constrained(double element,
         const std::vector<double> &constraints) const;
+    std::vector<double> calc_element_predictive_logps_constrained(
+        const std::vector<double> &elements,
+        const std::vector<double> &constraints) const;
     std::vector<double> calc_hyper_conditionals(const std::string &which_hyper,
         const std::vector<double> &hyper_grid) const;
     //
@@ -68,6 +73,14 @@ private:
     double hyper_nu;
     double hyper_s;
     double hyper_mu;
+    // posterior predictive (Student-t) constants; they only change when
+    // the suffstats or hypers do, so they are recomputed then
+    double predictive_mu;
+    double predictive_r_ratio;
+    double predictive_s;
+    double predictive_exponent;
+    double predictive_log_const;
+    void set_predictive_constants();
 };
 
 #endif // GUARD_continuouscomponentmodel_h
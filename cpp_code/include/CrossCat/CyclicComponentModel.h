@@ -51,6 +51,9 @@ public:
     double calc_element_predictive_logp(double element) const;
     double calc_element_predictive_logp_constrained(double element,
         const std::vector<double> &constraints) const;
+    std::vector<double> calc_element_predictive_logps_constrained(
+        const std::vector<double> &elements,
+        const std::vector<double> &constraints) const;
     std::vector<double> calc_hyper_conditionals(const std::string &which_hyper,
         const std::vector<double> &hyper_grid) const;
     //
@@ -23,7 +23,36 @@
 #include <algorithm>
 #include <limits>
 #include <stdexcept>
+#include <vector>
 
+// A read-only view of a strided sequence of elements, such as one column of
+// a row-major matrix.  It does not own the elements, which must outlive it.
+template<typename T>
+class strided_view
+{
+public:
+    strided_view(const T *data, size_t size, size_t stride = 1)
+        : _data(data), _size(size), _stride(stride) {}
+    // implicit, so that a vector can be passed where a view is expected
+    strided_view(const std::vector<T> &v)
+        : _data(v.empty() ? 0 : &v[0]), _size(v.size()), _stride(1) {}
+    size_t size() const
+    {
+        return _size;
+    }
+    const T &operator[](size_t i) const
+    {
+        return _data[i * _stride];
+    }
+private:
+    const T *_data;
+    size_t _size;
+    size_t _stride;
+};
+
+// A row-major matrix.  It owns its elements, unless it was made to borrow
+// the row-major elements of a buffer that must outlive it.  Copies always
+// own their elements.
 template<typename T>
 class matrix
 {
@@ -36,9 +65,10 @@ public:
     {
         return _ncols;
     }
-    matrix() : _nrows(0), _ncols(0), _data(0) {}
+    matrix() : _nrows(0), _ncols(0), _data(0), _owner(true) {}
     matrix(size_t nrows, size_t ncols)
-        : _nrows(nrows), _ncols(ncols), _data(new T[nrows * ncols])
+        : _nrows(nrows), _ncols(ncols), _data(new T[nrows * ncols]),
+          _owner(true)
     {
         if (nrows > std::numeric_limits<size_t>::max() / ncols) {
             T *d = _data;
@@ -49,12 +79,16 @@ public:
             throw std::bad_alloc();
         }
     }
+    // borrow data, without copying it
+    matrix(size_t nrows, size_t ncols, T *data)
+        : _nrows(nrows), _ncols(ncols), _data(data), _owner(false) {}
     matrix(const matrix &m)
     {
         size_t i;
         _nrows = m._nrows;
         _ncols = m._ncols;
         _data = new T[_nrows * _ncols];
+        _owner = true;
         for (i = 0; i < _nrows * _ncols; i++) {
             _data[i] = m._data[i];
         }
@@ -64,11 +98,12 @@ public:
         std::swap(_nrows, m._nrows);
         std::swap(_ncols, m._ncols);
         std::swap(_data, m._data);
+        std::swap(_owner, m._owner);
         return *this;
     }
     ~matrix()
     {
-        if (_data) {
+        if (_data && _owner) {
             delete[] _data;
         }
     }
@@ -92,12 +127,21 @@ public:
         }
         return _data[row * _ncols + col];
     }
+    strided_view<T> column(size_t col) const
+    {
+        if (_ncols <= col) {
+            throw std::range_error("column out of range");
+        }
+        return strided_view<T>(_data + col, _nrows, _ncols);
+    }
 private:
     size_t _nrows;
     size_t _ncols;
     T *_data;
+    bool _owner;
 };
 
 typedef matrix<double> MatrixD;
+typedef strided_view<double> ColumnD;
 
 #endif // GUARD_CrossCat_Matrix_h
@@ -37,6 +37,9 @@ public:
     void get_suffstats(int &count_out,
         std::map<std::string, double> &counts) const;
     std::map<std::string, double> _get_suffstats() const;
+    const std::vector<int> &get_label_counts() const;
+    const std::vector<double> &get_log_numerators() const;
+    double get_log_denominator() const;
     std::map<std::string, double> get_hypers() const;
     void get_keys_counts_for_draw(std::vector<int> &keys,
         std::vector<double> &log_counts_for_draw,
@@ -50,6 +53,9 @@ public:
     double calc_element_predictive_logp(double element) const;
     double calc_element_predictive_logp_constrained(double element,
         const std::vector<double> &constraints) const;
+    std::vector<double> calc_element_predictive_logps_constrained(
+        const std::vector<double> &elements,
+        const std::vector<double> &constraints) const;
     std::vector<double> calc_hyper_conditionals(const std::string &which_hyper,
         const std::vector<double> &hyper_grid) const;
     //
@@ -64,6 +70,11 @@ private:
     std::vector<int> suffstats;
     int hyper_K;
     double hyper_dirichlet_alpha;
+    // log(dirichlet_alpha + suffstats[i]) and log(count + K * dirichlet_alpha),
+    // the terms of the predictive logp, kept in step with the suffstats
+    std::vector<double> log_numerators;
+    double log_denominator;
+    void set_predictive_constants();
 };
 
 #endif // GUARD_multinomialcomponentmodel_h
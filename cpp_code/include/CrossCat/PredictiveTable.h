@@ -0,0 +1,99 @@
+/*
+ *   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+ *
+ *   Lead Developers: Dan Lovell and Jay Baxter
+ *   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+ *   Research Leads: Vikash Mansinghka, Patrick Shafto
+ *
+ *   Licensed under the Apache License, Version 2.0 (the "License");
+ *   you may not use this file except in compliance with the License.
+ *   You may obtain a copy of the License at
+ *
+ *       http://www.apache.org/licenses/LICENSE-2.0
+ *
+ *   Unless required by applicable law or agreed to in writing, software
+ *   distributed under the License is distributed on an "AS IS" BASIS,
+ *   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ *   See the License for the specific language governing permissions and
+ *   limitations under the License.
+ */
+#ifndef GUARD_predictivetable_h
+#define GUARD_predictivetable_h
+
+#include <string>
+#include <vector>
+#include "utils.h"
+#include "Cluster.h"
+
+/**
+ * The predictive constants of a view's clusters, in typed arrays indexed by
+ * [column][slot], one set of arrays per column of each datatype.  A row is
+ * scored against every slot column by column, each column in one loop over
+ * contiguous arrays with no virtual calls.  The slots are filled from
+ * Clusters by set_slot, and must be refilled when a cluster changes.
+ */
+class PredictiveTable
+{
+public:
+    PredictiveTable();
+    //
+    // getters
+    int get_num_cols() const;
+    int get_num_slots() const;
+    //
+    // calculators
+    /**
+     * Add the predictive logp of each value of vd, under the model of its
+     * column in each slot, to logps, which must have one entry per slot.
+     * Missing values add nothing.
+     */
+    void add_row_predictive_logps(const std::vector<double> &vd,
+        std::vector<double> &logps) const;
+    //
+    // mutators
+    /**
+     * Lay out one set of arrays for each column of datatypes, with no slots.
+     * hypers_v holds each column's hypers.
+     */
+    void set_columns(const std::vector<std::string> &datatypes,
+        const std::vector<CM_Hypers *> &hypers_v);
+    void resize(int num_slots);
+    void set_slot(int slot, const Cluster &cluster);
+private:
+    // each column's datatype, and its index among the columns of that type
+    std::vector<std::string> datatypes;
+    std::vector<int> typed_col_idxs;
+    int num_slots;
+    //
+    // see ContinuousComponentModel::get_predictive_constants
+    struct ContinuousColumn {
+        std::vector<double> mu;
+        std::vector<double> r_ratio;
+        std::vector<double> s;
+        std::vector<double> exponent;
+        std::vector<double> log_const;
+    };
+    // see MultinomialComponentModel::get_log_numerators
+    struct MultinomialColumn {
+        int K;
+        // indexed by [slot * K + value]
+        std::vector<double> log_numerators;
+        std::vector<double> log_denominator;
+    };
+    // see numerics::calc_cyclic_data_logp: the terms that don't depend on
+    // the element
+    struct CyclicColumn {
+        std::vector<double> kappa;
+        std::vector<double> sum_sin_x;
+        std::vector<double> sum_cos_x;
+        std::vector<double> a_sin_b;
+        std::vector<double> a_cos_b;
+        std::vector<double> log_base;
+        std::vector<double> log_Z_n;
+    };
+    std::vector<ContinuousColumn> continuous_columns;
+    std::vector<MultinomialColumn> multinomial_columns;
+    std::vector<CyclicColumn> cyclic_columns;
+};
+
+#endif // GUARD_predictivetable_h
@@ -164,6 +164,10 @@ public:
      * \return The column indices in each column partition
      */
     std::map<int, std::vector<int> > get_column_groups() const;
+    /**
+     * \return The number of threads row partition transitions run on
+     */
+    int get_num_threads() const;
     /**
      * \return A uniform random draw from [0, 1] using the state's rng
      */
@@ -224,6 +228,13 @@ public:
     //
     // mutators
     //
+    /**
+     * Set the number of threads row partition transitions run on.  With more
+     * than one thread, rows are reassigned in small blocks whose members are
+     * scored in parallel (see View::transition_zs); results are reproducible
+     * for a given seed and number of threads.
+     */
+    void set_num_threads(int num_threads);
     /**
      * Insert feature_data into the view specified by which_view.  feature_idx
      * is the column index to associate with it
@@ -233,7 +244,7 @@ public:
      * \return The delta in the state's marginal log probability
      */
     double insert_feature(int feature_idx,
-        const std::vector<double> &feature_data,
+        const ColumnD &feature_data,
         View &which_view);
     /**
      * Gibbs sample which view to insert the feature into.
@@ -243,7 +254,7 @@ public:
      *        Deleted internally if not used.
      */
     double sample_insert_feature(int feature_idx,
-        const std::vector<double> &feature_data,
+        const ColumnD &feature_data,
         View &singleton_view);
     /**
      * Gibbs sample which view to insert the feature block into.
@@ -254,7 +265,7 @@ public:
      */
     double sample_insert_feature_block(
         const std::vector<int> &feature_idxs,
-        const std::vector<std::vector<double> > &feature_datas,
+        const std::vector<ColumnD> &feature_datas,
         View &singleton_view);
     /**
      * Remove a feature from the state.
@@ -265,7 +276,7 @@ public:
      *        Necesary to pass out for determining the marginal log probability delta
      */
     double remove_feature(int feature_idx,
-        const std::vector<double> &feature_data,
+        const ColumnD &feature_data,
         View *&p_singleton_view);
     /**
      * Remove a feature from the state.
@@ -274,14 +285,14 @@ public:
      */
     double remove_feature(
         int feature_idx,
-        const std::vector<double> &feature_data);
+        const ColumnD &feature_data);
     /**
      * Gibbs sample a feature among the views, possibly creating a new view
      * \param feature_idx The column index that the view should associaate with the data
      * \param feature_data The data that comprises the feature
      */
     double transition_feature_gibbs(int feature_idx,
-        const std::vector<double> &feature_data);
+        const ColumnD &feature_data);
     /**
      * Gibbs sample a block of dependent features among the views, possibly creating a new view
      * \param feature_idxs The column indexes that the view should associate with the data
@@ -289,7 +300,7 @@ public:
      */
     double transition_feature_block_gibbs(
         const std::vector<int> &feature_idxs,
-        const std::vector<std::vector<double> > &feature_datas);
+        const std::vector<ColumnD> &feature_datas);
     /**
      * Helper for transition_feature_mh
      * \param feature_idx The column index that the view should associaate with the data
@@ -297,7 +308,7 @@ public:
      * \param proposed_view The view to propose jumping to
      */
     double mh_choose(int feature_idx,
-        const std::vector<double> &feature_data,
+        const ColumnD &feature_data,
         View &proposed_view);
     double get_proposal_logp(View &proposed_view);
     double get_proposal_log_ratio(View &from_view, View &to_view);
@@ -307,7 +318,7 @@ public:
      * \param feature_data The data that comprises the feature
      */
     double transition_feature_mh(int feature_idx,
-        const std::vector<double> &feature_data);
+        const ColumnD &feature_data);
     /**
      * Instantiate a new view object with properties matching the state
      * (datatypes, #rows, etc) and track in memeber variable views
@@ -328,8 +339,7 @@ public:
     /**
      * Stale function: don't use
      */
-    double transition_view_i(int which_view,
-        const std::map<int, std::vector<double> > &row_data_map);
+    double transition_view_i(int which_view);
     /**
      * Stale function: don't use
      */
@@ -400,7 +410,7 @@ public:
      * \return The probability of feature data under row partition of a particular view
      */
     double calc_feature_view_data_logp(
-        const std::vector<double> &col_data,
+        const ColumnD &col_data,
         const std::string &col_datatype,
         const View &v,
         const CM_Hypers &hypers,
@@ -409,13 +419,13 @@ public:
      * \return The probability of feature data under row partition of each view.
      */
     std::vector<double> calc_feature_view_data_logps(
-        const std::vector<double> &col_data,
+        const ColumnD &col_data,
         const int &global_col_idx) const;
     /**
      * \return The predictive log likelihood of a feature belonging to a particular view
      */
     double calc_feature_view_predictive_logp(
-        const std::vector<double> &col_data,
+        const ColumnD &col_data,
         const std::string &col_datatype,
         const View &v,
         double &crp_log_delta,
@@ -426,14 +436,14 @@ public:
      * \return The predictive log likelihoods of a feature belonging to each view
      */
     std::vector<double> calc_feature_view_predictive_logps(
-        const std::vector<double> &col_data,
+        const ColumnD &col_data,
         int global_col_idx) const;
     /**
      * \return The predictive log likelihoods of a feature block belonging to each view.
      */
     std::vector<double> calc_feature_view_predictive_logps_block(
         const std::vector<int> &feature_idxs,
-        const std::vector<std::vector<double> > &feature_datas) const;
+        const std::vector<ColumnD> &feature_datas) const;
     /**
      * \return The predictive log likelihood of a row having been generated by this state
      */
@@ -491,7 +501,15 @@ private:
     std::map<int, View *> view_lookup; // global_column_index to View mapping
     // sub-objects
     RandomNumberGenerator rng;
+    ThreadPool *thread_pool;
     // resources
+    /**
+     * Gibbs sample the row assignments of every view, across views in
+     * parallel if there is a thread pool and more than one view.
+     * \param which_rows The rows to sample, in order, or NULL for all rows
+     *        in each view's own shuffled order
+     */
+    double transition_views_zs(const std::vector<int> *which_rows);
     void increment_num_cols_effective();
     void decrement_num_cols_effective();
     void construct_base_hyper_grids(const matrix<double> &
@@ -518,6 +536,8 @@ private:
     void init_base_hypers();
     CM_Hypers uniform_sample_hypers(int global_col_idx);
     void init_column_hypers(const std::vector<int> &global_col_indices);
+    void copy_feature_data(const MatrixD &data, int feature_idx,
+        std::vector<double> &feature_data) const;
     void init_views(const MatrixD &data,
         const std::vector<int> &global_row_indices,
         const std::vector<int> &global_col_indices,
@@ -0,0 +1,79 @@
+/*
+ *   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+ *
+ *   Lead Developers: Dan Lovell and Jay Baxter
+ *   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+ *   Research Leads: Vikash Mansinghka, Patrick Shafto
+ *
+ *   Licensed under the Apache License, Version 2.0 (the "License");
+ *   you may not use this file except in compliance with the License.
+ *   You may obtain a copy of the License at
+ *
+ *       http://www.apache.org/licenses/LICENSE-2.0
+ *
+ *   Unless required by applicable law or agreed to in writing, software
+ *   distributed under the License is distributed on an "AS IS" BASIS,
+ *   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ *   See the License for the specific language governing permissions and
+ *   limitations under the License.
+ */
+#ifndef GUARD_threadpool_h
+#define GUARD_threadpool_h
+
+#include <pthread.h>
+#include <vector>
+#include "utils.h"
+
+/**
+ * A unit of work split into independent tasks.  run(task_idx) is called once
+ * for each task_idx in [0, num_tasks), possibly concurrently, so it may only
+ * write to state private to task_idx.
+ */
+class ParallelTask
+{
+public:
+    virtual ~ParallelTask() {};
+    virtual void run(int task_idx) = 0;
+};
+
+/**
+ * A fixed set of threads that ParallelTasks are run on.  The calling thread
+ * takes part in the work, so a pool of num_threads spawns num_threads - 1
+ * workers and a pool of one thread runs everything inline.
+ */
+class ThreadPool
+{
+public:
+    ThreadPool(int num_threads);
+    ~ThreadPool();
+    //
+    // getters
+    int get_num_threads() const;
+    //
+    // mutators
+    /**
+     * Run task for each index in [0, num_tasks) and return once all are done.
+     * Must not be called from within a task.
+     */
+    void run(ParallelTask &task, int num_tasks);
+private:
+    DISALLOW_COPY_AND_ASSIGN(ThreadPool);
+    static void *worker_main(void *p_pool);
+    void work_loop();
+    void drain_tasks();
+    //
+    int num_threads;
+    std::vector<pthread_t> workers;
+    pthread_mutex_t mutex;
+    pthread_cond_t work_available;
+    pthread_cond_t work_done;
+    // the current batch, guarded by mutex
+    ParallelTask *current_task;
+    int num_tasks;
+    int next_task_idx;
+    int num_tasks_done;
+    unsigned long batch_idx;
+    bool shutting_down;
+};
+
+#endif // GUARD_threadpool_h
@@ -21,6 +21,7 @@
 #define GUARD_view_h
 
 
+#include <deque>
 #include <string>
 #include <map>
 #include <vector>
@@ -32,6 +33,8 @@
 #include "Cluster.h"
 #include "Matrix.h"
 #include "numerics.h"
+#include "PredictiveTable.h"
+#include "ThreadPool.h"
 
 class Cluster;
 
@@ -108,6 +111,8 @@ public:
     std::vector<std::vector<std::map<std::string, double> > > \
     get_column_component_suffstats() const;
     std::vector<int> get_global_col_indices();
+    std::vector<double> get_row_data(int row_idx) const;
+    const std::vector<double> &get_column_data(int global_col_idx) const;
     std::vector<double> get_draw(int row_idx, int random_seed) const;
     //
     // getters (internal use)
@@ -126,9 +131,8 @@ public:
     std::vector<double> calc_hyper_conditionals(int which_col,
         const std::string &which_hyper,
         const std::vector<double> &hyper_grid) const;
-    double calc_column_predictive_logp(const std::vector<double> &column_data,
+    double calc_column_predictive_logp(const ColumnD &column_data,
         const std::string &col_datatype,
-        const std::vector<int> &data_global_row_indices,
         const CM_Hypers &hypers) const;
     //
     // mutators
@@ -143,7 +147,7 @@ public:
     double insert_row(const std::vector<double> &vd, int row_idx);
     double remove_row(const std::vector<double> &vd, int row_idx);
     double remove_col(int global_col_idx);
-    double insert_col(const std::vector<double> &col_data,
+    double insert_col(const ColumnD &col_data,
         const std::vector<int> &data_global_row_indices,
         int global_col_idx,
         CM_Hypers &hypers);
@@ -154,7 +158,9 @@ public:
     void remove_if_empty(Cluster &which_cluster);
     void remove_all();
     double transition_z(const std::vector<double> &vd, int row_idx);
-    double transition_zs(const std::map<int, std::vector<double> > &row_data_map);
+    double transition_zs(ThreadPool *thread_pool = NULL);
+    double transition_zs(const std::vector<int> &which_rows,
+        ThreadPool *thread_pool = NULL);
     double transition_crp_alpha();
     double set_hyper(int which_col, const std::string &which_hyper,
         double new_value);
@@ -163,14 +169,16 @@ public:
     double transition_hyper_i(int which_col, const std::string &which_hyper);
     double transition_hypers_i(int which_col);
     double transition_hypers();
-    double transition(const std::map<int, std::vector<double> > &row_data_map);
+    double transition();
     void increment_num_cols_effective();
     void decrement_num_cols_effective();
     //
     // data structures
     std::vector<Cluster *> clusters;
-    std::map<int, Cluster *> cluster_lookup;
+    // indexed by row; NULL while a row is not assigned to a cluster
+    std::vector<Cluster *> cluster_lookup;
     std::vector<CM_Hypers *> hypers_v;
+    std::vector<std::string> datatypes_v;
     //
     // helper functions
     std::vector<double> align_data(const std::vector<double> &values,
@@ -184,6 +192,7 @@ public:
         bool top_level = false) const;
     void print();
     void print_score_matrix();
+    friend class RowBlockScoringTask;
     // void assert_state_consistency();
     // double score_test_set(const std::vector<std::vector<double> >& test_set) const;
     //
@@ -208,6 +217,23 @@ private:
     std::map<int, std::vector<double> > vm_kappa_grids;
     // sub-objects
     RandomNumberGenerator rng;
+    // data of the view's columns, one vector per column in local column
+    // order, each indexed by row; a deque, so that adding a column never
+    // copies the others
+    std::deque<std::vector<double> > column_data;
+    int num_data_rows;
+    // indexed by row: the row's position in its cluster's row_indices
+    std::vector<int> cluster_positions;
+    int num_vectors;
+    // a cluster with no rows and one model per column, for scoring rows
+    // against a new cluster; rebuilt when the columns change
+    Cluster empty_cluster;
+    // the predictive constants of each cluster, in clusters' order, and of
+    // empty_cluster, in the last slot; the clusters each slot was filled
+    // from, so that only the slots of changed clusters are refilled
+    PredictiveTable predictive_table;
+    std::vector<const Cluster *> table_clusters;
+    bool predictive_table_stale;
     // resources
     double draw_rand_u();
     int draw_rand_i(int max);
@@ -215,6 +241,15 @@ private:
     void construct_base_hyper_grids(int num_rows);
     void construct_column_hyper_grid(const std::vector<double> &col_data,
         int gobal_col_idx);
+    void copy_row_data(int row_idx, std::vector<double> &vd) const;
+    void set_row_data(const std::vector<double> &vd, int row_idx);
+    std::vector<ComponentModel *> new_column_models(const ColumnD &col_data,
+        const std::string &col_datatype, const CM_Hypers &hypers) const;
+    double transition_zs_blocked(const std::vector<int> &which_rows,
+        ThreadPool &thread_pool);
+    void refresh_predictive_table();
+    std::vector<double> calc_table_predictive_logps(
+        const std::vector<double> &vd) const;
     /* CM_Hypers data_hypers; */
 };
 
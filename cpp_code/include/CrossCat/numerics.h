@@ -51,6 +51,10 @@ double log_bessel_0(double x); // log I_0(x)
 
 double logaddexp(const std::vector<double> &logs);
 
+// log(n) and lgamma(n) of non-negative integer counts, from tables
+double log_count(int n);
+double lgamma_count(int n);
+
 // sampling given vector of logps or related
 int draw_sample_unnormalized(const std::vector<double> &unorm_logps,
     double rand_u);
@@ -62,11 +66,16 @@ int crp_draw_sample(const std::vector<int> &counts, int sum_counts,
 // crp probability functions
 double calc_cluster_crp_logp(double cluster_weight, double sum_weights,
     double alpha);
+std::vector<double> calc_cluster_crp_logps(const std::vector<int> &counts,
+    int sum_counts, double alpha);
 double calc_crp_alpha_conditional(const std::vector<int> &counts, double alpha,
     int sum_counts = -1, bool absolute = false);
 std::vector<double> calc_crp_alpha_conditionals(const std::vector<double> &grid,
     const std::vector<int> &counts,
     bool absolute = false);
+std::vector<double> calc_crp_alpha_conditionals(const std::vector<double> &grid,
+    const std::vector<int> &counts,
+    int sum_counts, bool absolute);
 
 // continuous suffstats functions
 //
@@ -123,6 +132,13 @@ std::vector<double> calc_continuous_mu_conditionals(
     double r,
     double nu,
     double s);
+std::vector<double> calc_continuous_hyper_conditionals(
+    const std::string &which_hyper,
+    const std::vector<double> &hyper_grid,
+    const std::vector<int> &counts,
+    const std::vector<double> &sum_xs,
+    const std::vector<double> &sum_x_sqs,
+    double r, double nu, double s, double mu);
 
 // multinomial suffstats functions
 //
@@ -142,6 +158,11 @@ std::vector<double> calc_multinomial_dirichlet_alpha_conditional(
     int count,
     const std::vector<int> &counts,
     int K);
+std::vector<double> calc_multinomial_dirichlet_alpha_conditionals(
+    const std::vector<double> &dirichlet_alpha_grid,
+    const std::vector<int> &counts,
+    const std::vector<int> &label_counts,
+    int K);
 
 // cyclic component model functions
 //
@@ -163,6 +184,13 @@ double calc_cyclic_data_logp(int count,
     double sum_sin_x, double sum_cos_x,
     double kappa, double a, double b,
     double el);
+std::vector<double> calc_cyclic_hyper_conditionals(
+    const std::string &which_hyper,
+    const std::vector<double> &hyper_grid,
+    const std::vector<int> &counts,
+    const std::vector<double> &sum_sin_xs,
+    const std::vector<double> &sum_cos_xs,
+    double kappa, double a, double b);
 
 std::vector<double> calc_cyclic_a_conditionals(
     const std::vector<double> &a_grid,
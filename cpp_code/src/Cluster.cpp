@@ -17,6 +17,7 @@
 *   See the License for the specific language governing permissions and
 *   limitations under the License.
 */
+#include <algorithm>
 #include <cstdlib>
 #include "Cluster.h"
 
@@ -43,6 +44,12 @@ void Cluster::delete_component_models(bool check_empty)
         p_model_v.pop_back();
         delete p_cm;
     }
+    changed = true;
+}
+
+void Cluster::clear_changed()
+{
+    changed = false;
 }
 
 int Cluster::get_num_cols() const
@@ -72,12 +79,24 @@ CM_Hypers Cluster::get_hypers_i(int idx) const
 
 set<int> Cluster::get_row_indices_set() const
 {
-    return row_indices;
+    return set<int>(row_indices.begin(), row_indices.end());
 }
 
 vector<int> Cluster::get_row_indices_vector() const
 {
-    return set_to_vector(row_indices);
+    vector<int> sorted_row_indices = row_indices;
+    std::sort(sorted_row_indices.begin(), sorted_row_indices.end());
+    return sorted_row_indices;
+}
+
+int Cluster::get_row_idx(int position) const
+{
+    return row_indices[position];
+}
+
+bool Cluster::get_changed() const
+{
+    return changed;
 }
 
 vector<double> Cluster::get_draw(int random_seed) const
@@ -131,13 +150,9 @@ vector<double> Cluster::calc_hyper_conditionals(int which_col,
     return hyper_conditionals;
 }
 
-double Cluster::calc_column_predictive_logp(const vector<double> &column_data,
-    const string &col_datatype,
-    const vector<int> &data_global_row_indices,
+ComponentModel *Cluster::new_component_model(const string &col_datatype,
     const CM_Hypers &hypers)
 {
-    // FIXME: global_to_data must be used if not all rows are present
-    // map<int, int> global_to_data = construct_lookup_map(data_global_row_indices);
     ComponentModel *p_cm = NULL;
     if (col_datatype == CONTINUOUS_DATATYPE) {
         p_cm = new ContinuousComponentModel(hypers);
@@ -146,13 +161,26 @@ double Cluster::calc_column_predictive_logp(const vector<double> &column_data,
     } else if (col_datatype == MULTINOMIAL_DATATYPE) {
         p_cm = new MultinomialComponentModel(hypers);
     } else {
-        cout << "Cluster::calc_column_predictive_logp: col_datatype=" << col_datatype
+        cout << "Cluster::new_component_model: col_datatype=" << col_datatype
             << endl;
         assert(1 == 0);
         exit(EXIT_FAILURE);
     }
-    set<int>::const_iterator it;
-    for (it = row_indices.begin(); it != row_indices.end(); ++it) {
+    return p_cm;
+}
+
+double Cluster::calc_column_predictive_logp(const ColumnD &column_data,
+    const string &col_datatype,
+    const vector<int> &data_global_row_indices,
+    const CM_Hypers &hypers)
+{
+    // FIXME: global_to_data must be used if not all rows are present
+    // map<int, int> global_to_data = construct_lookup_map(data_global_row_indices);
+    ComponentModel *p_cm = new_component_model(col_datatype, hypers);
+    // insert in row order so the suffstats don't depend on membership order
+    vector<int> sorted_row_indices = get_row_indices_vector();
+    vector<int>::const_iterator it;
+    for (it = sorted_row_indices.begin(); it != sorted_row_indices.end(); ++it) {
         int global_row_idx = *it;
         // FIXME: global_to_data must be used if not all rows are present
         // int data_idx = global_to_data[global_row_idx];
@@ -168,14 +196,9 @@ double Cluster::calc_column_predictive_logp(const vector<double> &column_data,
 double Cluster::insert_row(const vector<double> &values, int row_idx)
 {
     double sum_score_deltas = 0;
-    // track row indices
-    pair<set<int>::iterator, bool> set_pair = \
-        row_indices.insert(row_idx);
-    if (!set_pair.second) {
-        cout << "Cluster::insert_row: !set_pair.second" << endl;
-        assert(set_pair.second);
-        exit(EXIT_FAILURE);
-    }
+    // track row indices; the caller must not insert a row twice
+    row_indices.push_back(row_idx);
+    changed = true;
     // track score
     for (unsigned int col_idx = 0; col_idx < values.size(); col_idx++) {
         sum_score_deltas += p_model_v[col_idx]->insert_element(values[col_idx]);
@@ -186,14 +209,26 @@ double Cluster::insert_row(const vector<double> &values, int row_idx)
 
 double Cluster::remove_row(const vector<double> &values, int row_idx)
 {
-    double sum_score_deltas = 0;
-    // track row indices
-    unsigned int num_removed = row_indices.erase(row_idx);
-    if (num_removed == 0) {
-        cout << "Cluster::remove_row: num_removed==0" << endl;
-        assert(num_removed != 0);
+    vector<int>::iterator it = std::find(row_indices.begin(),
+            row_indices.end(), row_idx);
+    if (it == row_indices.end()) {
+        cout << "Cluster::remove_row: row_idx not found" << endl;
+        assert(it != row_indices.end());
         exit(EXIT_FAILURE);
     }
+    return remove_row(values, row_idx, it - row_indices.begin());
+}
+
+// position is where row_idx is in row_indices; the last row is moved there
+double Cluster::remove_row(const vector<double> &values, int row_idx,
+    int position)
+{
+    double sum_score_deltas = 0;
+    // track row indices
+    assert(row_indices[position] == row_idx);
+    row_indices[position] = row_indices.back();
+    row_indices.pop_back();
+    changed = true;
     // track score
     for (unsigned int col_idx = 0; col_idx < values.size(); col_idx++) {
         double value_to_remove = values[col_idx];
@@ -212,29 +247,22 @@ double Cluster::remove_col(int col_idx)
     p_model_v.erase(p_model_v.begin() + col_idx);
     delete p_cm;
     score -= score_delta;
+    changed = true;
     return score_delta;
 }
 
-double Cluster::insert_col(const vector<double> &data,
+double Cluster::insert_col(const ColumnD &data,
     const string &col_datatype,
     const vector<int> &data_global_row_indices,
     const CM_Hypers &hypers)
 {
     // FIXME: global_to_data must be used if not all rows are present
     // map<int, int> global_to_data = construct_lookup_map(data_global_row_indices);
-    ComponentModel *p_cm = NULL;
-    if (col_datatype == CONTINUOUS_DATATYPE) {
-        p_cm = new ContinuousComponentModel(hypers);
-    } else if (col_datatype == MULTINOMIAL_DATATYPE) {
-        p_cm = new MultinomialComponentModel(hypers);
-    } else if (col_datatype == CYCLIC_DATATYPE) {
-        p_cm = new CyclicComponentModel(hypers);
-    } else {
-        cout << "ERROR: Cluster::insert_col: col_datatype=" << col_datatype << endl;
-        abort();
-    }
-    set<int>::const_iterator it;
-    for (it = row_indices.begin(); it != row_indices.end(); ++it) {
+    ComponentModel *p_cm = new_component_model(col_datatype, hypers);
+    // insert in row order so the suffstats don't depend on membership order
+    vector<int> sorted_row_indices = get_row_indices_vector();
+    vector<int>::const_iterator it;
+    for (it = sorted_row_indices.begin(); it != sorted_row_indices.end(); ++it) {
         int global_row_idx = *it;
         // FIXME: global_to_data must be used if not all rows are present
         // int data_idx = global_to_data[global_row_idx]    int data_idx = global_to_data[global_row_idx];
@@ -242,9 +270,16 @@ double Cluster::insert_col(const vector<double> &data,
         double value = data[data_idx];
         p_cm->insert_element(value);
     }
+    return insert_col(p_cm);
+}
+
+// takes ownership of p_cm, which must already hold this cluster's rows
+double Cluster::insert_col(ComponentModel *p_cm)
+{
     double score_delta = p_cm->calc_marginal_logp();
     p_model_v.push_back(p_cm);
     score += score_delta;
+    changed = true;
     //
     return score_delta;
 }
@@ -253,6 +288,7 @@ double Cluster::incorporate_hyper_update(int which_col)
 {
     double score_delta = p_model_v[which_col]->incorporate_hyper_update();
     score += score_delta;
+    changed = true;
     return score_delta;
 }
 
@@ -281,6 +317,7 @@ string Cluster::to_string(const string &join_str, bool top_level) const
 void Cluster::init_columns(const vector<CM_Hypers *> &hypers_v)
 {
     score = 0;
+    changed = true;
     vector<CM_Hypers *>::const_iterator it;
     for (it = hypers_v.begin(); it != hypers_v.end(); ++it) {
         CM_Hypers &hypers = **it;
@@ -31,6 +31,7 @@ ContinuousComponentModel::ContinuousComponentModel(const CM_Hypers &in_hypers)
     hyper_mu = get(*p_hypers, string("mu"));
     init_suffstats();
     set_log_Z_0();
+    set_predictive_constants();
 }
 
 ContinuousComponentModel::ContinuousComponentModel(const CM_Hypers &in_hypers,
@@ -46,6 +47,7 @@ ContinuousComponentModel::ContinuousComponentModel(const CM_Hypers &in_hypers,
     hyper_mu = get(*p_hypers, string("mu"));
     set_log_Z_0();
     score = calc_marginal_logp();
+    set_predictive_constants();
 }
 
 void ContinuousComponentModel::get_hyper_doubles(double &r, double &nu,
@@ -57,6 +59,18 @@ void ContinuousComponentModel::get_hyper_doubles(double &r, double &nu,
     mu = hyper_mu;
 }
 
+// calc_element_predictive_logp(x) is
+// log_const - exponent * log(s + r_ratio * (x - mu)^2)
+void ContinuousComponentModel::get_predictive_constants(double &mu,
+    double &r_ratio, double &s, double &exponent, double &log_const) const
+{
+    mu = predictive_mu;
+    r_ratio = predictive_r_ratio;
+    s = predictive_s;
+    exponent = predictive_exponent;
+    log_const = predictive_log_const;
+}
+
 double ContinuousComponentModel::calc_marginal_logp() const
 {
     double r, nu, s, mu;
@@ -74,16 +88,9 @@ double ContinuousComponentModel::calc_element_predictive_logp(
     if (isnan(element)) {
         return 0;
     }
-    double r, nu, s, mu;
-    int count;
-    double sum_x, sum_x_squared;
-    get_hyper_doubles(r, nu, s, mu);
-    get_suffstats(count, sum_x, sum_x_squared);
-    //
-    numerics::insert_to_continuous_suffstats(count, sum_x, sum_x_squared, element);
-    numerics::update_continuous_hypers(count, sum_x, sum_x_squared, r, nu, s, mu);
-    double logp_prime = numerics::calc_continuous_logp(count, r, nu, s, log_Z_0);
-    return logp_prime - score;
+    double deviation = element - predictive_mu;
+    return predictive_log_const - predictive_exponent * \
+        log(predictive_s + predictive_r_ratio * deviation * deviation);
 }
 
 double ContinuousComponentModel::calc_element_predictive_logp_constrained(
@@ -116,6 +123,50 @@ double ContinuousComponentModel::calc_element_predictive_logp_constrained(
     return predictive_logp;
 }
 
+// calc_element_predictive_logp_constrained of each of elements, with the
+// constraints incorporated once
+vector<double> ContinuousComponentModel::calc_element_predictive_logps_constrained(
+    const vector<double> &elements, const vector<double> &constraints) const
+{
+    double r, nu, s, mu;
+    int count;
+    double sum_x, sum_x_squared;
+    get_hyper_doubles(r, nu, s, mu);
+    get_suffstats(count, sum_x, sum_x_squared);
+    //
+    int num_constraints = (int) constraints.size();
+    for (int constraint_idx = 0; constraint_idx < num_constraints;
+        constraint_idx++) {
+        double constraint = constraints[constraint_idx];
+        numerics::insert_to_continuous_suffstats(count, sum_x, sum_x_squared,
+            constraint);
+    }
+    double r_n = r, nu_n = nu, s_n = s, mu_n = mu;
+    numerics::update_continuous_hypers(count, sum_x, sum_x_squared,
+        r_n, nu_n, s_n, mu_n);
+    double baseline = numerics::calc_continuous_logp(count, r_n, nu_n, s_n,
+            log_Z_0);
+    //
+    vector<double> logps(elements.size(), 0.);
+    for (size_t element_idx = 0; element_idx < elements.size(); element_idx++) {
+        double element = elements[element_idx];
+        if (isnan(element)) {
+            continue;
+        }
+        int count_m = count;
+        double sum_x_m = sum_x, sum_x_squared_m = sum_x_squared;
+        double r_m = r, nu_m = nu, s_m = s, mu_m = mu;
+        numerics::insert_to_continuous_suffstats(count_m, sum_x_m,
+            sum_x_squared_m, element);
+        numerics::update_continuous_hypers(count_m, sum_x_m, sum_x_squared_m,
+            r_m, nu_m, s_m, mu_m);
+        double updated = numerics::calc_continuous_logp(count_m, r_m, nu_m, s_m,
+                log_Z_0);
+        logps[element_idx] = updated - baseline;
+    }
+    return logps;
+}
+
 vector<double> ContinuousComponentModel::calc_hyper_conditionals(
     const string &which_hyper, const vector<double> &hyper_grid) const
 {
@@ -151,6 +202,7 @@ double ContinuousComponentModel::insert_element(double element)
     double score_0 = score;
     numerics::insert_to_continuous_suffstats(count, sum_x, sum_x_squared, element);
     score = calc_marginal_logp();
+    set_predictive_constants();
     double delta_score = score - score_0;
     return delta_score;
 }
@@ -164,6 +216,7 @@ double ContinuousComponentModel::remove_element(double element)
     numerics::remove_from_continuous_suffstats(count, sum_x, sum_x_squared,
         element);
     score = calc_marginal_logp();
+    set_predictive_constants();
     double delta_score = score - score_0;
     return delta_score;
 }
@@ -178,6 +231,7 @@ double ContinuousComponentModel::incorporate_hyper_update()
     // hypers[which_hyper] = value; // set by owner of hypers object
     set_log_Z_0();
     score = calc_marginal_logp();
+    set_predictive_constants();
     double score_delta = score - score_0;
     return score_delta;
 }
@@ -189,6 +243,25 @@ void ContinuousComponentModel::set_log_Z_0()
     log_Z_0 = numerics::calc_continuous_logp(0, r, nu, s, 0);
 }
 
+// The predictive logp of x is calc_continuous_logp after inserting x less
+// the current score, i.e. log_Z(r + 1, nu + 1, s + r / (r + 1) * (x - mu)^2)
+// - log_Z(r, nu, s) - HALF_LOG_2PI in terms of the updated hypers.  All but
+// the log of the updated s is independent of x.
+void ContinuousComponentModel::set_predictive_constants()
+{
+    double r, nu, s, mu;
+    get_hyper_doubles(r, nu, s, mu);
+    numerics::update_continuous_hypers(count, sum_x, sum_x_squared, r, nu, s, mu);
+    predictive_mu = mu;
+    predictive_r_ratio = r / (r + 1);
+    predictive_s = s;
+    predictive_exponent = .5 * (nu + 1);
+    predictive_log_const = .5 * LOG_2 + .5 * nu * log(s)  \
+        - .5 * log((r + 1) / r)                         \
+        + lgamma(.5 * (nu + 1)) - lgamma(.5 * nu)       \
+        - HALF_LOG_2PI;
+}
+
 void ContinuousComponentModel::init_suffstats()
 {
     sum_x = 0.;
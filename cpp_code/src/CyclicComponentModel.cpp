@@ -118,6 +118,32 @@ double CyclicComponentModel::calc_element_predictive_logp_constrained(
     return predictive_logp;
 }
 
+// calc_element_predictive_logp_constrained of each of elements, with the
+// constraints incorporated once
+vector<double> CyclicComponentModel::calc_element_predictive_logps_constrained(
+    const vector<double> &elements, const vector<double> &constraints) const
+{
+    double kappa, a, b;
+    int count;
+    double sum_sin_x, sum_cos_x;
+    get_hyper_doubles(kappa, a, b);
+    get_suffstats(count, sum_sin_x, sum_cos_x);
+    //
+    int num_constraints = (int) constraints.size();
+    for (int constraint_idx = 0; constraint_idx < num_constraints;
+        constraint_idx++) {
+        double constraint = constraints[constraint_idx];
+        numerics::insert_to_cyclic_suffstats(count, sum_sin_x, sum_cos_x, constraint);
+    }
+    vector<double> logps(elements.size());
+    for (size_t element_idx = 0; element_idx < elements.size(); element_idx++) {
+        // calc_cyclic_data_logp is 0 for missing elements
+        logps[element_idx] = numerics::calc_cyclic_data_logp(count, sum_sin_x,
+                sum_cos_x, kappa, a, b, elements[element_idx]);
+    }
+    return logps;
+}
+
 vector<double> CyclicComponentModel::calc_hyper_conditionals(
     const string &which_hyper, const vector<double> &hyper_grid) const
 {
@@ -34,6 +34,7 @@ MultinomialComponentModel::MultinomialComponentModel(const CM_Hypers
     hyper_dirichlet_alpha = get(*p_hypers, (string) "dirichlet_alpha");
     init_suffstats();
     set_log_Z_0();
+    set_predictive_constants();
 }
 
 MultinomialComponentModel::MultinomialComponentModel(const CM_Hypers &in_hypers,
@@ -60,6 +61,7 @@ MultinomialComponentModel::MultinomialComponentModel(const CM_Hypers &in_hypers,
         suffstats[i] = static_cast<int>(it->second);
     }
     score = calc_marginal_logp();
+    set_predictive_constants();
 }
 
 void MultinomialComponentModel::init_suffstats()
@@ -82,12 +84,11 @@ double MultinomialComponentModel::calc_element_predictive_logp(
     if (isnan(element)) {
         return 0;
     }
-    int K = hyper_K;
-    double dirichlet_alpha = hyper_dirichlet_alpha;
-    double logp = numerics::calc_multinomial_predictive_logp(element,
-            suffstats, count,
-            K, dirichlet_alpha);
-    return logp;
+    assert(0 <= element);
+    assert(element < hyper_K);
+    assert(element == trunc(element));
+    int i = static_cast<int>(element);
+    return log_numerators[i] - log_denominator;
 }
 
 double MultinomialComponentModel::calc_element_predictive_logp_constrained(
@@ -120,6 +121,37 @@ double MultinomialComponentModel::calc_element_predictive_logp_constrained(
     return predictive;
 }
 
+// calc_element_predictive_logp_constrained of each of elements, with the
+// constraints incorporated once
+vector<double> MultinomialComponentModel::calc_element_predictive_logps_constrained(
+    const vector<double> &elements, const vector<double> &constraints) const
+{
+    int K = hyper_K;
+    double dirichlet_alpha = hyper_dirichlet_alpha;
+    //
+    vector<int> suffstats_copy = suffstats;
+    int count_copy = count;
+    int num_constraints = (int) constraints.size();
+    for (int constraint_idx = 0; constraint_idx < num_constraints;
+        constraint_idx++) {
+        double constraint = constraints[constraint_idx];
+        assert(0 <= constraint);
+        assert(constraint < K);
+        assert(constraint == trunc(constraint));
+        int i = static_cast<int>(constraint);
+        count_copy++;
+        suffstats_copy[i]++;
+    }
+    vector<double> logps(elements.size());
+    for (size_t element_idx = 0; element_idx < elements.size(); element_idx++) {
+        // calc_multinomial_predictive_logp is 0 for missing elements
+        logps[element_idx] = numerics::calc_multinomial_predictive_logp(
+                elements[element_idx], suffstats_copy, count_copy, K,
+                dirichlet_alpha);
+    }
+    return logps;
+}
+
 vector<double> MultinomialComponentModel::calc_hyper_conditionals(
     const string &which_hyper, const vector<double> &hyper_grid) const
 {
@@ -151,6 +183,8 @@ double MultinomialComponentModel::insert_element(double element)
     suffstats[i] += 1;
     count += 1;
     score += delta_score;
+    log_numerators[i] = log(hyper_dirichlet_alpha + suffstats[i]);
+    log_denominator = log(count + hyper_K * hyper_dirichlet_alpha);
     return delta_score;
 }
 
@@ -163,9 +197,12 @@ double MultinomialComponentModel::remove_element(double element)
     int i = static_cast<int>(element);
     assert(0 < suffstats[i]);
     suffstats[i] -= 1;
-    double delta_score = calc_element_predictive_logp(element);
+    log_numerators[i] = log(hyper_dirichlet_alpha + suffstats[i]);
+    // the predictive logp of the element given the other count - 1 elements
+    double delta_score = log_numerators[i] - log_denominator;
     count -= 1;
     score -= delta_score;
+    log_denominator = log(count + hyper_K * hyper_dirichlet_alpha);
     return delta_score;
 }
 
@@ -176,10 +213,20 @@ double MultinomialComponentModel::incorporate_hyper_update()
     double score_0 = score;
     // hypers[which_hyper] = value; // set by owner of hypers object
     score = calc_marginal_logp();
+    set_predictive_constants();
     double score_delta = score - score_0;
     return score_delta;
 }
 
+void MultinomialComponentModel::set_predictive_constants()
+{
+    log_numerators.resize(hyper_K);
+    for (int key = 0; key < hyper_K; key++) {
+        log_numerators[key] = log(hyper_dirichlet_alpha + suffstats[key]);
+    }
+    log_denominator = log(count + hyper_K * hyper_dirichlet_alpha);
+}
+
 void MultinomialComponentModel::set_log_Z_0()
 {
     log_Z_0 = calc_marginal_logp();
@@ -263,6 +310,22 @@ map<string, double> MultinomialComponentModel::get_hypers() const
     return hypers;
 }
 
+const vector<int> &MultinomialComponentModel::get_label_counts() const
+{
+    return suffstats;
+}
+
+// calc_element_predictive_logp(i) is log_numerators[i] - log_denominator
+const vector<double> &MultinomialComponentModel::get_log_numerators() const
+{
+    return log_numerators;
+}
+
+double MultinomialComponentModel::get_log_denominator() const
+{
+    return log_denominator;
+}
+
 void MultinomialComponentModel::get_suffstats(int &count_out,
     map<string, double> &counts) const
 {
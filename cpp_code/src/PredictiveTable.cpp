@@ -0,0 +1,211 @@
+/*
+ *   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+ *
+ *   Lead Developers: Dan Lovell and Jay Baxter
+ *   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+ *   Research Leads: Vikash Mansinghka, Patrick Shafto
+ *
+ *   Licensed under the Apache License, Version 2.0 (the "License");
+ *   you may not use this file except in compliance with the License.
+ *   You may obtain a copy of the License at
+ *
+ *       http://www.apache.org/licenses/LICENSE-2.0
+ *
+ *   Unless required by applicable law or agreed to in writing, software
+ *   distributed under the License is distributed on an "AS IS" BASIS,
+ *   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ *   See the License for the specific language governing permissions and
+ *   limitations under the License.
+ */
+#include <algorithm>
+#include <cassert>
+#include <cstdlib>
+#include <iostream>
+
+#include "PredictiveTable.h"
+#include "numerics.h"
+
+using namespace std;
+
+PredictiveTable::PredictiveTable() : num_slots(0)
+{
+}
+
+int PredictiveTable::get_num_cols() const
+{
+    return datatypes.size();
+}
+
+int PredictiveTable::get_num_slots() const
+{
+    return num_slots;
+}
+
+void PredictiveTable::set_columns(const vector<string> &DATATYPES,
+    const vector<CM_Hypers *> &hypers_v)
+{
+    datatypes = DATATYPES;
+    typed_col_idxs.resize(datatypes.size());
+    continuous_columns.clear();
+    multinomial_columns.clear();
+    cyclic_columns.clear();
+    num_slots = 0;
+    for (size_t col_idx = 0; col_idx < datatypes.size(); col_idx++) {
+        const string &datatype = datatypes[col_idx];
+        if (datatype == CONTINUOUS_DATATYPE) {
+            typed_col_idxs[col_idx] = continuous_columns.size();
+            continuous_columns.push_back(ContinuousColumn());
+        } else if (datatype == MULTINOMIAL_DATATYPE) {
+            typed_col_idxs[col_idx] = multinomial_columns.size();
+            multinomial_columns.push_back(MultinomialColumn());
+            multinomial_columns.back().K = get(*hypers_v[col_idx],
+                    string("K"));
+        } else if (datatype == CYCLIC_DATATYPE) {
+            typed_col_idxs[col_idx] = cyclic_columns.size();
+            cyclic_columns.push_back(CyclicColumn());
+        } else {
+            cout << "PredictiveTable::set_columns: datatype=" << datatype
+                << endl;
+            assert(0);
+            exit(EXIT_FAILURE);
+        }
+    }
+}
+
+void PredictiveTable::resize(int NUM_SLOTS)
+{
+    num_slots = NUM_SLOTS;
+    vector<ContinuousColumn>::iterator cc_it;
+    for (cc_it = continuous_columns.begin(); cc_it != continuous_columns.end();
+        ++cc_it) {
+        cc_it->mu.resize(num_slots);
+        cc_it->r_ratio.resize(num_slots);
+        cc_it->s.resize(num_slots);
+        cc_it->exponent.resize(num_slots);
+        cc_it->log_const.resize(num_slots);
+    }
+    vector<MultinomialColumn>::iterator mc_it;
+    for (mc_it = multinomial_columns.begin();
+        mc_it != multinomial_columns.end(); ++mc_it) {
+        mc_it->log_numerators.resize(num_slots * mc_it->K);
+        mc_it->log_denominator.resize(num_slots);
+    }
+    vector<CyclicColumn>::iterator yc_it;
+    for (yc_it = cyclic_columns.begin(); yc_it != cyclic_columns.end();
+        ++yc_it) {
+        yc_it->kappa.resize(num_slots);
+        yc_it->sum_sin_x.resize(num_slots);
+        yc_it->sum_cos_x.resize(num_slots);
+        yc_it->a_sin_b.resize(num_slots);
+        yc_it->a_cos_b.resize(num_slots);
+        yc_it->log_base.resize(num_slots);
+        yc_it->log_Z_n.resize(num_slots);
+    }
+}
+
+void PredictiveTable::set_slot(int slot, const Cluster &cluster)
+{
+    assert(0 <= slot && slot < num_slots);
+    assert(cluster.get_num_cols() == get_num_cols());
+    for (size_t col_idx = 0; col_idx < datatypes.size(); col_idx++) {
+        const string &datatype = datatypes[col_idx];
+        int typed_col_idx = typed_col_idxs[col_idx];
+        const ComponentModel *p_cm = cluster.p_model_v[col_idx];
+        if (datatype == CONTINUOUS_DATATYPE) {
+            ContinuousColumn &column = continuous_columns[typed_col_idx];
+            static_cast<const ContinuousComponentModel *>(p_cm)
+            ->get_predictive_constants(column.mu[slot], column.r_ratio[slot],
+                column.s[slot], column.exponent[slot],
+                column.log_const[slot]);
+        } else if (datatype == MULTINOMIAL_DATATYPE) {
+            MultinomialColumn &column = multinomial_columns[typed_col_idx];
+            const MultinomialComponentModel *p_mcm =
+                static_cast<const MultinomialComponentModel *>(p_cm);
+            const vector<double> &log_numerators = \
+                p_mcm->get_log_numerators();
+            assert(log_numerators.size() == (size_t) column.K);
+            std::copy(log_numerators.begin(), log_numerators.end(),
+                column.log_numerators.begin() + slot * column.K);
+            column.log_denominator[slot] = p_mcm->get_log_denominator();
+        } else {
+            CyclicColumn &column = cyclic_columns[typed_col_idx];
+            const CyclicComponentModel *p_ycm =
+                static_cast<const CyclicComponentModel *>(p_cm);
+            int count;
+            double sum_sin_x, sum_cos_x, kappa, a, b;
+            p_ycm->get_suffstats(count, sum_sin_x, sum_cos_x);
+            p_ycm->get_hyper_doubles(kappa, a, b);
+            column.kappa[slot] = kappa;
+            column.sum_sin_x[slot] = sum_sin_x;
+            column.sum_cos_x[slot] = sum_cos_x;
+            column.a_sin_b[slot] = a * sin(b);
+            column.a_cos_b[slot] = a * cos(b);
+            column.log_base[slot] = -LOG_2PI - numerics::log_bessel_0(kappa);
+            double an = a, bn = b;
+            numerics::update_cyclic_hypers(count, sum_sin_x, sum_cos_x, kappa,
+                an, bn);
+            column.log_Z_n[slot] = numerics::calc_cyclic_log_Z(an);
+        }
+    }
+}
+
+// Each loop computes, for every slot, what the slot's component model's
+// calc_element_predictive_logp would, in the same order of operations.
+void PredictiveTable::add_row_predictive_logps(const vector<double> &vd,
+    vector<double> &logps) const
+{
+    assert(vd.size() == datatypes.size());
+    assert(logps.size() == (size_t) num_slots);
+    double *p_logps = &logps[0];
+    for (size_t col_idx = 0; col_idx < vd.size(); col_idx++) {
+        double element = vd[col_idx];
+        if (isnan(element)) {
+            // missing values don't contribute
+            continue;
+        }
+        const string &datatype = datatypes[col_idx];
+        int typed_col_idx = typed_col_idxs[col_idx];
+        if (datatype == CONTINUOUS_DATATYPE) {
+            const ContinuousColumn &column = continuous_columns[typed_col_idx];
+            const double *mu = &column.mu[0];
+            const double *r_ratio = &column.r_ratio[0];
+            const double *s = &column.s[0];
+            const double *exponent = &column.exponent[0];
+            const double *log_const = &column.log_const[0];
+            for (int slot = 0; slot < num_slots; slot++) {
+                double deviation = element - mu[slot];
+                p_logps[slot] += log_const[slot] - exponent[slot] * \
+                    log(s[slot] + r_ratio[slot] * deviation * deviation);
+            }
+        } else if (datatype == MULTINOMIAL_DATATYPE) {
+            const MultinomialColumn &column = \
+                multinomial_columns[typed_col_idx];
+            assert(0 <= element);
+            assert(element < column.K);
+            assert(element == trunc(element));
+            int value = static_cast<int>(element);
+            const double *log_numerators = &column.log_numerators[value];
+            const double *log_denominator = &column.log_denominator[0];
+            int K = column.K;
+            for (int slot = 0; slot < num_slots; slot++) {
+                p_logps[slot] += log_numerators[slot * K] - \
+                    log_denominator[slot];
+            }
+        } else {
+            const CyclicColumn &column = cyclic_columns[typed_col_idx];
+            double sin_element = sin(element);
+            double cos_element = cos(element);
+            for (int slot = 0; slot < num_slots; slot++) {
+                double kappa = column.kappa[slot];
+                double p_cos = kappa * (column.sum_cos_x[slot] + cos_element) \
+                    + column.a_cos_b[slot];
+                double p_sin = kappa * (column.sum_sin_x[slot] + sin_element) \
+                    + column.a_sin_b[slot];
+                double am = sqrt(p_cos * p_cos + p_sin * p_sin);
+                double logp = column.log_base[slot];
+                logp += numerics::calc_cyclic_log_Z(am) - column.log_Z_n[slot];
+                p_logps[slot] += logp;
+            }
+        }
+    }
+}
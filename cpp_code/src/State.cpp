@@ -42,7 +42,7 @@ State::State(const MatrixD &data,
     const vector<double> &COLUMN_CRP_ALPHA_GRID,
     const vector<double> &S_GRID,
     const vector<double> &MU_GRID,
-    int N_GRID, int SEED, int CT_KERNEL) : rng(SEED)
+    int N_GRID, int SEED, int CT_KERNEL) : rng(SEED), thread_pool(NULL)
 {
     assert(CT_KERNEL == 1 || CT_KERNEL == 0);
     ct_kernel = CT_KERNEL;
@@ -81,7 +81,7 @@ State::State(const MatrixD &data,
     const vector<double> &COLUMN_CRP_ALPHA_GRID,
     const vector<double> &S_GRID,
     const vector<double> &MU_GRID,
-    int N_GRID, int SEED, int CT_KERNEL) : rng(SEED)
+    int N_GRID, int SEED, int CT_KERNEL) : rng(SEED), thread_pool(NULL)
 {
     assert(CT_KERNEL == 1 || CT_KERNEL == 0);
     ct_kernel = CT_KERNEL;
@@ -120,6 +120,7 @@ State::State(const MatrixD &data,
 State::~State()
 {
     remove_all();
+    delete thread_pool;
 }
 
 int State::get_num_cols() const
@@ -132,6 +133,23 @@ int State::get_num_cols_effective() const
     return num_cols_effective;
 }
 
+int State::get_num_threads() const
+{
+    return thread_pool == NULL ? 1 : thread_pool->get_num_threads();
+}
+
+void State::set_num_threads(int num_threads)
+{
+    if (num_threads == get_num_threads()) {
+        return;
+    }
+    delete thread_pool;
+    thread_pool = NULL;
+    if (1 < num_threads) {
+        thread_pool = new ThreadPool(num_threads);
+    }
+}
+
 int State::get_num_views() const
 {
     return views.size();
@@ -155,7 +173,7 @@ double State::insert_row(const vector<double> &row_data,
 {
     bool append_row = (row_idx == -1);
     if (append_row) {
-        row_idx = (int)(**views.begin()).cluster_lookup.size();
+        row_idx = (int)(**views.begin()).get_num_vectors();
     }
     vector<View *>::const_iterator it;
     double score_delta = 0;
@@ -177,7 +195,7 @@ double State::insert_row(const vector<double> &row_data,
 }
 
 double State::insert_feature(int feature_idx,
-    const vector<double> &feature_data,
+    const ColumnD &feature_data,
     View &which_view)
 {
     string col_datatype = global_col_datatypes[feature_idx];
@@ -201,7 +219,7 @@ double State::insert_feature(int feature_idx,
 }
 
 double State::sample_insert_feature(int feature_idx,
-    const vector<double> &feature_data,
+    const ColumnD &feature_data,
     View &singleton_view)
 {
     string col_datatype = global_col_datatypes[feature_idx];
@@ -217,7 +235,7 @@ double State::sample_insert_feature(int feature_idx,
 
 double State::sample_insert_feature_block(
     const vector<int> &feature_idxs,
-    const vector<vector<double> > &feature_datas,
+    const vector<ColumnD> &feature_datas,
     View &singleton_view)
 {
 
@@ -244,7 +262,7 @@ double State::sample_insert_feature_block(
 }
 
 double State::remove_feature(
-    int feature_idx, const vector<double> &feature_data)
+    int feature_idx, const ColumnD &feature_data)
 {
     string col_datatype = global_col_datatypes[feature_idx];
     CM_Hypers &hypers = hypers_m[feature_idx];
@@ -270,7 +288,7 @@ double State::remove_feature(
 
 double State::remove_feature(
     int feature_idx,
-    const vector<double> &feature_data,
+    const ColumnD &feature_data,
     View *&p_singleton_view)
 {
     // Retrieve current view of feature_idx.
@@ -291,7 +309,7 @@ double State::remove_feature(
 }
 
 double State::transition_feature_gibbs(int feature_idx,
-    const vector<double> &feature_data)
+    const ColumnD &feature_data)
 {
     double score_delta = 0;
     View *p_singleton_view;
@@ -303,7 +321,7 @@ double State::transition_feature_gibbs(int feature_idx,
 
 double State::transition_feature_block_gibbs(
     const vector<int> &feature_idxs,
-    const vector<vector<double> > &feature_datas)
+    const vector<ColumnD> &feature_datas)
 {
     double score_delta = 0;
 
@@ -365,7 +383,7 @@ double State::get_proposal_log_ratio(View &from_view, View &to_view)
 }
 
 double State::mh_choose(int feature_idx,
-    const vector<double> &feature_data,
+    const ColumnD &feature_data,
     View &proposed_view)
 {
     double score_delta = 0;
@@ -420,7 +438,7 @@ double State::mh_choose(int feature_idx,
 
 // updated kernel with birth-death process
 double State::transition_feature_mh(int feature_idx,
-    const vector<double> &feature_data)
+    const ColumnD &feature_data)
 {
     double score_delta = 0;
     View *p_proposed_view;
@@ -463,14 +481,19 @@ double State::transition_features(
         if (ct_kernel == 0) {
             // For Gibbs, transition feature and all its dependent features.
             vector<int> feature_idxs = get_column_dependencies(feature_idx);
-            vector<vector<double> > feature_datas = extract_cols(data,
-                feature_idxs);
+            vector<vector<double> > feature_columns(feature_idxs.size());
+            vector<ColumnD> feature_datas;
+            for (size_t i = 0; i < feature_idxs.size(); i++) {
+                copy_feature_data(data, feature_idxs[i], feature_columns[i]);
+                feature_datas.push_back(feature_columns[i]);
+            }
             score_delta += transition_feature_block_gibbs(
                 feature_idxs, feature_datas);
         } else if (ct_kernel == 1) {
             // For MH, transition the feature alone without dependent features.
-            vector<double> feature_data = extract_col(data, feature_idx);
-            score_delta += transition_feature_mh(feature_idx, feature_data);
+            vector<double> feature_column;
+            copy_feature_data(data, feature_idx, feature_column);
+            score_delta += transition_feature_mh(feature_idx, feature_column);
         } else {
             printf("Invalid CT_KERNEL");
             assert(0 == 1);
@@ -480,6 +503,28 @@ double State::transition_features(
     return score_delta;
 }
 
+// Copy a feature out of the column-major data its view keeps, so that it is
+// read contiguously each time it is scored against a view, rather than down
+// the row-major data matrix.  The copy outlives the feature's removal from
+// its view.
+void State::copy_feature_data(const MatrixD &data, int feature_idx,
+    vector<double> &feature_data) const
+{
+    map<int, View *>::const_iterator it = view_lookup.find(feature_idx);
+    assert(it != view_lookup.end());
+    const vector<double> &column = it->second->get_column_data(feature_idx);
+    if (column.size() == data.size1()) {
+        feature_data = column;
+        return;
+    }
+    // rows appended to data but not yet inserted into the views
+    ColumnD data_column = data.column(feature_idx);
+    feature_data.resize(data_column.size());
+    for (size_t row_idx = 0; row_idx < data_column.size(); row_idx++) {
+        feature_data[row_idx] = data_column[row_idx];
+    }
+}
+
 View &State::get_new_view()
 {
     // FIXME: this is a hack
@@ -713,11 +758,10 @@ map<int, vector<int> > State::get_column_groups() const
     return view_idx_to_vec;
 }
 
-double State::transition_view_i(int which_view,
-    const map<int, vector<double> > &row_data_map)
+double State::transition_view_i(int which_view)
 {
     View &v = get_view(which_view);
-    double score_delta = v.transition(row_data_map);
+    double score_delta = v.transition();
     data_score += score_delta;
     return score_delta;
 }
@@ -725,80 +769,89 @@ double State::transition_view_i(int which_view,
 // helper for cython
 double State::transition_view_i(int which_view, const MatrixD &data)
 {
-    vector<int> global_column_indices = create_sequence(data.size2());
-    View &v = get_view(which_view);
-    vector<int> view_cols = get_indices_to_reorder(global_column_indices,
-            v.global_to_local);
-    const MatrixD data_subset = extract_columns(data, view_cols);
-    map<int, vector<double> > data_subset_map = construct_data_map(data_subset);
-    return v.transition(data_subset_map);
+    // each view keeps its own copy of its columns' data
+    return get_view(which_view).transition();
 }
 
 double State::transition_views(const MatrixD &data)
 {
-    vector<int> global_column_indices = create_sequence(data.size2());
-    //
     double score_delta = 0;
     // ordering doesn't matter, don't need to shuffle
     for (int view_idx = 0; view_idx < get_num_views(); view_idx++) {
-        View &v = get_view(view_idx);
-        vector<int> view_cols = get_indices_to_reorder(global_column_indices,
-                v.global_to_local);
-        const MatrixD data_subset = extract_columns(data, view_cols);
-        map<int, vector<double> > data_subset_map = construct_data_map(data_subset);
-        score_delta += v.transition(data_subset_map);
+        score_delta += get_view(view_idx).transition();
+    }
+    return score_delta;
+}
+
+// Gibbs sample the row assignments of one view: the rows in which_rows, in
+// that order, or all of the view's rows in its own shuffled order if
+// which_rows is NULL.
+static double transition_view_zs(View &v, const vector<int> *which_rows,
+    ThreadPool *thread_pool)
+{
+    if (which_rows == NULL) {
+        return v.transition_zs(thread_pool);
+    }
+    return v.transition_zs(*which_rows, thread_pool);
+}
+
+// Views are conditionally independent given the column partition and each
+// draws from its own RNG, seeded from the State's, so their row assignments
+// can be swept concurrently with the same result as sweeping them in turn.
+class ViewZsTask : public ParallelTask
+{
+public:
+    ViewZsTask(const vector<View *> &VIEWS, const vector<int> *WHICH_ROWS,
+        vector<double> &SCORE_DELTAS) : views(VIEWS), which_rows(WHICH_ROWS),
+        score_deltas(SCORE_DELTAS) {}
+    void run(int view_idx)
+    {
+        score_deltas[view_idx] = transition_view_zs(*views[view_idx],
+                which_rows, NULL);
+    }
+private:
+    const vector<View *> &views;
+    const vector<int> *which_rows;
+    vector<double> &score_deltas;
+};
+
+double State::transition_views_zs(const vector<int> *which_rows)
+{
+    double score_delta = 0;
+    int num_views = get_num_views();
+    if (thread_pool != NULL && 1 < num_views) {
+        // one task per view; the row sweep within a view stays sequential
+        vector<double> score_deltas(num_views, 0);
+        ViewZsTask task(views, which_rows, score_deltas);
+        thread_pool->run(task, num_views);
+        score_delta = std::accumulate(score_deltas.begin(),
+                score_deltas.end(), 0.);
+    } else {
+        for (int view_idx = 0; view_idx < num_views; view_idx++) {
+            score_delta += transition_view_zs(get_view(view_idx), which_rows,
+                    thread_pool);
+        }
     }
+    data_score += score_delta;
     return score_delta;
 }
 
 double State::transition_row_partition_assignments(const MatrixD &data,
     vector<int> which_rows)
 {
-    vector<int> global_column_indices = create_sequence(data.size2());
-    double score_delta = 0;
-    //
     int num_rows = which_rows.size();
     if (num_rows == 0) {
         num_rows = data.size1();
         which_rows = create_sequence(num_rows);
         random_shuffle(which_rows.begin(), which_rows.end(), rng);
     }
-    vector<View *>::const_iterator svp_it;
-    for (svp_it = views.begin(); svp_it != views.end(); ++svp_it) {
-        // for each view
-        View &v = **svp_it;
-        vector<int> view_cols = get_indices_to_reorder(global_column_indices,
-                v.global_to_local);
-        const MatrixD data_subset = extract_columns(data, view_cols);
-        map<int, vector<double> > row_data_map = construct_data_map(data_subset);
-        vector<int>::const_iterator vi_it;
-        for (vi_it = which_rows.begin(); vi_it != which_rows.end(); ++vi_it) {
-            // for each SPECIFIED row
-            int row_idx = *vi_it;
-            vector<double> vd = row_data_map[row_idx];
-            score_delta += v.transition_z(vd, row_idx);
-        }
-    }
-    data_score += score_delta;
-    return score_delta;
+    return transition_views_zs(&which_rows);
 }
 
 double State::transition_views_zs(const MatrixD &data)
 {
-    vector<int> global_column_indices = create_sequence(data.size2());
-    //
-    double score_delta = 0;
     // ordering doesn't matter, don't need to shuffle
-    for (int view_idx = 0; view_idx < get_num_views(); view_idx++) {
-        View &v = get_view(view_idx);
-        vector<int> view_cols = get_indices_to_reorder(global_column_indices,
-                v.global_to_local);
-        const MatrixD data_subset = extract_columns(data, view_cols);
-        map<int, vector<double> > data_subset_map = construct_data_map(data_subset);
-        score_delta += v.transition_zs(data_subset_map);
-    }
-    data_score += score_delta;
-    return score_delta;
+    return transition_views_zs(NULL);
 }
 
 double State::transition_views_row_partition_hyper()
@@ -908,21 +961,20 @@ double State::calc_feature_view_crp_logp(
 }
 
 double State::calc_feature_view_data_logp(
-    const vector<double> &col_data,
+    const ColumnD &col_data,
     const string &col_datatype,
     const View &v,
     const CM_Hypers &hypers,
     const int &global_col_idx) const
 {
     // Compute data log probability.
-    vector<int> data_global_row_indices = create_sequence(col_data.size());
     double data_log_delta = v.calc_column_predictive_logp(
-        col_data, col_datatype, data_global_row_indices, hypers);
+        col_data, col_datatype, hypers);
     return data_log_delta;
 }
 
 double State::calc_feature_view_predictive_logp(
-    const vector<double> &col_data,
+    const ColumnD &col_data,
     const string &col_datatype,
     const View &v,
     double &crp_log_delta,
@@ -962,7 +1014,7 @@ bool State::view_violates_independency(
 }
 
 vector<double> State::calc_feature_view_predictive_logps(
-    const vector<double> &col_data,
+    const ColumnD &col_data,
     int global_col_idx) const
 {
     vector<double> logps;
@@ -986,7 +1038,7 @@ vector<double> State::calc_feature_view_predictive_logps(
 
 vector<double> State::calc_feature_view_predictive_logps_block(
     const vector<int> &feature_idxs,
-    const vector<vector<double> > &feature_datas) const
+    const vector<ColumnD> &feature_datas) const
 {
     // Prepare vector of crp_logp and data_logp for each feature_idx.
     vector<vector<double> > unorm_crp_logps_all;
@@ -1046,7 +1098,7 @@ vector<double> State::calc_feature_view_crp_logps(
 }
 
 vector<double> State::calc_feature_view_data_logps(
-    const vector<double> &col_data,
+    const ColumnD &col_data,
     const int &global_col_idx) const
 {
     vector<double> data_logps;
@@ -1075,18 +1127,9 @@ vector<double> State::calc_column_crp_marginals(const vector<double>
 const
 {
     vector<int> view_counts = get_view_counts();
-    vector<double> crp_scores;
-    vector<double>::const_iterator it = alphas_to_score.begin();
     int num_cols = get_num_cols_effective();
-    for (; it != alphas_to_score.end(); ++it) {
-        double alpha_to_score = *it;
-        double this_crp_score = numerics::calc_crp_alpha_conditional(view_counts,
-                alpha_to_score,
-                num_cols,
-                true);
-        crp_scores.push_back(this_crp_score);
-    }
-    return crp_scores;
+    return numerics::calc_crp_alpha_conditionals(alphas_to_score, view_counts,
+            num_cols, true);
 }
 
 double State::calc_row_predictive_logp(const vector<double> &in_vd)
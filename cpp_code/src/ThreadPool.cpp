@@ -0,0 +1,139 @@
+/*
+ *   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+ *
+ *   Lead Developers: Dan Lovell and Jay Baxter
+ *   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+ *   Research Leads: Vikash Mansinghka, Patrick Shafto
+ *
+ *   Licensed under the Apache License, Version 2.0 (the "License");
+ *   you may not use this file except in compliance with the License.
+ *   You may obtain a copy of the License at
+ *
+ *       http://www.apache.org/licenses/LICENSE-2.0
+ *
+ *   Unless required by applicable law or agreed to in writing, software
+ *   distributed under the License is distributed on an "AS IS" BASIS,
+ *   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ *   See the License for the specific language governing permissions and
+ *   limitations under the License.
+ */
+#include <cassert>
+#include <cstdlib>
+#include <iostream>
+
+#include "ThreadPool.h"
+
+using namespace std;
+
+ThreadPool::ThreadPool(int NUM_THREADS)
+{
+    num_threads = NUM_THREADS < 1 ? 1 : NUM_THREADS;
+    current_task = NULL;
+    num_tasks = 0;
+    next_task_idx = 0;
+    num_tasks_done = 0;
+    batch_idx = 0;
+    shutting_down = false;
+    pthread_mutex_init(&mutex, NULL);
+    pthread_cond_init(&work_available, NULL);
+    pthread_cond_init(&work_done, NULL);
+    for (int worker_idx = 1; worker_idx < num_threads; worker_idx++) {
+        pthread_t worker;
+        if (pthread_create(&worker, NULL, worker_main, this) != 0) {
+            cerr << "ThreadPool: failed to create worker thread" << endl;
+            abort();
+        }
+        workers.push_back(worker);
+    }
+}
+
+ThreadPool::~ThreadPool()
+{
+    pthread_mutex_lock(&mutex);
+    shutting_down = true;
+    pthread_cond_broadcast(&work_available);
+    pthread_mutex_unlock(&mutex);
+    vector<pthread_t>::iterator it;
+    for (it = workers.begin(); it != workers.end(); ++it) {
+        pthread_join(*it, NULL);
+    }
+    pthread_cond_destroy(&work_done);
+    pthread_cond_destroy(&work_available);
+    pthread_mutex_destroy(&mutex);
+}
+
+int ThreadPool::get_num_threads() const
+{
+    return num_threads;
+}
+
+void ThreadPool::run(ParallelTask &task, int NUM_TASKS)
+{
+    if (workers.empty() || NUM_TASKS <= 1) {
+        for (int task_idx = 0; task_idx < NUM_TASKS; task_idx++) {
+            task.run(task_idx);
+        }
+        return;
+    }
+    pthread_mutex_lock(&mutex);
+    assert(current_task == NULL);
+    current_task = &task;
+    num_tasks = NUM_TASKS;
+    next_task_idx = 0;
+    num_tasks_done = 0;
+    batch_idx++;
+    pthread_cond_broadcast(&work_available);
+    pthread_mutex_unlock(&mutex);
+    //
+    drain_tasks();
+    //
+    pthread_mutex_lock(&mutex);
+    while (num_tasks_done < num_tasks) {
+        pthread_cond_wait(&work_done, &mutex);
+    }
+    current_task = NULL;
+    pthread_mutex_unlock(&mutex);
+}
+
+void *ThreadPool::worker_main(void *p_pool)
+{
+    static_cast<ThreadPool *>(p_pool)->work_loop();
+    return NULL;
+}
+
+void ThreadPool::work_loop()
+{
+    unsigned long last_batch_idx = 0;
+    pthread_mutex_lock(&mutex);
+    while (true) {
+        while (!shutting_down && batch_idx == last_batch_idx) {
+            pthread_cond_wait(&work_available, &mutex);
+        }
+        if (shutting_down) {
+            break;
+        }
+        last_batch_idx = batch_idx;
+        pthread_mutex_unlock(&mutex);
+        drain_tasks();
+        pthread_mutex_lock(&mutex);
+    }
+    pthread_mutex_unlock(&mutex);
+}
+
+// claim and run task indices of the current batch until none are left
+void ThreadPool::drain_tasks()
+{
+    pthread_mutex_lock(&mutex);
+    while (current_task != NULL && next_task_idx < num_tasks) {
+        ParallelTask &task = *current_task;
+        int task_idx = next_task_idx++;
+        pthread_mutex_unlock(&mutex);
+        task.run(task_idx);
+        pthread_mutex_lock(&mutex);
+        num_tasks_done++;
+        if (num_tasks_done == num_tasks) {
+            pthread_cond_signal(&work_done);
+        }
+    }
+    pthread_mutex_unlock(&mutex);
+}
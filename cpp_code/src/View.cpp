@@ -18,6 +18,8 @@
 *   limitations under the License.
 */
 
+#include <limits>
+
 #include "Matrix.h"
 
 #include "View.h"
@@ -42,7 +44,8 @@ View::View(const MatrixD &data,
     const map<int, vector<double> > &VM_A_GRIDS,
     const map<int, vector<double> > &VM_KAPPA_GRIDS,
     double CRP_ALPHA,
-    int SEED) : crp_alpha(CRP_ALPHA), rng(SEED)
+    int SEED) : crp_alpha(CRP_ALPHA), rng(SEED), num_data_rows(0),
+    num_vectors(0), predictive_table_stale(true)
 {
     crp_score = 0;
     data_score = 0;
@@ -78,7 +81,8 @@ View::View(const MatrixD &data,
     const map<int, vector<double> > &MU_GRIDS,
     const map<int, vector<double> > &VM_A_GRIDS,
     const map<int, vector<double> > &VM_KAPPA_GRIDS,
-    int SEED) : rng(SEED)
+    int SEED) : rng(SEED), num_data_rows(0),
+    num_vectors(0), predictive_table_stale(true)
 {
     crp_score = 0;
     data_score = 0;
@@ -114,7 +118,8 @@ View::View(const map<int, string> &GLOBAL_COL_DATATYPES,
     const map<int, vector<double> > &MU_GRIDS,
     const map<int, vector<double> > &VM_A_GRIDS,
     const map<int, vector<double> > &VM_KAPPA_GRIDS,
-    int SEED) : rng(SEED)
+    int SEED) : rng(SEED), num_data_rows(0),
+    num_vectors(0), predictive_table_stale(true)
 {
     crp_score = 0;
     data_score = 0;
@@ -139,7 +144,7 @@ View::View(const map<int, string> &GLOBAL_COL_DATATYPES,
 
 double View::get_num_vectors() const
 {
-    return cluster_lookup.size();
+    return num_vectors;
 }
 
 double View::get_num_cols() const
@@ -303,6 +308,20 @@ vector<int> View::get_global_col_indices()
     return global_col_indices;
 }
 
+vector<double> View::get_row_data(int row_idx) const
+{
+    vector<double> vd;
+    copy_row_data(row_idx, vd);
+    return vd;
+}
+
+const vector<double> &View::get_column_data(int global_col_idx) const
+{
+    map<int, int>::const_iterator it = global_to_local.find(global_col_idx);
+    assert(it != global_to_local.end());
+    return column_data[it->second];
+}
+
 Cluster &View::get_cluster(int cluster_idx)
 {
     assert(0 <= cluster_idx);
@@ -317,7 +336,9 @@ Cluster &View::get_cluster(int cluster_idx)
 
 vector<double> View::get_draw(int row_idx, int random_seed) const
 {
-    Cluster &cluster = *get(cluster_lookup, row_idx);
+    assert((size_t)row_idx < cluster_lookup.size());
+    assert(cluster_lookup[row_idx] != NULL);
+    Cluster &cluster = *cluster_lookup[row_idx];
     vector<double> draw = cluster.get_draw(random_seed);
     return draw;
 }
@@ -355,21 +376,57 @@ double View::calc_cluster_vector_predictive_logp(const vector<double> &vd,
 vector<double> View::calc_cluster_vector_predictive_logps(
     const vector<double> &vd)
 {
-    vector<double> logps;
-    vector<Cluster *>::const_iterator it = clusters.begin();
-    double crp_logp_delta, data_logp_delta;
-    for (; it != clusters.end(); ++it) {
-        logps.push_back(calc_cluster_vector_predictive_logp(vd, **it, crp_logp_delta,
-                data_logp_delta));
+    refresh_predictive_table();
+    return calc_table_predictive_logps(vd);
+}
+
+// Scores vd against each slot of predictive_table, which must be fresh.
+// Only reads the view, so rows may be scored concurrently.
+vector<double> View::calc_table_predictive_logps(
+    const vector<double> &vd) const
+{
+    int num_clusters = predictive_table.get_num_slots();
+    vector<double> data_logps(num_clusters, 0.);
+    predictive_table.add_row_predictive_logps(vd, data_logps);
+    vector<int> cluster_counts(num_clusters, 0);
+    for (int cluster_idx = 0; cluster_idx < num_clusters - 1; cluster_idx++) {
+        cluster_counts[cluster_idx] = clusters[cluster_idx]->get_count();
+    }
+    vector<double> logps = numerics::calc_cluster_crp_logps(cluster_counts,
+            get_num_vectors(), crp_alpha);
+    for (int cluster_idx = 0; cluster_idx < num_clusters; cluster_idx++) {
+        logps[cluster_idx] += data_logps[cluster_idx];
     }
-    Cluster empty_cluster(hypers_v);
-    logps.push_back(calc_cluster_vector_predictive_logp(vd, empty_cluster,
-            crp_logp_delta,
-            data_logp_delta));
-    empty_cluster.delete_component_models();
     return logps;
 }
 
+void View::refresh_predictive_table()
+{
+    if (predictive_table_stale) {
+        empty_cluster.delete_component_models();
+        for (size_t col_idx = 0; col_idx < hypers_v.size(); col_idx++) {
+            empty_cluster.insert_col(Cluster::new_component_model(
+                    datatypes_v[col_idx], *hypers_v[col_idx]));
+        }
+        predictive_table.set_columns(datatypes_v, hypers_v);
+        table_clusters.clear();
+        predictive_table_stale = false;
+    }
+    int num_clusters = clusters.size();
+    predictive_table.resize(num_clusters + 1);
+    table_clusters.resize(num_clusters + 1, NULL);
+    for (int cluster_idx = 0; cluster_idx <= num_clusters; cluster_idx++) {
+        Cluster &which_cluster = cluster_idx == num_clusters ? \
+            empty_cluster : *clusters[cluster_idx];
+        if (table_clusters[cluster_idx] != &which_cluster || \
+            which_cluster.get_changed()) {
+            predictive_table.set_slot(cluster_idx, which_cluster);
+            table_clusters[cluster_idx] = &which_cluster;
+            which_cluster.clear_changed();
+        }
+    }
+}
+
 double View::calc_crp_marginal() const
 {
     int num_vectors = get_num_vectors();
@@ -383,31 +440,72 @@ const
 {
     int num_vectors = get_num_vectors();
     vector<int> cluster_counts = get_cluster_counts();
-    vector<double> crp_scores;
-    vector<double>::const_iterator it = alphas_to_score.begin();
-    for (; it != alphas_to_score.end(); ++it) {
-        double alpha_to_score = *it;
-        double this_crp_score = numerics::calc_crp_alpha_conditional(cluster_counts,
-                alpha_to_score,
-                num_vectors,
-                true);
-        crp_scores.push_back(this_crp_score);
-    }
-    return crp_scores;
+    return numerics::calc_crp_alpha_conditionals(alphas_to_score,
+            cluster_counts, num_vectors, true);
 }
 
+// Gathers the suffstats of column which_col across all clusters and scores
+// the whole grid in one pass, rather than one grid per cluster.
 vector<double> View::calc_hyper_conditionals(int which_col,
     const string &which_hyper,
     const vector<double> &hyper_grid) const
 {
-    vector<Cluster *>::const_iterator it;
-    vector<vector<double> > vec_vec;
-    for (it = clusters.begin(); it != clusters.end(); ++it) {
-        vector<double> logps = (**it).calc_hyper_conditionals(which_col, which_hyper,
-                hyper_grid);
-        vec_vec.push_back(logps);
+    int num_clusters = clusters.size();
+    if (num_clusters == 0) {
+        return vector<double>(hyper_grid.size(), 0.);
+    }
+    const string &datatype = datatypes_v[which_col];
+    vector<int> counts(num_clusters);
+    if (datatype == CONTINUOUS_DATATYPE) {
+        vector<double> sum_xs(num_clusters), sum_x_sqs(num_clusters);
+        for (int cluster_idx = 0; cluster_idx < num_clusters; cluster_idx++) {
+            const ContinuousComponentModel &model =
+                static_cast<const ContinuousComponentModel &>(
+                    *clusters[cluster_idx]->p_model_v[which_col]);
+            model.get_suffstats(counts[cluster_idx], sum_xs[cluster_idx],
+                sum_x_sqs[cluster_idx]);
+        }
+        double r, nu, s, mu;
+        static_cast<const ContinuousComponentModel &>(
+            *clusters[0]->p_model_v[which_col]).get_hyper_doubles(r, nu, s, mu);
+        return numerics::calc_continuous_hyper_conditionals(which_hyper,
+                hyper_grid, counts, sum_xs, sum_x_sqs, r, nu, s, mu);
+    } else if (datatype == MULTINOMIAL_DATATYPE) {
+        if (which_hyper != "dirichlet_alpha") {
+            // error condition
+            vector<double> error;
+            return error;
+        }
+        vector<int> label_counts;
+        for (int cluster_idx = 0; cluster_idx < num_clusters; cluster_idx++) {
+            const MultinomialComponentModel &model =
+                static_cast<const MultinomialComponentModel &>(
+                    *clusters[cluster_idx]->p_model_v[which_col]);
+            counts[cluster_idx] = model.get_count();
+            const vector<int> &cluster_label_counts = model.get_label_counts();
+            label_counts.insert(label_counts.end(),
+                cluster_label_counts.begin(), cluster_label_counts.end());
+        }
+        int K = label_counts.size() / num_clusters;
+        return numerics::calc_multinomial_dirichlet_alpha_conditionals(
+                hyper_grid, counts, label_counts, K);
+    } else if (datatype == CYCLIC_DATATYPE) {
+        vector<double> sum_sin_xs(num_clusters), sum_cos_xs(num_clusters);
+        for (int cluster_idx = 0; cluster_idx < num_clusters; cluster_idx++) {
+            const CyclicComponentModel &model =
+                static_cast<const CyclicComponentModel &>(
+                    *clusters[cluster_idx]->p_model_v[which_col]);
+            model.get_suffstats(counts[cluster_idx], sum_sin_xs[cluster_idx],
+                sum_cos_xs[cluster_idx]);
+        }
+        double kappa, a, b;
+        static_cast<const CyclicComponentModel &>(
+            *clusters[0]->p_model_v[which_col]).get_hyper_doubles(kappa, a, b);
+        return numerics::calc_cyclic_hyper_conditionals(which_hyper,
+                hyper_grid, counts, sum_sin_xs, sum_cos_xs, kappa, a, b);
     }
-    return std_vector_add(vec_vec);
+    assert(0);
+    return vector<double>();
 }
 
 double View::set_hyper(int which_col, const string &which_hyper,
@@ -421,6 +519,9 @@ double View::set_hyper(int which_col, const string &which_hyper,
     for (it = clusters.begin(); it != clusters.end(); ++it) {
         score_delta += (**it).incorporate_hyper_update(which_col);
     }
+    if (!predictive_table_stale) {
+        empty_cluster.incorporate_hyper_update(which_col);
+    }
     // DOES THIS CAUSE UNBOUNDED SCORE GROWTH?
     data_score += score_delta;
     return score_delta;
@@ -476,7 +577,7 @@ double View::transition_hypers()
     return score_delta;
 }
 
-double View::transition(const map<int, vector<double> > &row_data_map)
+double View::transition()
 {
     vector<int> which_transitions = create_sequence(3);
     random_shuffle(which_transitions.begin(), which_transitions.end(), rng);
@@ -487,7 +588,7 @@ double View::transition(const map<int, vector<double> > &row_data_map)
         if (which_transition == 0) {
             score_delta += transition_hypers();
         } else if (which_transition == 1) {
-            score_delta += transition_zs(row_data_map);
+            score_delta += transition_zs();
         } else if (which_transition == 2) {
             score_delta += transition_crp_alpha();
         } else {
@@ -507,17 +608,84 @@ void View::decrement_num_cols_effective()
     num_cols_effective--;
 }
 
-double View::calc_column_predictive_logp(const vector<double> &column_data,
+// One new model per cluster, in the order of clusters, holding the
+// cluster's elements of col_data.  col_data is read once, in row order, so
+// each model sees its rows in the order Cluster::insert_col inserts them.
+vector<ComponentModel *> View::new_column_models(const ColumnD &col_data,
+    const string &col_datatype, const CM_Hypers &hypers) const
+{
+    int num_clusters = clusters.size();
+    map<const Cluster *, int> cluster_idxs;
+    for (int cluster_idx = 0; cluster_idx < num_clusters; cluster_idx++) {
+        cluster_idxs[clusters[cluster_idx]] = cluster_idx;
+    }
+    // the index of each row's cluster, or -1 if the row is not in the view
+    // FIXME: assumes col_data is indexed by global row index
+    int num_rows = cluster_lookup.size();
+    vector<int> row_cluster_idxs(num_rows, -1);
+    const Cluster *p_cluster = NULL;
+    int cluster_idx = -1;
+    for (int row_idx = 0; row_idx < num_rows; row_idx++) {
+        const Cluster *p_row_cluster = cluster_lookup[row_idx];
+        if (p_row_cluster == NULL) {
+            continue;
+        }
+        // consecutive rows are often in the same cluster
+        if (p_row_cluster != p_cluster) {
+            p_cluster = p_row_cluster;
+            cluster_idx = cluster_idxs.find(p_cluster)->second;
+        }
+        assert((size_t)row_idx < col_data.size());
+        row_cluster_idxs[row_idx] = cluster_idx;
+    }
+    vector<ComponentModel *> models(num_clusters);
+    if (col_datatype == CONTINUOUS_DATATYPE) {
+        // accumulate the suffstats, in row order, and score each model once
+        // from them rather than after every element
+        vector<int> counts(num_clusters, 0);
+        vector<double> sums_x(num_clusters, 0.);
+        vector<double> sums_x_squared(num_clusters, 0.);
+        for (int row_idx = 0; row_idx < num_rows; row_idx++) {
+            int cluster_idx = row_cluster_idxs[row_idx];
+            double value = col_data[row_idx];
+            if (cluster_idx < 0 || isnan(value)) {
+                continue;
+            }
+            numerics::insert_to_continuous_suffstats(counts[cluster_idx],
+                sums_x[cluster_idx], sums_x_squared[cluster_idx], value);
+        }
+        for (int cluster_idx = 0; cluster_idx < num_clusters; cluster_idx++) {
+            models[cluster_idx] = new ContinuousComponentModel(hypers,
+                counts[cluster_idx], sums_x[cluster_idx],
+                sums_x_squared[cluster_idx]);
+        }
+        return models;
+    }
+    for (int cluster_idx = 0; cluster_idx < num_clusters; cluster_idx++) {
+        models[cluster_idx] = Cluster::new_component_model(col_datatype,
+                hypers);
+    }
+    for (int row_idx = 0; row_idx < num_rows; row_idx++) {
+        int cluster_idx = row_cluster_idxs[row_idx];
+        if (cluster_idx < 0) {
+            continue;
+        }
+        models[cluster_idx]->insert_element(col_data[row_idx]);
+    }
+    return models;
+}
+
+double View::calc_column_predictive_logp(const ColumnD &column_data,
     const string &col_datatype,
-    const vector<int> &data_global_row_indices,
     const CM_Hypers &hypers) const
 {
+    vector<ComponentModel *> models = new_column_models(column_data,
+            col_datatype, hypers);
     double score_delta = 0;
-    vector<Cluster *>::const_iterator it;
-    for (it = clusters.begin(); it != clusters.end(); ++it) {
-        score_delta += (**it).calc_column_predictive_logp(column_data, col_datatype,
-                data_global_row_indices,
-                hypers);
+    vector<ComponentModel *>::const_iterator it;
+    for (it = models.begin(); it != models.end(); ++it) {
+        score_delta += (**it).calc_marginal_logp();
+        delete *it;
     }
     return score_delta;
 }
@@ -546,7 +714,17 @@ double View::insert_row(const vector<double> &vd, Cluster &which_cluster,
             crp_logp_delta,
             data_logp_delta);
     which_cluster.insert_row(vd, row_idx);
+    if (cluster_lookup.size() <= (size_t)row_idx) {
+        cluster_lookup.resize(row_idx + 1, NULL);
+        cluster_positions.resize(row_idx + 1, -1);
+    }
+    assert(cluster_lookup[row_idx] == NULL);
     cluster_lookup[row_idx] = &which_cluster;
+    cluster_positions[row_idx] = which_cluster.get_count() - 1;
+    num_vectors++;
+    if (num_data_rows <= row_idx) {
+        set_row_data(vd, row_idx);
+    }
     crp_score += crp_logp_delta;
     data_score += data_logp_delta;
     return score_delta;
@@ -556,6 +734,8 @@ double View::insert_row(const vector<double> &vd,
     int matching_row_idx,
     int row_idx)
 {
+    assert((size_t)matching_row_idx < cluster_lookup.size());
+    assert(cluster_lookup[matching_row_idx] != NULL);
     Cluster &which_cluster = *cluster_lookup[matching_row_idx];
     double score_delta = insert_row(vd, which_cluster, row_idx);
     return score_delta;
@@ -573,9 +753,18 @@ double View::insert_row(const vector<double> &vd, int row_idx)
 
 double View::remove_row(const vector<double> &vd, int row_idx)
 {
-    Cluster &which_cluster = *(cluster_lookup[row_idx]);
-    cluster_lookup.erase(cluster_lookup.find(row_idx));
-    which_cluster.remove_row(vd, row_idx);
+    assert((size_t)row_idx < cluster_lookup.size());
+    assert(cluster_lookup[row_idx] != NULL);
+    Cluster &which_cluster = *cluster_lookup[row_idx];
+    int position = cluster_positions[row_idx];
+    cluster_lookup[row_idx] = NULL;
+    cluster_positions[row_idx] = -1;
+    num_vectors--;
+    which_cluster.remove_row(vd, row_idx, position);
+    // the cluster's last row was moved into the vacated position
+    if (position < which_cluster.get_count()) {
+        cluster_positions[which_cluster.get_row_idx(position)] = position;
+    }
     double crp_logp_delta, data_logp_delta;
     double score_delta = calc_cluster_vector_predictive_logp(vd, which_cluster,
             crp_logp_delta,
@@ -609,7 +798,7 @@ void View::set_row_partitioning(const vector<int> &global_row_indices)
     set_row_partitioning(crp_init);
 }
 
-double View::insert_col(const vector<double> &col_data,
+double View::insert_col(const ColumnD &col_data,
     const vector<int> &data_global_row_indices,
     int global_col_idx,
     CM_Hypers &hypers)
@@ -618,13 +807,37 @@ double View::insert_col(const vector<double> &col_data,
     string col_datatype = global_col_datatypes[global_col_idx];
     //
     hypers_v.push_back(&hypers);
-    vector<Cluster *>::const_iterator it;
-    for (it = clusters.begin(); it != clusters.end(); ++it) {
-        score_delta += (**it).insert_col(col_data, col_datatype,
-                data_global_row_indices, hypers);
+    datatypes_v.push_back(col_datatype);
+    predictive_table_stale = true;
+    vector<ComponentModel *> models = new_column_models(col_data,
+            col_datatype, hypers);
+    for (size_t cluster_idx = 0; cluster_idx < clusters.size(); cluster_idx++) {
+        score_delta += clusters[cluster_idx]->insert_col(models[cluster_idx]);
     }
     int num_cols = get_num_cols();
     global_to_local[global_col_idx] = num_cols;
+    // store the column as the new, last, local column; the other columns
+    // are only touched if the new one has rows they do not
+    int num_rows = num_data_rows;
+    vector<int>::const_iterator ri_it;
+    for (ri_it = data_global_row_indices.begin();
+        ri_it != data_global_row_indices.end(); ++ri_it) {
+        num_rows = std::max(num_rows, *ri_it + 1);
+    }
+    if (num_data_rows < num_rows) {
+        for (int local_col_idx = 0; local_col_idx < num_cols;
+            local_col_idx++) {
+            column_data[local_col_idx].resize(num_rows,
+                numeric_limits<double>::quiet_NaN());
+        }
+        num_data_rows = num_rows;
+    }
+    column_data.push_back(vector<double>());
+    vector<double> &new_column = column_data.back();
+    new_column.resize(num_rows, numeric_limits<double>::quiet_NaN());
+    for (size_t i = 0; i < data_global_row_indices.size(); i++) {
+        new_column[data_global_row_indices[i]] = col_data[i];
+    }
     data_score += score_delta;
     return score_delta;
 }
@@ -637,7 +850,7 @@ double View::insert_cols(const MatrixD &data,
     int num_cols = global_col_indices.size();
     double score_delta = 0;
     for (int data_col_idx = 0; data_col_idx < num_cols; data_col_idx++) {
-        vector<double> col_data = extract_col(data, data_col_idx);
+        ColumnD col_data = data.column(data_col_idx);
         int global_col_idx = global_col_indices[data_col_idx];
         CM_Hypers &hypers = hypers_m[global_col_idx];
         score_delta += insert_col(col_data, global_row_indices, global_col_idx,
@@ -656,10 +869,18 @@ double View::remove_col(int global_col_idx)
     for (it = clusters.begin(); it != clusters.end(); ++it) {
         score_delta += (*it)->remove_col(local_col_idx);
     }
+    // drop the column's data, shifting the later columns down by swaps
+    int num_cols = get_num_cols();
+    for (int col_idx = local_col_idx; col_idx < num_cols - 1; col_idx++) {
+        column_data[col_idx].swap(column_data[col_idx + 1]);
+    }
+    column_data.pop_back();
     // rearrange global_to_local
     vector<int> global_col_indices = extract_global_ordering(global_to_local);
     global_col_indices.erase(global_col_indices.begin() + local_col_idx);
     hypers_v.erase(hypers_v.begin() + local_col_idx);
+    datatypes_v.erase(datatypes_v.begin() + local_col_idx);
+    predictive_table_stale = true;
     global_to_local = construct_lookup_map(global_col_indices);
     //
     data_score -= score_delta;
@@ -684,6 +905,8 @@ void View::remove_if_empty(Cluster &which_cluster)
 void View::remove_all()
 {
     cluster_lookup.clear();
+    cluster_positions.clear();
+    num_vectors = 0;
     vector<Cluster *>::const_iterator it = clusters.begin();
     for (; it != clusters.end(); ++it) {
         Cluster &which_cluster = **it;
@@ -691,6 +914,9 @@ void View::remove_all()
         delete &which_cluster;
     }
     clusters.resize(0);
+    empty_cluster.delete_component_models();
+    table_clusters.clear();
+    predictive_table_stale = true;
 }
 
 double View::transition_z(const vector<double> &vd, int row_idx)
@@ -701,19 +927,102 @@ double View::transition_z(const vector<double> &vd, int row_idx)
     return score_delta;
 }
 
-double View::transition_zs(const map<int, vector<double> > &row_data_map)
+double View::transition_zs(ThreadPool *thread_pool)
 {
-    double score_delta = 0;
     vector<int> shuffled_row_indices = shuffle_row_indices();
-    vector<int>::iterator it = shuffled_row_indices.begin();
-    for (; it != shuffled_row_indices.end(); ++it) {
+    return transition_zs(shuffled_row_indices, thread_pool);
+}
+
+double View::transition_zs(const vector<int> &which_rows,
+    ThreadPool *thread_pool)
+{
+    if (thread_pool != NULL && 1 < which_rows.size()) {
+        return transition_zs_blocked(which_rows, *thread_pool);
+    }
+    double score_delta = 0;
+    vector<double> vd;
+    vector<int>::const_iterator it = which_rows.begin();
+    for (; it != which_rows.end(); ++it) {
         int row_idx = *it;
-        const vector<double> &vd = get(row_data_map, row_idx);
+        copy_row_data(row_idx, vd);
         score_delta += transition_z(vd, row_idx);
     }
     return score_delta;
 }
 
+// Scores a block of rows against the current clusters, through the view's
+// predictive table, which must be fresh.  The view is only read, and each
+// task writes only the logps of its own rows.
+class RowBlockScoringTask : public ParallelTask
+{
+public:
+    RowBlockScoringTask(const View &VIEW,
+        const vector<vector<double> > &BLOCK_DATA,
+        vector<vector<double> > &BLOCK_LOGPS,
+        int ROWS_PER_TASK) : view(VIEW), block_data(BLOCK_DATA),
+        block_logps(BLOCK_LOGPS), rows_per_task(ROWS_PER_TASK) {}
+    void run(int task_idx)
+    {
+        size_t start = task_idx * rows_per_task;
+        size_t end = std::min(start + rows_per_task, block_logps.size());
+        for (size_t i = start; i < end; i++) {
+            block_logps[i] = view.calc_table_predictive_logps(
+                    block_data[i]);
+        }
+    }
+private:
+    const View &view;
+    const vector<vector<double> > &block_data;
+    vector<vector<double> > &block_logps;
+    int rows_per_task;
+};
+
+// Partitioned Gibbs sweep: which_rows is cut into blocks of a few rows per
+// thread.  All rows of a block are removed, scored against the remaining
+// clusters in parallel, and then reassigned in order.  Rows within a block
+// do not see each other's new assignments, which is the approximation.
+// Random draws are all made here, in order, so the chain is reproducible
+// for a given number of threads; one thread is exact sequential Gibbs.
+double View::transition_zs_blocked(const vector<int> &which_rows,
+    ThreadPool &thread_pool)
+{
+    const int rows_per_task = 4;
+    int num_threads = thread_pool.get_num_threads();
+    int block_size = num_threads == 1 ? 1 : num_threads * rows_per_task;
+    int num_rows = which_rows.size();
+    double score_delta = 0;
+    vector<vector<double> > block_data(block_size);
+    vector<vector<double> > block_logps;
+    for (int block_start = 0; block_start < num_rows;
+        block_start += block_size) {
+        int block_end = std::min(block_start + block_size, num_rows);
+        int num_block_rows = block_end - block_start;
+        for (int i = 0; i < num_block_rows; i++) {
+            int row_idx = which_rows[block_start + i];
+            copy_row_data(row_idx, block_data[i]);
+            score_delta += remove_row(block_data[i], row_idx);
+        }
+        block_logps.resize(num_block_rows);
+        int num_tasks = (num_block_rows + rows_per_task - 1) / rows_per_task;
+        refresh_predictive_table();
+        RowBlockScoringTask task(*this, block_data, block_logps,
+            rows_per_task);
+        thread_pool.run(task, num_tasks);
+        for (int i = 0; i < num_block_rows; i++) {
+            const vector<double> &unorm_logps = block_logps[i];
+            double rand_u = draw_rand_u();
+            int draw = numerics::draw_sample_unnormalized(unorm_logps, rand_u);
+            // the last logp is for a new cluster, even if an earlier row
+            // of this block has appended one since the logps were computed
+            bool is_new = draw == (int) unorm_logps.size() - 1;
+            Cluster &which_cluster = is_new ? get_new_cluster() : *clusters[draw];
+            score_delta += insert_row(block_data[i], which_cluster,
+                    which_rows[block_start + i]);
+        }
+    }
+    return score_delta;
+}
+
 double View::transition_crp_alpha()
 {
     // to make score_crp not calculate absolute, need to track score deltas
@@ -736,22 +1045,47 @@ vector<double> View::align_data(const vector<double> &raw_values,
 
 vector<int> View::shuffle_row_indices()
 {
-    // can't use std::random_shuffle b/c need to control seed
-    vector<int> original_order;
-    map<int, Cluster *>::iterator it = cluster_lookup.begin();
-    for (; it != cluster_lookup.end(); ++it) {
-        original_order.push_back(it->first);
-    }
     vector<int> shuffled_order;
-    while (original_order.size() != 0) {
-        int draw = draw_rand_i(original_order.size());
-        int row_idx = original_order[draw];
-        shuffled_order.push_back(row_idx);
-        original_order.erase(original_order.begin() + draw);
+    shuffled_order.reserve(num_vectors);
+    for (size_t row_idx = 0; row_idx < cluster_lookup.size(); row_idx++) {
+        if (cluster_lookup[row_idx] != NULL) {
+            shuffled_order.push_back(row_idx);
+        }
+    }
+    // Fisher-Yates, drawing from this view's rng so the seed controls it
+    for (int i = shuffled_order.size() - 1; 0 < i; i--) {
+        int draw = draw_rand_i(i + 1);
+        std::swap(shuffled_order[i], shuffled_order[draw]);
     }
     return shuffled_order;
 }
 
+void View::copy_row_data(int row_idx, vector<double> &vd) const
+{
+    assert(0 <= row_idx && row_idx < num_data_rows);
+    int num_cols = global_to_local.size();
+    vd.resize(num_cols);
+    for (int local_col_idx = 0; local_col_idx < num_cols; local_col_idx++) {
+        vd[local_col_idx] = column_data[local_col_idx][row_idx];
+    }
+}
+
+void View::set_row_data(const vector<double> &vd, int row_idx)
+{
+    int num_cols = global_to_local.size();
+    assert(vd.size() == (size_t) num_cols);
+    if (num_data_rows <= row_idx) {
+        num_data_rows = row_idx + 1;
+    }
+    for (int local_col_idx = 0; local_col_idx < num_cols; local_col_idx++) {
+        vector<double> &column = column_data[local_col_idx];
+        if (column.size() < (size_t) num_data_rows) {
+            column.resize(num_data_rows, numeric_limits<double>::quiet_NaN());
+        }
+        column[row_idx] = vd[local_col_idx];
+    }
+}
+
 vector<vector<int> > View::get_cluster_groupings() const
 {
     vector<vector<int> > cluster_groupings;
@@ -769,7 +1103,7 @@ vector<int> View::get_canonical_clustering() const
     map<Cluster *, int> view_to_int = vector_to_map(clusters);
     vector<int> canonical_clustering;
     for (unsigned int i = 0; i < cluster_lookup.size(); i++) {
-        Cluster *p_c = cluster_lookup.find(i)->second;
+        Cluster *p_c = cluster_lookup[i];
         int canonical_cluster_idx = view_to_int[p_c];
         canonical_clustering.push_back(canonical_cluster_idx);
     }
@@ -245,6 +245,42 @@ double calc_continuous_hyperprior(double r, double nu, double s)
     return logp;
 }
 
+// Counts up to COUNT_TABLE_SIZE cover the clusters and categories of all
+// but very large tables; bigger counts are computed directly.  The tables
+// are filled once, when the library is loaded, and only read afterwards,
+// so they are safe to share between threads.
+static const int COUNT_TABLE_SIZE = 1 << 16;
+
+static vector<double> make_count_table(double (*f)(double))
+{
+    vector<double> table(COUNT_TABLE_SIZE);
+    for (int n = 0; n < COUNT_TABLE_SIZE; n++) {
+        table[n] = f(n);
+    }
+    return table;
+}
+
+static const vector<double> LOG_COUNT_TABLE = make_count_table(log);
+static const vector<double> LGAMMA_COUNT_TABLE = make_count_table(lgamma);
+
+double log_count(int n)
+{
+    assert(0 <= n);
+    if (n < COUNT_TABLE_SIZE) {
+        return LOG_COUNT_TABLE[n];
+    }
+    return log(n);
+}
+
+double lgamma_count(int n)
+{
+    assert(0 <= n);
+    if (n < COUNT_TABLE_SIZE) {
+        return LGAMMA_COUNT_TABLE[n];
+    }
+    return lgamma(n);
+}
+
 double logaddexp(const vector<double> &logs)
 {
     double maximum = *std::max_element(logs.begin(), logs.end());
@@ -376,42 +412,67 @@ int crp_draw_sample(const vector<int> &counts, int sum_counts, double alpha,
 }
 
 // p(alpha | clusters)
-double calc_crp_alpha_conditional(const vector<int> &counts,
-    double alpha, int sum_counts,
-    bool absolute)
+static double calc_sum_log_gammas(const vector<int> &counts)
 {
-    int num_clusters = counts.size();
-    if (sum_counts == -1) {
-        sum_counts = std::accumulate(counts.begin(), counts.end(), 0);
+    double sum_log_gammas = 0;
+    vector<int>::const_iterator it = counts.begin();
+    for (; it != counts.end(); it++) {
+        sum_log_gammas += lgamma_count(*it);
     }
+    return sum_log_gammas;
+}
+
+static double calc_crp_alpha_conditional(int num_clusters, int sum_counts,
+    double alpha, bool absolute, double sum_log_gammas)
+{
     double logp = lgamma(alpha)         \
         + num_clusters * log(alpha)           \
         - lgamma(alpha + sum_counts);
     // absolute necessary for determining true distribution rather than relative
     if (absolute) {
-        double sum_log_gammas = 0;
-        vector<int>::const_iterator it = counts.begin();
-        for (; it != counts.end(); it++) {
-            sum_log_gammas += lgamma(*it);
-        }
         logp += sum_log_gammas;
     }
     logp += calc_crp_alpha_hyperprior(alpha);
     return logp;
 }
 
+double calc_crp_alpha_conditional(const vector<int> &counts,
+    double alpha, int sum_counts,
+    bool absolute)
+{
+    int num_clusters = counts.size();
+    if (sum_counts == -1) {
+        sum_counts = std::accumulate(counts.begin(), counts.end(), 0);
+    }
+    double sum_log_gammas = absolute ? calc_sum_log_gammas(counts) : 0;
+    return calc_crp_alpha_conditional(num_clusters, sum_counts, alpha,
+            absolute, sum_log_gammas);
+}
+
 // helper for may calls to calc_crp_alpha_conditional
 vector<double> calc_crp_alpha_conditionals(const vector<double> &grid,
     const vector<int> &counts,
     bool absolute)
 {
     int sum_counts = std::accumulate(counts.begin(), counts.end(), 0);
+    return calc_crp_alpha_conditionals(grid, counts, sum_counts, absolute);
+}
+
+// the counts' part of the conditional doesn't depend on alpha, so it is
+// computed once for the whole grid
+vector<double> calc_crp_alpha_conditionals(const vector<double> &grid,
+    const vector<int> &counts,
+    int sum_counts, bool absolute)
+{
+    int num_clusters = counts.size();
+    double sum_log_gammas = absolute ? calc_sum_log_gammas(counts) : 0;
     vector<double> logps;
+    logps.reserve(grid.size());
     vector<double>::const_iterator it = grid.begin();
     for (; it != grid.end(); it++) {
         double alpha = *it;
-        double logp = calc_crp_alpha_conditional(counts, alpha,
-                sum_counts, absolute);
+        double logp = calc_crp_alpha_conditional(num_clusters, sum_counts,
+                alpha, absolute, sum_log_gammas);
         logps.push_back(logp);
     }
     // note: prior distribution must still be added
@@ -432,6 +493,21 @@ double calc_cluster_crp_logp(double cluster_weight, double sum_weights,
     return log_probability;
 }
 
+// calc_cluster_crp_logp of each count, sharing the denominator
+vector<double> calc_cluster_crp_logps(const vector<int> &counts,
+    int sum_counts, double alpha)
+{
+    double log_alpha = log(alpha);
+    double log_denominator = log(sum_counts + alpha);
+    vector<double> logps(counts.size());
+    for (size_t i = 0; i < counts.size(); i++) {
+        int count = counts[i];
+        double log_numerator = count == 0 ? log_alpha : log_count(count);
+        logps[i] = log_numerator - log_denominator;
+    }
+    return logps;
+}
+
 void insert_to_continuous_suffstats(int &count,
     double &sum_x, double &sum_x_sq,
     double el)
@@ -661,6 +737,52 @@ vector<double> calc_continuous_mu_conditionals(const vector<double> &mu_grid,
     return logps;
 }
 
+// The per-cluster *_conditionals above, summed over the clusters of a
+// column, whose suffstats are given as parallel arrays.  The hyperprior
+// normalizer depends only on the grid point, so it is computed once per
+// grid point rather than once per cluster.
+vector<double> calc_continuous_hyper_conditionals(const string &which_hyper,
+    const vector<double> &hyper_grid,
+    const vector<int> &counts,
+    const vector<double> &sum_xs,
+    const vector<double> &sum_x_sqs,
+    double r, double nu, double s, double mu)
+{
+    double *p_hyper;
+    if (which_hyper == "r") {
+        p_hyper = &r;
+    } else if (which_hyper == "nu") {
+        p_hyper = &nu;
+    } else if (which_hyper == "s") {
+        p_hyper = &s;
+    } else if (which_hyper == "mu") {
+        p_hyper = &mu;
+    } else {
+        // error condition
+        vector<double> error;
+        return error;
+    }
+    int num_clusters = counts.size();
+    vector<double> logps(hyper_grid.size(), 0.);
+    for (size_t grid_idx = 0; grid_idx < hyper_grid.size(); grid_idx++) {
+        *p_hyper = hyper_grid[grid_idx];
+        double log_Z_0 = calc_continuous_log_Z(r, nu, s);
+        double logp = 0;
+        for (int cluster_idx = 0; cluster_idx < num_clusters; cluster_idx++) {
+            double r_prime = r;
+            double nu_prime = nu;
+            double s_prime = s;
+            double mu_prime = mu;
+            update_continuous_hypers(counts[cluster_idx], sum_xs[cluster_idx],
+                sum_x_sqs[cluster_idx], r_prime, nu_prime, s_prime, mu_prime);
+            logp += calc_continuous_logp(counts[cluster_idx],
+                    r_prime, nu_prime, s_prime, log_Z_0);
+        }
+        logps[grid_idx] = logp;
+    }
+    return logps;
+}
+
 double calc_multinomial_marginal_logp(int count,
     const vector<int> &counts,
     int K,
@@ -717,6 +839,56 @@ vector<double> calc_multinomial_dirichlet_alpha_conditional(
     return logps;
 }
 
+// calc_multinomial_dirichlet_alpha_conditional summed over clusters.
+// label_counts holds the K label counts of each cluster in turn.  When
+// there are more labels than distinct count values, lgamma(n + alpha) is
+// tabulated per grid point instead of evaluated per label.
+vector<double> calc_multinomial_dirichlet_alpha_conditionals(
+    const vector<double> &dirichlet_alpha_grid,
+    const vector<int> &counts,
+    const vector<int> &label_counts,
+    int K)
+{
+    int num_clusters = counts.size();
+    assert(label_counts.size() == (size_t) num_clusters * K);
+    int max_label_count = 0;
+    if (!label_counts.empty()) {
+        max_label_count = *std::max_element(label_counts.begin(),
+                label_counts.end());
+    }
+    bool use_table = (size_t) max_label_count < label_counts.size();
+    vector<double> lgamma_table;
+    vector<double> logps(dirichlet_alpha_grid.size(), 0.);
+    for (size_t grid_idx = 0; grid_idx < dirichlet_alpha_grid.size();
+        grid_idx++) {
+        double dirichlet_alpha = dirichlet_alpha_grid[grid_idx];
+        double lgamma_K_alpha = lgamma(K * dirichlet_alpha);
+        double K_lgamma_alpha = K * lgamma(dirichlet_alpha);
+        if (use_table) {
+            lgamma_table.resize(max_label_count + 1);
+            for (int n = 0; n <= max_label_count; n++) {
+                lgamma_table[n] = lgamma(n + dirichlet_alpha);
+            }
+        }
+        double logp = 0;
+        vector<int>::const_iterator label_it = label_counts.begin();
+        for (int cluster_idx = 0; cluster_idx < num_clusters; cluster_idx++) {
+            double sum_lgammas = 0;
+            for (int key = 0; key < K; key++, ++label_it) {
+                int label_count = *label_it;
+                sum_lgammas += use_table ? lgamma_table[label_count]
+                    : lgamma(label_count + dirichlet_alpha);
+            }
+            logp += lgamma_K_alpha    \
+                - K_lgamma_alpha      \
+                + sum_lgammas         \
+                - lgamma(counts[cluster_idx] + K * dirichlet_alpha);
+        }
+        logps[grid_idx] = logp;
+    }
+    return logps;
+}
+
 
 // Cyclic component model
 void insert_to_cyclic_suffstats(int &count,
@@ -853,6 +1025,49 @@ vector<double> calc_cyclic_kappa_conditionals(const vector<double> &kappa_grid,
     return logps;
 }
 
+// The per-cluster cyclic conditionals above, summed over clusters, with the
+// terms that depend only on the grid point computed once per grid point.
+vector<double> calc_cyclic_hyper_conditionals(const string &which_hyper,
+    const vector<double> &hyper_grid,
+    const vector<int> &counts,
+    const vector<double> &sum_sin_xs,
+    const vector<double> &sum_cos_xs,
+    double kappa, double a, double b)
+{
+    double *p_hyper;
+    if (which_hyper == "a") {
+        p_hyper = &a;
+    } else if (which_hyper == "b") {
+        p_hyper = &b;
+    } else if (which_hyper == "kappa") {
+        p_hyper = &kappa;
+    } else {
+        // error condition
+        vector<double> error;
+        return error;
+    }
+    int num_clusters = counts.size();
+    vector<double> logps(hyper_grid.size(), 0.);
+    for (size_t grid_idx = 0; grid_idx < hyper_grid.size(); grid_idx++) {
+        *p_hyper = hyper_grid[grid_idx];
+        double log_Z_0 = calc_cyclic_log_Z(a);
+        double log_norm = LOG_2PI + log_bessel_0(kappa);
+        double logp = 0;
+        for (int cluster_idx = 0; cluster_idx < num_clusters; cluster_idx++) {
+            double a_prime = a;
+            double b_prime = b;
+            update_cyclic_hypers(counts[cluster_idx], sum_sin_xs[cluster_idx],
+                sum_cos_xs[cluster_idx], kappa, a_prime, b_prime);
+            // calc_cyclic_logp, with log_norm hoisted
+            double cluster_logp = -double(counts[cluster_idx]) * log_norm;
+            cluster_logp += calc_cyclic_log_Z(a_prime) - log_Z_0;
+            logp += cluster_logp;
+        }
+        logps[grid_idx] = logp;
+    }
+    return logps;
+}
+
 } // namespace numerics
 
 // References
@@ -20,6 +20,7 @@
 #include <iostream>
 #include <algorithm>
 #include <vector>
+#include <limits>
 #include "ContinuousComponentModel.h"
 #include "RandomNumberGenerator.h"
 #include "utils.h"
@@ -165,6 +166,16 @@ int main(int argc, char** argv) {
     insert_elements(ccm, values_to_test);
     cout << endl << "component model after insertion of data" << endl;
     cout << ccm << endl;
+    // predictive logps must match the change in marginal logp on insertion
+    for (int i = 0; i < num_values_to_test; i++) {
+        double value = values_to_test_shuffled[i];
+        double predictive_logp = ccm.calc_element_predictive_logp(value);
+        double marginal_logp_0 = ccm.calc_marginal_logp();
+        ccm.insert_element(value);
+        double marginal_logp_delta = ccm.calc_marginal_logp() - marginal_logp_0;
+        ccm.remove_element(value);
+        assert(is_almost(predictive_logp, marginal_logp_delta, 1E-8));
+    }
     // test hypers
     int N_grid = 11;
     double test_scale = 10;
@@ -247,5 +258,19 @@ int main(int argc, char** argv) {
     assert(is_almost(ccm2.calc_element_predictive_logp(2), -4.67271754595,
                      precision));
 
+    // The batched constrained predictive agrees with the one-at-a-time one.
+    vector<double> constraints;
+    constraints.push_back(5);
+    constraints.push_back(6.5);
+    vector<double> elements = values_to_test;
+    elements.push_back(numeric_limits<double>::quiet_NaN());
+    vector<double> logps = ccm2.calc_element_predictive_logps_constrained(
+        elements, constraints);
+    assert(logps.size() == elements.size());
+    for (size_t i = 0; i < elements.size(); i++) {
+        assert(logps[i] == ccm2.calc_element_predictive_logp_constrained(
+            elements[i], constraints));
+    }
+
     cout << "Stop:: test_component model" << endl;
 }
@@ -70,6 +70,43 @@ int main(int argc, char **argv) {
 	}
     }
 
+    // Confirm column views see the copy's elements without copying them.
+    for (j = 0; j < m; j++) {
+	strided_view<std::pair<size_t, size_t> > col = N.column(j);
+	assert(col.size() == n);
+	for (i = 0; i < n; i++)
+	    assert(&col[i] == &N(i, j));
+    }
+
+    // Confirm a vector can stand in for a view.
+    std::vector<double> v(3, 1.5);
+    ColumnD vcol = v;
+    assert(vcol.size() == 3);
+    assert(&vcol[2] == &v[2]);
+
+    // Confirm a borrowing matrix reads the buffer in place, and that its
+    // copies own their elements.
+    std::vector<double> buffer(n * m);
+    for (i = 0; i < n * m; i++)
+	buffer[i] = i;
+    {
+	MatrixD B(n, m, &buffer[0]);
+	assert(B.size1() == n);
+	assert(B.size2() == m);
+	for (i = 0; i < n; i++)
+	    for (j = 0; j < m; j++)
+		assert(&B(i, j) == &buffer[i * m + j]);
+	MatrixD C = B;
+	assert(&C(0, 0) != &buffer[0]);
+	C(1, 2) = -1;
+	assert(B(1, 2) == m + 2);
+	// Confirm assigning to a borrowing matrix does not free the buffer.
+	B = C;
+	assert(B(1, 2) == -1);
+	assert(buffer[m + 2] == m + 2);
+    }
+    assert(buffer[n * m - 1] == n * m - 1);
+
     // Confirm MatrixD = matrix<double> by confirming the pointer
     // types are compatible.
     matrix<double> MD0(42, 42);
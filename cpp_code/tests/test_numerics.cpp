@@ -117,6 +117,117 @@ static void test_logaddexp(void) {
     assert(numerics::logaddexp(v) == -1000);
 }
 
+static void test_count_tables(void) {
+    const int counts[] = {1, 2, 7, 1000, (1 << 16) - 1, 1 << 16, 1 << 20};
+    for (size_t i = 0; i < sizeof(counts)/sizeof(*counts); i++) {
+        int n = counts[i];
+        assert(numerics::log_count(n) == log(n));
+        assert(numerics::lgamma_count(n) == lgamma(n));
+    }
+}
+
+static void test_crp_alpha_conditionals(void) {
+    vector<int> counts;
+    counts.push_back(3);
+    counts.push_back(1);
+    counts.push_back(12);
+    vector<double> grid = log_linspace(.1, 100, 7);
+    vector<double> logps = numerics::calc_crp_alpha_conditionals(grid, counts,
+        16, true);
+    assert(logps.size() == grid.size());
+    for (size_t i = 0; i < grid.size(); i++) {
+        assert(logps[i] ==
+            numerics::calc_crp_alpha_conditional(counts, grid[i], 16, true));
+    }
+    counts.push_back(0);
+    vector<double> crp_logps = numerics::calc_cluster_crp_logps(counts, 16, 2.5);
+    for (size_t i = 0; i < counts.size(); i++) {
+        assert(crp_logps[i] ==
+            numerics::calc_cluster_crp_logp(counts[i], 16, 2.5));
+    }
+}
+
+#define arraycount(A) (sizeof(A)/sizeof(*(A)))
+
+// Sums the per-cluster conditionals, to check the batched ones against.
+static void add_conditionals(vector<double> &sums, const vector<double> &logps) {
+    sums.resize(logps.size(), 0.);
+    for (size_t i = 0; i < logps.size(); i++)
+        sums[i] += logps[i];
+}
+
+static void test_hyper_conditionals(void) {
+    const int counts_a[] = {4, 1, 9};
+    const double sum_xs_a[] = {1.5, -0.25, 12.};
+    const double sum_x_sqs_a[] = {3.25, 0.0625, 30.};
+    vector<int> counts(counts_a, counts_a + 3);
+    vector<double> sum_xs(sum_xs_a, sum_xs_a + 3);
+    vector<double> sum_x_sqs(sum_x_sqs_a, sum_x_sqs_a + 3);
+    vector<double> grid = log_linspace(.5, 20, 9);
+    double r = 2, nu = 3, s = 1.5, mu = .25;
+
+    vector<double> r_sums, nu_sums, s_sums, mu_sums;
+    for (size_t i = 0; i < counts.size(); i++) {
+        add_conditionals(r_sums, numerics::calc_continuous_r_conditionals(grid,
+            counts[i], sum_xs[i], sum_x_sqs[i], nu, s, mu));
+        add_conditionals(nu_sums, numerics::calc_continuous_nu_conditionals(grid,
+            counts[i], sum_xs[i], sum_x_sqs[i], r, s, mu));
+        add_conditionals(s_sums, numerics::calc_continuous_s_conditionals(grid,
+            counts[i], sum_xs[i], sum_x_sqs[i], r, nu, mu));
+        add_conditionals(mu_sums, numerics::calc_continuous_mu_conditionals(grid,
+            counts[i], sum_xs[i], sum_x_sqs[i], r, nu, s));
+    }
+    assert(r_sums == numerics::calc_continuous_hyper_conditionals("r", grid,
+        counts, sum_xs, sum_x_sqs, r, nu, s, mu));
+    assert(nu_sums == numerics::calc_continuous_hyper_conditionals("nu", grid,
+        counts, sum_xs, sum_x_sqs, r, nu, s, mu));
+    assert(s_sums == numerics::calc_continuous_hyper_conditionals("s", grid,
+        counts, sum_xs, sum_x_sqs, r, nu, s, mu));
+    assert(mu_sums == numerics::calc_continuous_hyper_conditionals("mu", grid,
+        counts, sum_xs, sum_x_sqs, r, nu, s, mu));
+    assert(numerics::calc_continuous_hyper_conditionals("x", grid,
+        counts, sum_xs, sum_x_sqs, r, nu, s, mu).empty());
+
+    // sum_xs, sum_x_sqs double as sums of sines and cosines
+    double kappa = 2, a = .5, b = 1;
+    vector<double> kappa_sums, a_sums, b_sums;
+    for (size_t i = 0; i < counts.size(); i++) {
+        add_conditionals(kappa_sums, numerics::calc_cyclic_kappa_conditionals(
+            grid, counts[i], sum_xs[i], sum_x_sqs[i], a, b));
+        add_conditionals(a_sums, numerics::calc_cyclic_a_conditionals(
+            grid, counts[i], sum_xs[i], sum_x_sqs[i], kappa, b));
+        add_conditionals(b_sums, numerics::calc_cyclic_b_conditionals(
+            grid, counts[i], sum_xs[i], sum_x_sqs[i], kappa, a));
+    }
+    assert(kappa_sums == numerics::calc_cyclic_hyper_conditionals("kappa",
+        grid, counts, sum_xs, sum_x_sqs, kappa, a, b));
+    assert(a_sums == numerics::calc_cyclic_hyper_conditionals("a",
+        grid, counts, sum_xs, sum_x_sqs, kappa, a, b));
+    assert(b_sums == numerics::calc_cyclic_hyper_conditionals("b",
+        grid, counts, sum_xs, sum_x_sqs, kappa, a, b));
+
+    // with few labels lgamma is evaluated directly, with many it is tabulated
+    const int Ks[] = {3, 40};
+    for (size_t k = 0; k < arraycount(Ks); k++) {
+        int K = Ks[k];
+        vector<int> label_counts;
+        vector<double> alpha_sums;
+        for (size_t i = 0; i < counts.size(); i++) {
+            vector<int> cluster_label_counts(K, 0);
+            for (int j = 0; j < counts[i]; j++)
+                cluster_label_counts[(j * 7) % K]++;
+            label_counts.insert(label_counts.end(),
+                cluster_label_counts.begin(), cluster_label_counts.end());
+            add_conditionals(alpha_sums,
+                numerics::calc_multinomial_dirichlet_alpha_conditional(grid,
+                    counts[i], cluster_label_counts, K));
+        }
+        assert(alpha_sums ==
+            numerics::calc_multinomial_dirichlet_alpha_conditionals(grid,
+                counts, label_counts, K));
+    }
+}
+
 // The values of the modified Bessel function of the first kind with
 // nu = 0, 1 tend to overflow outside [-709, +709], depending on the
 // exact method used to evaluate it.  So just test a uniform grid of
@@ -124,8 +235,6 @@ static void test_logaddexp(void) {
 // implementation changes, generated by the program bessel.cpp using
 // boost 1.54.0.1 on Ubuntu 14.04 amd64.
 
-#define arraycount(A) (sizeof(A)/sizeof(*(A)))
-
 static void test_bessel(void) {
     static const double i0e[][2] = {
         // Uniform [-709, +709] grid
@@ -761,6 +870,9 @@ int main(int argc, char** argv) {
     test_linspace();
     test_log_linspace();
     test_logaddexp();
+    test_count_tables();
+    test_crp_alpha_conditionals();
+    test_hyper_conditionals();
     test_bessel();
 
     return 0;
@@ -0,0 +1,138 @@
+/*
+ *   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+ *
+ *   Lead Developers: Dan Lovell and Jay Baxter
+ *   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+ *   Research Leads: Vikash Mansinghka, Patrick Shafto
+ *
+ *   Licensed under the Apache License, Version 2.0 (the "License");
+ *   you may not use this file except in compliance with the License.
+ *   You may obtain a copy of the License at
+ *
+ *       http://www.apache.org/licenses/LICENSE-2.0
+ *
+ *   Unless required by applicable law or agreed to in writing, software
+ *   distributed under the License is distributed on an "AS IS" BASIS,
+ *   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ *   See the License for the specific language governing permissions and
+ *   limitations under the License.
+ */
+#include <cassert>
+#include <cmath>
+#include <iostream>
+#include <limits>
+#include <string>
+#include <vector>
+
+#include "Cluster.h"
+#include "PredictiveTable.h"
+#include "RandomNumberGenerator.h"
+#include "constants.h"
+#include "utils.h"
+
+using namespace std;
+
+static const int K = 5;
+
+static vector<string> create_datatypes()
+{
+    vector<string> datatypes;
+    datatypes.push_back(CONTINUOUS_DATATYPE);
+    datatypes.push_back(MULTINOMIAL_DATATYPE);
+    datatypes.push_back(CYCLIC_DATATYPE);
+    datatypes.push_back(CONTINUOUS_DATATYPE);
+    return datatypes;
+}
+
+static vector<CM_Hypers> create_hypers(const vector<string> &datatypes)
+{
+    vector<CM_Hypers> hypers_v(datatypes.size());
+    for (size_t col_idx = 0; col_idx < datatypes.size(); col_idx++) {
+        CM_Hypers &hypers = hypers_v[col_idx];
+        if (datatypes[col_idx] == CONTINUOUS_DATATYPE) {
+            hypers["r"] = 1.5;
+            hypers["nu"] = 2.0;
+            hypers["s"] = 2.0;
+            hypers["mu"] = 0.5 * col_idx;
+        } else if (datatypes[col_idx] == MULTINOMIAL_DATATYPE) {
+            hypers["dirichlet_alpha"] = 0.7;
+            hypers["K"] = K;
+        } else {
+            hypers["kappa"] = 2.0;
+            hypers["a"] = 1.5;
+            hypers["b"] = 0.3;
+        }
+    }
+    return hypers_v;
+}
+
+static vector<double> draw_row(const vector<string> &datatypes,
+    RandomNumberGenerator &rng)
+{
+    vector<double> row;
+    for (size_t col_idx = 0; col_idx < datatypes.size(); col_idx++) {
+        if (datatypes[col_idx] == MULTINOMIAL_DATATYPE) {
+            row.push_back(rng.nexti(K));
+        } else if (datatypes[col_idx] == CYCLIC_DATATYPE) {
+            row.push_back(2 * M_PI * rng.next());
+        } else {
+            row.push_back(4 * rng.next() - 2);
+        }
+    }
+    return row;
+}
+
+// Every slot must score each row exactly as its cluster does.
+static void test_matches_clusters(int num_clusters)
+{
+    RandomNumberGenerator rng(num_clusters);
+    vector<string> datatypes = create_datatypes();
+    vector<CM_Hypers> hypers = create_hypers(datatypes);
+    vector<CM_Hypers *> hypers_v;
+    for (size_t col_idx = 0; col_idx < hypers.size(); col_idx++) {
+        hypers_v.push_back(&hypers[col_idx]);
+    }
+    // cluster i holds i rows; cluster 0 is empty
+    vector<Cluster *> clusters;
+    int row_idx = 0;
+    for (int cluster_idx = 0; cluster_idx < num_clusters; cluster_idx++) {
+        Cluster *p_cluster = new Cluster(hypers_v);
+        for (int i = 0; i < cluster_idx; i++) {
+            p_cluster->insert_row(draw_row(datatypes, rng), row_idx++);
+        }
+        clusters.push_back(p_cluster);
+    }
+    PredictiveTable table;
+    table.set_columns(datatypes, hypers_v);
+    table.resize(num_clusters);
+    assert(table.get_num_cols() == (int) datatypes.size());
+    assert(table.get_num_slots() == num_clusters);
+    for (int cluster_idx = 0; cluster_idx < num_clusters; cluster_idx++) {
+        table.set_slot(cluster_idx, *clusters[cluster_idx]);
+    }
+    for (int trial = 0; trial < 20; trial++) {
+        vector<double> row = draw_row(datatypes, rng);
+        if (trial % 2) {
+            row[trial % row.size()] = numeric_limits<double>::quiet_NaN();
+        }
+        vector<double> logps(num_clusters, 0.);
+        table.add_row_predictive_logps(row, logps);
+        for (int cluster_idx = 0; cluster_idx < num_clusters; cluster_idx++) {
+            assert(logps[cluster_idx] == \
+                clusters[cluster_idx]->calc_row_predictive_logp(row));
+        }
+    }
+    for (int cluster_idx = 0; cluster_idx < num_clusters; cluster_idx++) {
+        clusters[cluster_idx]->delete_component_models(false);
+        delete clusters[cluster_idx];
+    }
+}
+
+int main(int argc, char **argv)
+{
+    cout << "Begin:: test_predictive_table" << endl;
+    test_matches_clusters(1);
+    test_matches_clusters(7);
+    cout << "Stop:: test_predictive_table" << endl;
+    return 0;
+}
@@ -0,0 +1,67 @@
+/*
+ *   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+ *
+ *   Lead Developers: Dan Lovell and Jay Baxter
+ *   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+ *   Research Leads: Vikash Mansinghka, Patrick Shafto
+ *
+ *   Licensed under the Apache License, Version 2.0 (the "License");
+ *   you may not use this file except in compliance with the License.
+ *   You may obtain a copy of the License at
+ *
+ *       http://www.apache.org/licenses/LICENSE-2.0
+ *
+ *   Unless required by applicable law or agreed to in writing, software
+ *   distributed under the License is distributed on an "AS IS" BASIS,
+ *   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ *   See the License for the specific language governing permissions and
+ *   limitations under the License.
+ */
+#include <cassert>
+#include <iostream>
+#include <vector>
+
+#include "ThreadPool.h"
+
+using namespace std;
+
+class SquareTask : public ParallelTask
+{
+public:
+    SquareTask(vector<int> &OUT) : out(OUT) {}
+    void run(int task_idx)
+    {
+        out[task_idx] = task_idx * task_idx;
+    }
+private:
+    vector<int> &out;
+};
+
+static void test_run_covers_every_task(int num_threads, int num_tasks)
+{
+    ThreadPool pool(num_threads);
+    assert(pool.get_num_threads() == (num_threads < 1 ? 1 : num_threads));
+    // run several batches through the same pool
+    for (int batch = 0; batch < 20; batch++) {
+        vector<int> out(num_tasks, -1);
+        SquareTask task(out);
+        pool.run(task, num_tasks);
+        for (int i = 0; i < num_tasks; i++) {
+            assert(out[i] == i * i);
+        }
+    }
+}
+
+int main(int argc, char **argv)
+{
+    cout << "Begin:: test_thread_pool" << endl;
+    test_run_covers_every_task(0, 5);
+    test_run_covers_every_task(1, 5);
+    test_run_covers_every_task(4, 0);
+    test_run_covers_every_task(4, 1);
+    test_run_covers_every_task(4, 3);
+    test_run_covers_every_task(4, 1000);
+    test_run_covers_every_task(16, 7);
+    cout << "Stop:: test_thread_pool" << endl;
+    return 0;
+}
@@ -348,7 +348,7 @@ int main(int argc, char** argv) {
     RandomNumberGenerator rng = RandomNumberGenerator();
     for (int iter = 0; iter < 21; iter++) {
         v.assert_state_consistency();
-        v.transition_zs(data_map);
+        v.transition_zs();
         v.transition_crp_alpha();
         for (int col_idx = 0; col_idx < num_cols; col_idx++) {
             random_shuffle(hyper_strings.begin(), hyper_strings.end(), rng);
@@ -201,7 +201,7 @@ int main(int argc, char** argv) {
     RandomNumberGenerator rng = RandomNumberGenerator();
     for (int iter = 0; iter < 21; iter++) {
         v.assert_state_consistency();
-        v.transition_zs(data_map);
+        v.transition_zs();
         v.transition_crp_alpha();
         v.transition_hypers();
         if (iter % 10 == 0) {
@@ -239,7 +239,7 @@ int main(int argc, char** argv) {
     cout << "inserting column: " << insert_col_idx;
     score_0 = v.get_score();
     score_delta_1 = v.calc_column_predictive_logp(col_data, CONTINUOUS_DATATYPE,
-                    data_global_row_indices, hypers_m[insert_col_idx]);
+                    hypers_m[insert_col_idx]);
     score_delta_2 = v.insert_col(col_data, data_global_row_indices, insert_col_idx,
                                  hypers_m[insert_col_idx]);
     score_1 = v.get_score();
@@ -0,0 +1,74 @@
+#
+#   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+#
+#   Lead Developers: Dan Lovell and Jay Baxter
+#   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+#   Research Leads: Vikash Mansinghka, Patrick Shafto
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+"""Time ensure_multistate and assert_col_dep_constraints on a large
+multistate model, which every engine call passes its states through.
+
+    ./pythenv.sh python scripts/time_ensure_multistate.py
+"""
+from __future__ import print_function
+import argparse
+import time
+
+import crosscat.tests.synthetic_data_generator as sdg
+import crosscat.utils.sample_utils as su
+from crosscat.LocalEngine import LocalEngine
+
+
+def generate_states(seed, n_rows, n_chains):
+    cctypes = ['continuous', 'multinomial', 'cyclic', 'multinomial'] * 2
+    distargs = [None, dict(K=20), None, dict(K=10)] * 2
+    cols_to_views = [0, 0, 1, 1, 2, 2, 3, 3]
+    cluster_weights = [[.2] * 5] * 4
+    separation = [.6] * 4
+    T, M_c, M_r = sdg.gen_data(cctypes, n_rows, cols_to_views,
+        cluster_weights, separation, seed=seed, distargs=distargs,
+        return_structure=True)
+    engine = LocalEngine(seed=seed)
+    X_L, X_D = engine.initialize(M_c, M_r, T, seed, n_chains=n_chains)
+    return engine, X_L, X_D
+
+
+def time_calls(func, n_calls):
+    # Return the mean seconds per call of func, over n_calls calls.
+    start = time.time()
+    for _ in range(n_calls):
+        func()
+    return (time.time() - start) / n_calls
+
+
+def main(seed, n_rows, n_chains, n_calls):
+    engine, X_L, X_D = generate_states(seed, n_rows, n_chains)
+    print('%d chains of %d rows, mean of %d calls' %
+        (n_chains, n_rows, n_calls))
+    secs = time_calls(lambda: su.ensure_multistate(X_L, X_D), n_calls)
+    print('ensure_multistate:           %10.4f ms' % (secs * 1e3,))
+    secs = time_calls(
+        lambda: engine.assert_col_dep_constraints(X_L, X_D, 0, 1), n_calls)
+    print('assert_col_dep_constraints:  %10.4f ms' % (secs * 1e3,))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seed', default=0, type=int)
+    parser.add_argument('--num_rows', default=20000, type=int)
+    parser.add_argument('--num_chains', default=16, type=int)
+    parser.add_argument('--num_calls', default=20, type=int)
+    args = parser.parse_args()
+    main(args.seed, args.num_rows, args.num_chains, args.num_calls)
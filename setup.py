@@ -198,8 +198,10 @@ State_cpp_sources = [
     'CyclicComponentModel.cpp',
     'DateTime.cpp',
     'MultinomialComponentModel.cpp',
+    'PredictiveTable.cpp',
     'RandomNumberGenerator.cpp',
     'State.cpp',
+    'ThreadPool.cpp',
     'View.cpp',
     'numerics.cpp',
     'utils.cpp',
@@ -235,7 +237,8 @@ CyclicComponentModel_ext = Extension(
 )
 State_ext = Extension(
     'crosscat.cython_code.State',
-    extra_compile_args = [],
+    extra_compile_args = ['-pthread'],
+    extra_link_args = ['-pthread'],
     sources=State_sources,
     include_dirs=include_dirs,
     language='c++',
@@ -38,14 +38,37 @@ class EngineTemplate(object):
         X_L_prime, X_D_prime = dict(), []
         return X_L_prime, X_D_prime
 
+    def analyze_iter(
+            self, M_c, T, X_L, X_D, seed, kernel_list=(), n_steps=1, c=(),
+            r=(), max_iterations=-1, max_time=-1, checkpoint_every=None,
+            do_diagnostics=False, diagnostics_every_N=1,
+            ROW_CRP_ALPHA_GRID=(), COLUMN_CRP_ALPHA_GRID=(), S_GRID=(),
+            MU_GRID=(), N_GRID=31,):
+        return iter([])
+
+    def analyze_budgeted(
+            self, M_c, T, X_L, X_D, seed, max_time, slice_steps=1,
+            n_steps=None, kernel_list=(), c=(), r=(),
+            ROW_CRP_ALPHA_GRID=(), COLUMN_CRP_ALPHA_GRID=(), S_GRID=(),
+            MU_GRID=(), N_GRID=31,):
+        X_L_prime, X_D_prime, steps = dict(), [], 0
+        return X_L_prime, X_D_prime, steps
+
     def simple_predictive_sample(self, M_c, X_L, X_D, Y, Q, seed, n=1):
         samples = []
         return samples
 
+    def simple_predictive_sample_batch(self, M_c, X_L, X_D, Y, Q, seed, n=1):
+        return None
+
     def simple_predictive_probability(self, M_c, X_L, X_D, Y, Q, n):
         p = None
         return p
 
+    def simple_predictive_probability_batch(
+            self, M_c, X_L, X_D, Y, Q, query_columns=None):
+        return None
+
     def simple_predictive_probability_multistate(
             self, M_c, X_L_list, X_D_list, Y, Q, n):
         p = None
@@ -55,12 +78,26 @@ class EngineTemplate(object):
             self, M_c, X_L_list, X_D_list, Q, seed, n_samples=1000):
         return None
 
+    def mutual_information_matrix(
+            self, M_c, X_L_list, X_D_list, cols, seed, n_samples=1000):
+        return None
+
+    def dependence_probability_matrix(self, X_L_list, cols=None):
+        return None
+
     def row_structural_typicality(self, X_L_list, X_D_list, row_id):
         return None
 
+    def row_structural_typicality_batch(
+            self, X_L_list, X_D_list, row_ids=None):
+        return None
+
     def column_structural_typicality(self, X_L_list, col_id):
         return None
 
+    def column_structural_typicality_batch(self, X_L_list, col_ids=None):
+        return None
+
     def predictive_probability(self, M_c, X_L, X_D, T, Q, n=1):
         return None
 
@@ -73,6 +110,11 @@ class EngineTemplate(object):
             target_columns=None):
         return None
 
+    def similarity_matrix(
+            self, M_c, X_L_list, X_D_list, given_row_ids, target_row_ids=None,
+            target_columns=None):
+        return None
+
     def impute(self, M_c, X_L, X_D, Y, Q, seed, n):
         e = None
         return e
@@ -81,6 +123,12 @@ class EngineTemplate(object):
         e, confidence = None, None
         return e, confidence
 
+    def impute_batch(self, M_c, X_L, X_D, Y, Q, seed, n):
+        return None
+
+    def impute_and_confidence_batch(self, M_c, X_L, X_D, Y, Q, seed, n):
+        return None, None
+
     def conditional_entropy(
             self, M_c, X_L, X_D, d_given, d_target, n=None, max_time=None):
         e = None
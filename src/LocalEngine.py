@@ -25,19 +25,32 @@ import copy
 import itertools
 import numpy
 import six
+import time
 
 from six.moves import range
 
 import crosscat.EngineTemplate as EngineTemplate
+import crosscat.StateHandle as StateHandle
 import crosscat.cython_code.State as State
 import crosscat.utils.general_utils as gu
 import crosscat.utils.inference_utils as iu
 import crosscat.utils.sample_utils as su
+import crosscat.utils.shared_data as sd
+import crosscat.utils.similarity_index as si
 
 # For `default_diagnostic_func_dict` below.
 import crosscat.utils.diagnostic_utils
 
 
+ChainCheckpoint = collections.namedtuple(
+    'ChainCheckpoint',
+    ['chain_idx', 'n_steps', 'X_L', 'X_D', 'diagnostics', 'done'])
+
+# How often, in seconds, analyze_iter checks on the segments it is waiting
+# for, when none has completed.
+SEGMENT_POLL_SECS = 0.1
+
+
 class LocalEngine(EngineTemplate.EngineTemplate):
     """A simple interface to the Cython-wrapped C++ engine.
 
@@ -50,6 +63,9 @@ class LocalEngine(EngineTemplate.EngineTemplate):
         self.do_initialize = _do_initialize_tuple
         self.do_analyze = _do_analyze_tuple
         self.do_insert = _do_insert_tuple
+        self.do_query = _do_query_tuple
+        self.submit = _apply_now
+        self.max_in_flight = 1
         return
 
 
@@ -88,12 +104,15 @@ class LocalEngine(EngineTemplate.EngineTemplate):
         :returns: X_L, X_D -- the latent state
         """
         # FIXME: why is M_r passed?
-        arg_tuples = self.get_initialize_arg_tuples(
-            M_c, M_r, T, initialization, row_initialization, n_chains,
-            ROW_CRP_ALPHA_GRID, COLUMN_CRP_ALPHA_GRID, S_GRID, MU_GRID, N_GRID,
-            make_get_next_seed(seed),)
-
-        chain_tuples = self.mapper(self.do_initialize, arg_tuples)
+        T_shared = self.share_data(T)
+        try:
+            arg_tuples = self.get_initialize_arg_tuples(
+                M_c, M_r, T_shared, initialization, row_initialization,
+                n_chains, ROW_CRP_ALPHA_GRID, COLUMN_CRP_ALPHA_GRID, S_GRID,
+                MU_GRID, N_GRID, make_get_next_seed(seed),)
+            chain_tuples = self.mapper(self.do_initialize, arg_tuples)
+        finally:
+            self.release_data(T, T_shared)
         X_L_list, X_D_list = zip(*chain_tuples)
         if n_chains == 1:
             X_L_list, X_D_list = X_L_list[0], X_D_list[0]
@@ -101,6 +120,36 @@ class LocalEngine(EngineTemplate.EngineTemplate):
         return X_L_list, X_D_list
 
 
+    def map_chains(self, query_func, M_c, X_L_list, X_D_list, *args):
+        """Apply query_func(M_c, X_L, X_D, *args) to each chain through
+        self.mapper.
+
+        query_func must be a module-level function, so that it can be sent
+        to the processes of a MultiprocessingEngine.
+
+        :returns: list -- the result for each chain, in order
+        """
+        arg_tuples = [
+            (query_func, (M_c, X_L, X_D) + args)
+            for X_L, X_D in zip(X_L_list, X_D_list)
+        ]
+        return self.mapper(self.do_query, arg_tuples)
+
+
+    def share_data(self, T):
+        """Return T in the form to send to each chain's worker.
+
+        LocalEngine runs its chains in this process, so sends T as is.
+        """
+        return T
+
+
+    def release_data(self, T, T_shared):
+        """Free T_shared, as returned by share_data(T), once the chains
+        are done with it."""
+        return
+
+
     def get_insert_arg_tuples(
             self, M_c, T, X_L_list, X_D_list, new_rows, N_GRID, CT_KERNEL):
         arg_tuples = six.moves.zip(
@@ -130,10 +179,14 @@ class LocalEngine(EngineTemplate.EngineTemplate):
             X_L_list, X_D_list)
 
         # get insert arg tuples
-        arg_tuples = self.get_insert_arg_tuples(
-            M_c, T, X_L_list, X_D_list, new_rows, N_GRID, CT_KERNEL)
-
-        chain_tuples = self.mapper(self.do_insert, arg_tuples)
+        T_shared = self.share_data(T)
+        try:
+            arg_tuples = self.get_insert_arg_tuples(
+                M_c, T_shared, X_L_list, X_D_list, new_rows, N_GRID,
+                CT_KERNEL)
+            chain_tuples = self.mapper(self.do_insert, arg_tuples)
+        finally:
+            self.release_data(T, T_shared)
         X_L_list, X_D_list = zip(*chain_tuples)
 
         if not was_multistate:
@@ -147,7 +200,7 @@ class LocalEngine(EngineTemplate.EngineTemplate):
             self, M_c, T, X_L_list, X_D_list, kernel_list, n_steps, c, r,
             max_iterations, max_time, diagnostic_func_dict, every_N,
             ROW_CRP_ALPHA_GRID, COLUMN_CRP_ALPHA_GRID, S_GRID, MU_GRID, N_GRID,
-            do_timing, CT_KERNEL, progress, get_next_seed):
+            do_timing, CT_KERNEL, progress, n_threads, get_next_seed):
         n_chains = len(X_L_list)
         seeds = [get_next_seed() for seed_idx in range(n_chains)]
         arg_tuples = six.moves.zip(
@@ -171,6 +224,7 @@ class LocalEngine(EngineTemplate.EngineTemplate):
             itertools.cycle([do_timing]),
             itertools.cycle([CT_KERNEL]),
             itertools.cycle([progress]),
+            itertools.cycle([n_threads]),
         )
         return arg_tuples
 
@@ -185,6 +239,7 @@ class LocalEngine(EngineTemplate.EngineTemplate):
                 do_timing=False,
                 CT_KERNEL=0,
                 progress=None,
+                n_threads=1,
                 ):
         """Evolve the latent state by running MCMC transition kernels.
 
@@ -221,6 +276,12 @@ class LocalEngine(EngineTemplate.EngineTemplate):
             For example, `progress` may be used to print a progress bar
             to standard out.
         :type progress: function pointer.
+        :param n_threads: the number of threads each chain's row partition
+            transitions run on.  With more than one thread, rows are
+            reassigned in small blocks scored in parallel, an approximation to
+            sequential Gibbs; results are reproducible for a fixed seed and
+            n_threads.
+        :type n_threads: int
         :returns: X_L, X_D -- the evolved latent state
         """
         if n_steps <= 0:
@@ -238,30 +299,34 @@ class LocalEngine(EngineTemplate.EngineTemplate):
 
         X_L_list, X_D_list, was_multistate = su.ensure_multistate(X_L, X_D)
 
-        arg_tuples = self.get_analyze_arg_tuples(
-            M_c,
-            T,
-            X_L_list,
-            X_D_list,
-            kernel_list,
-            n_steps,
-            c,
-            r,
-            max_iterations,
-            max_time,
-            diagnostic_func_dict,
-            diagnostics_every_N,
-            ROW_CRP_ALPHA_GRID,
-            COLUMN_CRP_ALPHA_GRID,
-            S_GRID,
-            MU_GRID,
-            N_GRID,
-            do_timing,
-            CT_KERNEL,
-            progress,
-            make_get_next_seed(seed))
-
-        chain_tuples = self.mapper(self.do_analyze, arg_tuples)
+        T_shared = self.share_data(T)
+        try:
+            arg_tuples = self.get_analyze_arg_tuples(
+                M_c,
+                T_shared,
+                X_L_list,
+                X_D_list,
+                kernel_list,
+                n_steps,
+                c,
+                r,
+                max_iterations,
+                max_time,
+                diagnostic_func_dict,
+                diagnostics_every_N,
+                ROW_CRP_ALPHA_GRID,
+                COLUMN_CRP_ALPHA_GRID,
+                S_GRID,
+                MU_GRID,
+                N_GRID,
+                do_timing,
+                CT_KERNEL,
+                progress,
+                n_threads,
+                make_get_next_seed(seed))
+            chain_tuples = self.mapper(self.do_analyze, arg_tuples)
+        finally:
+            self.release_data(T, T_shared)
 
         X_L_list, X_D_list, diagnostics_dict_list = zip(*chain_tuples)
 
@@ -283,6 +348,265 @@ class LocalEngine(EngineTemplate.EngineTemplate):
 
         return ret_tuple
 
+    def analyze_iter(
+            self, M_c, T, X_L, X_D, seed, kernel_list=(), n_steps=1, c=(),
+            r=(), max_iterations=-1, max_time=-1, checkpoint_every=None,
+            do_diagnostics=False, diagnostics_every_N=1,
+            ROW_CRP_ALPHA_GRID=(), COLUMN_CRP_ALPHA_GRID=(), S_GRID=(),
+            MU_GRID=(), N_GRID=31, do_timing=False, CT_KERNEL=0,
+            n_threads=1):
+        """Evolve the latent states as analyze does, yielding each chain's
+        state as soon as it is ready rather than all of them at the end.
+
+        Each chain runs its n_steps in segments of checkpoint_every steps,
+        and a ChainCheckpoint is yielded after each segment, in the order
+        segments complete.  With checkpoint_every=None each chain runs in
+        one segment, and ends in the state analyze would give it for the
+        same seed.
+
+        Closing the generator cancels the segments not yet started, and
+        stops those already running in other processes by replacing the
+        engine's processes, which kills any other work they are running.
+        So while the generator is open, make no other calls on the engine.
+        A segment that fails, or whose process dies, raises its error from
+        the generator.
+
+        The other arguments have the same meaning as in analyze, except
+        that max_iterations and max_time apply to each segment.
+
+        :param checkpoint_every: the number of steps between checkpoints
+        :type checkpoint_every: int
+        :returns: generator of ChainCheckpoint -- the chain's index, the
+            number of steps it has run so far, its X_L and X_D, the
+            diagnostics of the segment (its elapsed seconds if do_timing),
+            and whether the chain has run all its steps
+        """
+        if n_steps <= 0:
+            raise ValueError("You must do at least one analyze step.")
+
+        if CT_KERNEL not in [0, 1]:
+            raise ValueError("CT_KERNEL must be 0 (Gibbs) or 1 (MH)")
+
+        if do_timing:
+            # Diagnostics and timing are exclusive.
+            do_diagnostics = False
+
+        diagnostic_func_dict, _reprocess_diagnostics_func = \
+            do_diagnostics_to_func_dict(do_diagnostics)
+
+        X_L_list, X_D_list, _was_multistate = \
+            su.ensure_multistate(X_L, X_D)
+
+        get_next_seed = make_get_next_seed(seed)
+        chain_seeds = [get_next_seed() for _ in X_L_list]
+        # The arguments of _do_analyze_with_diagnostic after n_steps.
+        segment_args = (
+            c, r, max_iterations, max_time, diagnostic_func_dict,
+            diagnostics_every_N, ROW_CRP_ALPHA_GRID, COLUMN_CRP_ALPHA_GRID,
+            S_GRID, MU_GRID, N_GRID, do_timing, CT_KERNEL, None, n_threads)
+        return self._analyze_iter(
+            M_c, T, X_L_list, X_D_list, chain_seeds, kernel_list, n_steps,
+            checkpoint_every or n_steps, segment_args)
+
+    def analyze_budgeted(
+            self, M_c, T, X_L, X_D, seed, max_time, slice_steps=1,
+            n_steps=None, kernel_list=(), c=(), r=(),
+            ROW_CRP_ALPHA_GRID=(), COLUMN_CRP_ALPHA_GRID=(), S_GRID=(),
+            MU_GRID=(), N_GRID=31, CT_KERNEL=0, n_threads=1):
+        """Evolve the latent states for max_time seconds in all, running
+        as many steps of each chain as fit.
+
+        Chains run in slices of slice_steps steps, and each slice goes to
+        whichever of the engine's processes is free next, so no process
+        idles while a chain is ready, however many chains there are and
+        however their sizes differ.  A chain's first slice is one step, to
+        time it, and its later slices are cut to the steps that, timed by
+        its last slice, end within max_time.  A chain stops when not even
+        one step would, or when it has run n_steps.  If a slice fails, the
+        slices still running are stopped as when analyze_iter is closed.
+
+        The other arguments have the same meaning as in analyze.
+
+        :param max_time: the wall-clock budget, in seconds, for all chains
+        :type max_time: float
+        :param slice_steps: the number of steps a chain runs at a time
+        :type slice_steps: int
+        :param n_steps: the most steps to run each chain, if not None
+        :type n_steps: int
+        :returns: X_L, X_D, steps -- the evolved latent states, and the
+            number of steps each chain ran
+        """
+        if max_time <= 0:
+            raise ValueError("max_time must be positive.")
+
+        if slice_steps <= 0:
+            raise ValueError("slice_steps must be positive.")
+
+        if n_steps is not None and n_steps <= 0:
+            raise ValueError("You must do at least one analyze step.")
+
+        if CT_KERNEL not in [0, 1]:
+            raise ValueError("CT_KERNEL must be 0 (Gibbs) or 1 (MH)")
+
+        deadline = time.time() + max_time
+
+        X_L_list, X_D_list, was_multistate = su.ensure_multistate(X_L, X_D)
+
+        get_next_seed = make_get_next_seed(seed)
+        chain_seeds = [get_next_seed() for _ in X_L_list]
+        # The arguments of _do_analyze_with_diagnostic after n_steps.
+        segment_args = (
+            c, r, -1, -1, None, None, ROW_CRP_ALPHA_GRID,
+            COLUMN_CRP_ALPHA_GRID, S_GRID, MU_GRID, N_GRID, False, CT_KERNEL,
+            None, n_threads)
+        X_L_list, X_D_list = list(X_L_list), list(X_D_list)
+        steps = [0] * len(X_L_list)
+        for checkpoint in self._analyze_iter(
+                M_c, T, X_L_list, X_D_list, chain_seeds, kernel_list,
+                n_steps, slice_steps, segment_args, deadline=deadline):
+            chain_idx = checkpoint.chain_idx
+            X_L_list[chain_idx] = checkpoint.X_L
+            X_D_list[chain_idx] = checkpoint.X_D
+            steps[chain_idx] = checkpoint.n_steps
+
+        if not was_multistate:
+            return X_L_list[0], X_D_list[0], steps[0]
+        return X_L_list, X_D_list, steps
+
+    def _analyze_iter(
+            self, M_c, T, X_L_list, X_D_list, chain_seeds, kernel_list,
+            n_steps, slice_steps, segment_args, deadline=None):
+        # Run each chain in segments of slice_steps steps, up to n_steps in
+        # all (without end if None), and yield a ChainCheckpoint after each.
+        # Ready chains wait in one queue, and each segment goes to whichever
+        # process is free next.  Given a deadline, a chain's first segment
+        # is one step, to time it, and its later segments are cut to the
+        # steps that, timed by its last one, end before the deadline.  A
+        # chain stops when not even one step would: for a first step, as
+        # timed by the chains timed so far.
+        n_chains = len(X_L_list)
+        # A chain's first segment is seeded as analyze would seed the chain,
+        # and its later segments from a generator of that seed.
+        segment_seed_funcs = [make_get_next_seed(s) for s in chain_seeds]
+        states = list(zip(X_L_list, X_D_list))
+        chain_n_steps = [0] * n_chains
+        segment_n_steps = [0] * n_chains
+        secs_per_step = [None] * n_chains
+        ready = collections.deque(range(n_chains))
+        results = six.moves.queue.Queue()
+        # The result handle of the running segment of each chain.
+        running = dict()
+        worker_ids = self.get_worker_ids()
+        T_shared = self.share_data(T)
+        try:
+            while ready or running:
+                while ready and len(running) < self.max_in_flight:
+                    chain_idx = ready.popleft()
+                    this_n_steps = slice_steps
+                    if n_steps is not None:
+                        this_n_steps = min(
+                            slice_steps, n_steps - chain_n_steps[chain_idx])
+                    if deadline is not None:
+                        secs_left = deadline - time.time()
+                        chain_secs_per_step = secs_per_step[chain_idx]
+                        if chain_secs_per_step is None:
+                            this_n_steps = 1
+                            timed = [secs for secs in secs_per_step
+                                     if secs is not None]
+                            if timed:
+                                chain_secs_per_step = numpy.mean(timed)
+                        if chain_secs_per_step:
+                            this_n_steps = min(
+                                this_n_steps,
+                                int(secs_left / chain_secs_per_step))
+                        if secs_left <= 0 or this_n_steps < 1:
+                            continue
+                    if chain_n_steps[chain_idx] == 0:
+                        SEED = chain_seeds[chain_idx]
+                    else:
+                        SEED = segment_seed_funcs[chain_idx]()
+                    X_L_i, X_D_i = states[chain_idx]
+                    arg_tuple = (
+                        SEED, X_L_i, X_D_i, M_c, T_shared, kernel_list,
+                        this_n_steps) + segment_args
+                    segment_n_steps[chain_idx] = this_n_steps
+                    running[chain_idx] = self.submit(
+                        _do_analyze_segment, (chain_idx, arg_tuple),
+                        callback=results.put)
+                if not running:
+                    break
+                chain_idx, chain_tuple, elapsed_secs, error = \
+                    self._get_segment_result(results, running, worker_ids)
+                del running[chain_idx]
+                if error is not None:
+                    raise error
+                X_L_i, X_D_i, diagnostics = chain_tuple
+                states[chain_idx] = X_L_i, X_D_i
+                chain_n_steps[chain_idx] += segment_n_steps[chain_idx]
+                secs_per_step[chain_idx] = \
+                    elapsed_secs / segment_n_steps[chain_idx]
+                done = chain_n_steps[chain_idx] == n_steps
+                if not done:
+                    ready.append(chain_idx)
+                yield ChainCheckpoint(
+                    chain_idx, chain_n_steps[chain_idx], X_L_i, X_D_i,
+                    diagnostics, done)
+        finally:
+            if running:
+                self.cancel_segments()
+            self.release_data(T, T_shared)
+
+    def _get_segment_result(self, results, running, worker_ids):
+        # Wait for the next running segment to complete.  Wait in short
+        # timeouts, so that Ctrl-C interrupts the wait under Python 2, and
+        # so that a segment that fails without calling back -- e.g. its
+        # result does not pickle -- or whose process dies is noticed.
+        while True:
+            try:
+                return results.get(timeout=SEGMENT_POLL_SECS)
+            except six.moves.queue.Empty:
+                pass
+            for result in running.values():
+                if result.ready() and not result.successful():
+                    # Raises the segment's error.
+                    result.get()
+            if self.get_worker_ids() != worker_ids:
+                raise RuntimeError(
+                    "A process died while running an analyze segment.")
+
+    def get_worker_ids(self):
+        """Return the ids of the processes that run submitted segments, to
+        notice one dying.  LocalEngine runs segments in this process."""
+        return ()
+
+    def cancel_segments(self):
+        """Stop the submitted segments still running, along with anything
+        else running in the engine's processes.  LocalEngine runs each
+        segment to its end when it is submitted, so has none."""
+        return
+
+
+    def get_state_handle(
+            self, M_c, T, X_L, X_D, seed, n_chains=1,
+            initialization=b'from_the_prior', row_initialization=-1,
+            ROW_CRP_ALPHA_GRID=(), COLUMN_CRP_ALPHA_GRID=(), S_GRID=(),
+            MU_GRID=(), N_GRID=31, CT_KERNEL=0):
+        """Build a StateHandle keeping the given latent state(s) in memory.
+
+        Unlike `analyze`, the handle's analyze and insert do not rebuild the
+        C++ State from X_L and X_D on each call.  Pass X_L=X_D=None to
+        sample `n_chains` states from the prior instead.
+
+        :returns: StateHandle
+        """
+        return StateHandle.StateHandle(
+            M_c, T, X_L, X_D, seed=seed, n_chains=n_chains,
+            initialization=initialization,
+            row_initialization=row_initialization,
+            ROW_CRP_ALPHA_GRID=ROW_CRP_ALPHA_GRID,
+            COLUMN_CRP_ALPHA_GRID=COLUMN_CRP_ALPHA_GRID, S_GRID=S_GRID,
+            MU_GRID=MU_GRID, N_GRID=N_GRID, CT_KERNEL=CT_KERNEL)
+
 
     def _sample_and_insert(
             self, M_c, T, X_L, X_D, matching_row_indices, get_next_seed):
@@ -335,11 +659,57 @@ class LocalEngine(EngineTemplate.EngineTemplate):
         :returns: list of floats.  Samples in the same order specified by Q
         """
         get_next_seed = make_get_next_seed(seed)
-        samples = _do_simple_predictive_sample(
-            M_c, X_L, X_D, Y, Q, n, get_next_seed)
+        if su.get_is_multistate(X_L, X_D):
+            return self._simple_predictive_sample_multistate(
+                M_c, X_L, X_D, Y, Q, n, get_next_seed)
+        samples = su.simple_predictive_sample(
+            M_c, X_L, X_D, Y, Q, get_next_seed, n)
         return samples
 
 
+    def _simple_predictive_sample_multistate(
+            self, M_c, X_L_list, X_D_list, Y, Q, n, get_next_seed):
+        # Split n among the states as su.simple_predictive_sample_multistate
+        # does, but give each state its own seed, so that the states can be
+        # sampled in parallel.
+        num_states = len(X_L_list)
+        assert num_states == len(X_D_list)
+        random_state = numpy.random.RandomState(get_next_seed())
+        which_sampled = random_state.permutation(range(num_states))
+        which_sampled = set(which_sampled[:n % num_states])
+        n_list = [
+            n // num_states + (state_idx in which_sampled)
+            for state_idx in range(num_states)
+        ]
+        seeds = [get_next_seed() for _ in range(num_states)]
+        samples_list = self.mapper(self.do_query, [
+            (_do_simple_predictive_sample_seeded,
+                (M_c, X_L, X_D, Y, Q, seed_i, n_i))
+            for X_L, X_D, seed_i, n_i in zip(X_L_list, X_D_list, seeds, n_list)
+        ])
+        return [sample for samples in samples_list for sample in samples]
+
+
+    def simple_predictive_sample_batch(self, M_c, X_L, X_D, Y, Q, seed, n=1):
+        """Sample values from predictive distribution of the given latent
+        state, drawing all n samples in bulk.
+
+        The arguments have the same meaning as in simple_predictive_sample,
+        but the samples are drawn by vectorized NumPy samplers, which makes
+        large n practical.  The samples are reproducible from the seed but
+        differ from those of simple_predictive_sample.
+
+        :returns: array of floats, of shape (n, len(Q)).  Samples in the
+            same order specified by Q
+        """
+        get_next_seed = make_get_next_seed(seed)
+        if su.get_is_multistate(X_L, X_D):
+            return su.simple_predictive_sample_batch_multistate(
+                M_c, X_L, X_D, Y, Q, get_next_seed, n)
+        return su.simple_predictive_sample_batch(
+            M_c, X_L, X_D, Y, Q, get_next_seed, n)
+
+
     def simple_predictive_probability(self, M_c, X_L, X_D, Y, Q):
         """Calculate probability of a cell taking a value given a latent state.
 
@@ -357,6 +727,29 @@ class LocalEngine(EngineTemplate.EngineTemplate):
         return su.simple_predictive_probability(M_c, X_L, X_D, Y, Q)
 
 
+    def simple_predictive_probability_batch(
+            self, M_c, X_L, X_D, Y, Q, query_columns=None):
+        """Calculate probabilities of many hypothetical rows given a latent
+        state.
+
+        :param Y: A list of constraints to apply when querying.  Each constraint
+            is a triplet of (r, d, v): r is the row index, d is the column
+            index and v is the value of the constraint.  Constraints on the
+            hypothetical row, r = len(X_D[0]), apply to every row of Q.
+        :type Y: list of lists
+        :param Q: The values at which the density is evaluated, one row per
+            hypothetical row and one column per query column
+        :type Q: 2-D array
+        :param query_columns: the column indices of the columns of Q.
+            Defaults to all columns.
+        :type query_columns: list of ints
+
+        :returns: 2-D array -- log probabilities of the values in Q
+        """
+        return su.simple_predictive_probability_batch(
+            M_c, X_L, X_D, Y, Q, query_columns=query_columns)
+
+
     def simple_predictive_probability_multistate(
             self, M_c, X_L_list, X_D_list, Y, Q):
         """Calculate probability of a cell taking a value given a latent state.
@@ -373,8 +766,9 @@ class LocalEngine(EngineTemplate.EngineTemplate):
 
         :returns: list of floats -- probabilities of the values specified by Q
         """
-        return su.simple_predictive_probability_multistate(
-            M_c, X_L_list, X_D_list, Y, Q)
+        logprobs = self.map_chains(
+            _do_simple_predictive_probability, M_c, X_L_list, X_D_list, Y, Q)
+        return gu.logmeanexp(logprobs)
 
 
     def predictive_probability(self, M_c, X_L, X_D, Y, Q):
@@ -410,8 +804,9 @@ class LocalEngine(EngineTemplate.EngineTemplate):
 
         :returns: float -- joint log probabilities of the values specified by Q
         """
-        return su.predictive_probability_multistate(
-            M_c, X_L_list, X_D_list, Y, Q)
+        logprobs = self.map_chains(
+            _do_predictive_probability, M_c, X_L_list, X_D_list, Y, Q)
+        return gu.logmeanexp(logprobs)
 
 
     def mutual_information(
@@ -429,8 +824,57 @@ class LocalEngine(EngineTemplate.EngineTemplate):
             Linfoots from each crosscat sample.
         """
         get_next_seed = make_get_next_seed(seed)
-        return iu.mutual_information(
-            M_c, X_L_list, X_D_list, Q, get_next_seed, n_samples)
+        seeds = [get_next_seed() for _ in X_L_list]
+        MI_Linfoot_list = self.mapper(self.do_query, [
+            (_do_mutual_information, (M_c, X_L, X_D, Q, seed_i, n_samples))
+            for X_L, X_D, seed_i in zip(X_L_list, X_D_list, seeds)
+        ])
+        # Transpose the per-chain results into per-query lists of chains.
+        MI = [[] for _ in Q]
+        Linfoot = [[] for _ in Q]
+        for MI_i, Linfoot_i in MI_Linfoot_list:
+            for query_idx in range(len(Q)):
+                MI[query_idx].extend(MI_i[query_idx])
+                Linfoot[query_idx].extend(Linfoot_i[query_idx])
+        return MI, Linfoot
+
+
+    def mutual_information_matrix(
+            self, M_c, X_L_list, X_D_list, cols, seed, n_samples=1000):
+        """Estimate mutual information for every pair of columns in cols.
+
+        Only pairs assigned to the same view are computed: other pairs have
+        mutual information 0.
+
+        :param cols: the column indexes to compare
+        :type cols: list of ints
+        :param n_samples: the number of simple predictive samples to use
+        :type n_samples: int
+
+        :returns: array of shape (len(X_L_list), len(cols), len(cols)) --
+            the MI of each pair of columns in each crosscat sample.  The
+            diagonal is NaN.
+        """
+        get_next_seed = make_get_next_seed(seed)
+        seeds = [get_next_seed() for _ in X_L_list]
+        MI_list = self.mapper(self.do_query, [
+            (_do_mutual_information_matrix,
+                (M_c, X_L, X_D, cols, seed_i, n_samples))
+            for X_L, X_D, seed_i in zip(X_L_list, X_D_list, seeds)
+        ])
+        return numpy.array(MI_list)
+
+
+    def dependence_probability_matrix(self, X_L_list, cols=None):
+        """Returns the probability that each pair of columns is dependent.
+
+        :param cols: the column indexes to compare.  Defaults to all columns.
+        :type cols: list of ints
+
+        :returns: array of shape (len(cols), len(cols)) -- the fraction of
+            crosscat samples in which each pair is in the same view
+        """
+        return iu.dependence_probability_matrix(X_L_list, cols)
 
 
     def row_structural_typicality(self, X_L_list, X_D_list, row_id):
@@ -444,6 +888,18 @@ class LocalEngine(EngineTemplate.EngineTemplate):
         return su.row_structural_typicality(X_L_list, X_D_list, row_id)
 
 
+    def row_structural_typicality_batch(
+            self, X_L_list, X_D_list, row_ids=None):
+        """Returns the typicality of many rows at once.
+
+        :param row_ids: ids of the target rows.  Defaults to all rows.
+        :type row_ids: list of ints
+
+        :returns: array of floats, the typicality of each row, from 0 to 1
+        """
+        return su.row_structural_typicality_batch(X_L_list, X_D_list, row_ids)
+
+
     def column_structural_typicality(self, X_L_list, col_id):
         """Returns the typicality (opposite of anomalousness) of given column.
 
@@ -455,6 +911,17 @@ class LocalEngine(EngineTemplate.EngineTemplate):
         return su.column_structural_typicality(X_L_list, col_id)
 
 
+    def column_structural_typicality_batch(self, X_L_list, col_ids=None):
+        """Returns the typicality of many columns at once.
+
+        :param col_ids: ids of the target columns.  Defaults to all columns.
+        :type col_ids: list of ints
+
+        :returns: array of floats, the typicality of each column, from 0 to 1
+        """
+        return su.column_structural_typicality_batch(X_L_list, col_ids)
+
+
     def similarity(
             self, M_c, X_L_list, X_D_list, given_row_id, target_row_id,
             target_columns=None):
@@ -473,9 +940,47 @@ class LocalEngine(EngineTemplate.EngineTemplate):
 
         :returns: float
         """
-        return su.similarity(
-            M_c, X_L_list, X_D_list, given_row_id,
-            target_row_id, target_columns)
+        col_idxs = su.get_similarity_columns(M_c, target_columns)
+        counts = self.mapper(self.do_query, [
+            (su.count_similar_columns,
+                (X_L, X_D, given_row_id, target_row_id, col_idxs))
+            for X_L, X_D in zip(X_L_list, X_D_list)
+        ])
+        return float(sum(counts)) / (len(X_L_list) * len(col_idxs))
+
+
+    def similarity_matrix(
+            self, M_c, X_L_list, X_D_list, given_row_ids, target_row_ids=None,
+            target_columns=None):
+        """Computes the similarity of each given row to each target row.
+
+        :param given_row_ids: the ids of the rows to measure similarity from
+        :type given_row_ids: list of ints
+        :param target_row_ids: the ids of the rows to measure similarity to.
+            Defaults to all rows.
+        :type target_row_ids: list of ints
+        :param target_columns: the columns to average the similarity over.
+            Defaults to all columns.
+        :type target_columns: int, string, or list of ints
+
+        :returns: array of floats, of shape (len(given_row_ids),
+            len(target_row_ids))
+        """
+        return su.similarity_matrix(
+            M_c, X_L_list, X_D_list, given_row_ids, target_row_ids,
+            target_columns)
+
+
+    def get_row_similarity_index(self, M_c, X_L_list, X_D_list):
+        """Build an index answering row similarity queries.
+
+        The index answers `similarity` for one row against all others by
+        touching only the rows sharing a category with it.  Call its update
+        method with the new latent states after an insert.
+
+        :returns: RowSimilarityIndex
+        """
+        return si.RowSimilarityIndex(M_c, X_L_list, X_D_list)
 
 
     def impute(self, M_c, X_L, X_D, Y, Q, seed, n):
@@ -530,6 +1035,42 @@ class LocalEngine(EngineTemplate.EngineTemplate):
         return (e, confidence)
 
 
+    def impute_batch(self, M_c, X_L, X_D, Y, Q, seed, n):
+        """Impute the values of many cells at once.
+
+        :param Y: A list of constraints to apply when sampling.  Each constraint
+            is a triplet of (r,d,v): r is the row index, d is the column
+            index and v is the value of the constraint
+        :type Y: list of lists
+        :param Q: A list of cells to impute.  Each cell is doublet of (r, d):
+            r is the row index, d is the column index
+        :type Q: list of lists
+        :param n: the number of samples to use in the imputation of each cell
+        :type n: int
+
+        :returns: array of floats -- imputed values in the same order as
+            specified by Q
+        """
+        get_next_seed = make_get_next_seed(seed)
+        return su.impute_batch(M_c, X_L, X_D, Y, Q, n, get_next_seed)
+
+
+    def impute_and_confidence_batch(self, M_c, X_L, X_D, Y, Q, seed, n):
+        """Impute the values of many cells at once, with the confidence of
+        each.
+
+        The arguments have the same meaning as in impute_batch.  See
+        su.impute_and_confidence_batch for the confidence of continuous
+        cells, which differs from that of impute_and_confidence.
+
+        :returns: imputed, confidence -- arrays of floats in the same order
+            as specified by Q
+        """
+        get_next_seed = make_get_next_seed(seed)
+        return su.impute_and_confidence_batch(
+            M_c, X_L, X_D, Y, Q, n, get_next_seed)
+
+
     def ensure_col_dep_constraints(
             self, M_c, M_r, T, X_L, X_D, dep_constraints,
             seed, max_rejections=100):
@@ -757,6 +1298,7 @@ def _do_initialize(
         SEED, M_c, M_r, T, initialization, row_initialization,
          ROW_CRP_ALPHA_GRID, COLUMN_CRP_ALPHA_GRID, S_GRID, MU_GRID, N_GRID,):
 
+    T = sd.get_table(T)
     p_State = State.p_State(
         M_c, T, initialization=initialization,
         row_initialization=row_initialization, SEED=SEED,
@@ -778,6 +1320,7 @@ def _do_insert_tuple(arg_tuple):
 
 
 def _do_insert(M_c, T, X_L, X_D, new_rows, N_GRID, CT_KERNEL):
+    T = sd.get_table(T)
     p_State = State.p_State(
         M_c, T, X_L=X_L, X_D=X_D, N_GRID=N_GRID, CT_KERNEL=CT_KERNEL)
 
@@ -802,6 +1345,7 @@ def _do_analyze(
         max_iterations, max_time, ROW_CRP_ALPHA_GRID, COLUMN_CRP_ALPHA_GRID,
         S_GRID, MU_GRID, N_GRID, CT_KERNEL, progress):
 
+    T = sd.get_table(T)
     p_State = State.p_State(
         M_c, T, X_L, X_D, SEED=SEED, ROW_CRP_ALPHA_GRID=ROW_CRP_ALPHA_GRID,
         COLUMN_CRP_ALPHA_GRID=COLUMN_CRP_ALPHA_GRID, S_GRID=S_GRID,
@@ -840,7 +1384,7 @@ def _do_analyze_with_diagnostic(
         SEED, X_L, X_D, M_c, T, kernel_list, n_steps, c, r, max_iterations,
         max_time, diagnostic_func_dict, every_N, ROW_CRP_ALPHA_GRID,
         COLUMN_CRP_ALPHA_GRID, S_GRID, MU_GRID, N_GRID, do_timing, CT_KERNEL,
-        progress,):
+        progress, n_threads=1):
 
     diagnostics_dict = collections.defaultdict(list)
 
@@ -848,10 +1392,12 @@ def _do_analyze_with_diagnostic(
         diagnostic_func_dict = dict()
         every_N = None
 
+    T = sd.get_table(T)
     p_State = State.p_State(
         M_c, T, X_L, X_D, SEED=SEED, ROW_CRP_ALPHA_GRID=ROW_CRP_ALPHA_GRID,
         COLUMN_CRP_ALPHA_GRID=COLUMN_CRP_ALPHA_GRID, S_GRID=S_GRID,
         MU_GRID=MU_GRID, N_GRID=N_GRID, CT_KERNEL=CT_KERNEL)
+    p_State.set_num_threads(n_threads)
 
     with gu.Timer('all transitions', verbose=False) as timer:
         p_State.transition(
@@ -871,15 +1417,72 @@ def _do_analyze_with_diagnostic(
     return X_L_prime, X_D_prime, diagnostics_dict
 
 
-def _do_simple_predictive_sample(M_c, X_L, X_D, Y, Q, n, get_next_seed):
-    is_multistate = su.get_is_multistate(X_L, X_D)
-    if is_multistate:
-        samples = su.simple_predictive_sample_multistate(
-            M_c, X_L, X_D, Y, Q, get_next_seed, n)
-    else:
-        samples = su.simple_predictive_sample(
-            M_c, X_L, X_D, Y, Q, get_next_seed, n)
-    return samples
+def _do_analyze_segment(chain_idx, arg_tuple):
+    # Return rather than raise errors, so that they reach the caller through
+    # the callback of a submitted segment.
+    try:
+        with gu.Timer('segment', verbose=False) as timer:
+            chain_tuple = _do_analyze_with_diagnostic(*arg_tuple)
+    except Exception as e:
+        return chain_idx, None, None, e
+    return chain_idx, chain_tuple, timer.elapsed_secs, None
+
+
+def _apply_now(func, args=(), kwds={}, callback=None):
+    # LocalEngine's counterpart of Pool.apply_async: run func at once.
+    result = func(*args, **kwds)
+    if callback is not None:
+        callback(result)
+    return _AppliedResult(result)
+
+
+class _AppliedResult(object):
+    # The counterpart of multiprocessing's AsyncResult for _apply_now.
+
+    def __init__(self, value):
+        self._value = value
+
+    def ready(self):
+        return True
+
+    def successful(self):
+        return True
+
+    def get(self, timeout=None):
+        return self._value
+
+
+def _do_query_tuple(arg_tuple):
+    query_func, args = arg_tuple
+    return query_func(*args)
+
+
+# Per-chain queries for LocalEngine.map_chains.  Queries that draw random
+# numbers take a seed rather than a get_next_seed, which cannot be sent to
+# another process.
+
+
+def _do_simple_predictive_probability(M_c, X_L, X_D, Y, Q):
+    return float(su.simple_predictive_probability(M_c, X_L, X_D, Y, Q))
+
+
+def _do_predictive_probability(M_c, X_L, X_D, Y, Q):
+    return float(su.predictive_probability(M_c, X_L, X_D, Y, Q))
+
+
+def _do_simple_predictive_sample_seeded(M_c, X_L, X_D, Y, Q, seed, n):
+    return su.simple_predictive_sample(
+        M_c, X_L, X_D, Y, Q, make_get_next_seed(seed), n)
+
+
+def _do_mutual_information(M_c, X_L, X_D, Q, seed, n_samples):
+    return iu.mutual_information(
+        M_c, [X_L], [X_D], Q, make_get_next_seed(seed), n_samples)
+
+
+def _do_mutual_information_matrix(M_c, X_L, X_D, cols, seed, n_samples):
+    return iu.mutual_information_matrix(
+        M_c, [X_L], [X_D], cols, make_get_next_seed(seed), n_samples)[0]
 
 
 default_diagnostic_func_dict = {
@@ -897,6 +1500,5 @@ default_diagnostic_func_dict = {
 }
 
 
-def make_get_next_seed(seed):
-    generator = gu.int_generator(seed)
-    return lambda: generator.next()
+# Defined in general_utils, so that StateHandle can use it too.
+make_get_next_seed = gu.make_get_next_seed
@@ -23,7 +23,9 @@ from __future__ import print_function
 import multiprocessing
 
 import crosscat.LocalEngine as LE
+import crosscat.StateHandle as StateHandle
 import crosscat.utils.sample_utils as su
+import crosscat.utils.shared_data as sd
 
 
 class MultiprocessingEngine(LE.LocalEngine):
@@ -31,14 +33,75 @@ class MultiprocessingEngine(LE.LocalEngine):
 
     MultiprocessingEngine holds no state.
     Methods use resources on the local machine.
+
+    analyze_iter and analyze_budgeted hand chains to the processes a slice
+    at a time, as each process comes free.  Closing analyze_iter before
+    its end replaces the processes, to stop the slices still running.
+    That also kills any other work the processes are running, so while an
+    analyze_iter generator is open it has the engine's processes to
+    itself: make no other calls on the engine until it ends or is closed.
+
+    initialize, analyze and insert copy T once per call to a SharedTable,
+    which the processes map, rather than pickling T to each chain.  To copy
+    T only once across calls, pass a SharedTable as T.
     """
 
     def __init__(self, seed=None, cpu_count=None):
         super(MultiprocessingEngine, self).__init__(seed=None)
-        self.pool = multiprocessing.Pool(cpu_count)
+        self.cpu_count = cpu_count
+        self.max_in_flight = cpu_count or multiprocessing.cpu_count()
+        self._start_pool()
+        return
+
+    def _start_pool(self):
+        self.pool = multiprocessing.Pool(self.cpu_count)
         self.mapper = self.pool.map
+        self.submit = self.pool.apply_async
+        return
+
+    def get_worker_ids(self):
+        # The pool replaces a process that dies, so a changed pid means one
+        # died, and took its segment with it.
+        return frozenset(process.pid for process in _get_processes(self.pool))
+
+    def cancel_segments(self):
+        # A pool cannot cancel a task once it has started, so replace it.
+        # This kills whatever else the pool is running too, which is why
+        # an open analyze_iter needs the pool to itself.
+        self.pool.terminate()
+        self._start_pool()
         return
 
+    def get_state_handle(
+            self, M_c, T, X_L, X_D, seed, n_chains=1,
+            initialization=b'from_the_prior', row_initialization=-1,
+            ROW_CRP_ALPHA_GRID=(), COLUMN_CRP_ALPHA_GRID=(), S_GRID=(),
+            MU_GRID=(), N_GRID=31, CT_KERNEL=0):
+        """Build a PooledStateHandle keeping each chain resident in one of
+        cpu_count worker processes.
+
+        See LocalEngine.get_state_handle.  The workers are separate from the
+        engine's pool, and last until the handle is closed.
+
+        :returns: PooledStateHandle
+        """
+        return StateHandle.PooledStateHandle(
+            M_c, T, X_L, X_D, seed=seed, n_chains=n_chains,
+            n_workers=self.cpu_count, initialization=initialization,
+            row_initialization=row_initialization,
+            ROW_CRP_ALPHA_GRID=ROW_CRP_ALPHA_GRID,
+            COLUMN_CRP_ALPHA_GRID=COLUMN_CRP_ALPHA_GRID, S_GRID=S_GRID,
+            MU_GRID=MU_GRID, N_GRID=N_GRID, CT_KERNEL=CT_KERNEL)
+
+    def share_data(self, T):
+        if isinstance(T, sd.SharedTable):
+            return T
+        return sd.SharedTable.create(T)
+
+    def release_data(self, T, T_shared):
+        if T_shared is not T:
+            T_shared.unlink()
+
     def __enter__(self):
         return self
 
@@ -47,3 +110,12 @@ class MultiprocessingEngine(LE.LocalEngine):
 
     def __exit__(self, type, value, traceback):
         self.pool.terminate()
+
+
+def _get_processes(pool):
+    # Pool has no public way to list its processes, and none to notice one
+    # dying: it quietly starts a replacement, and the AsyncResult of the
+    # task the dead process held never becomes ready, so waiting on it
+    # would hang.  Comparing the processes' pids before and after is the
+    # only sign, so the private attribute is read here and nowhere else.
+    return pool._pool
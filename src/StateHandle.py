@@ -0,0 +1,408 @@
+#
+#   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+#
+#   Lead Developers: Dan Lovell and Jay Baxter
+#   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+#   Research Leads: Vikash Mansinghka, Patrick Shafto
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+from __future__ import print_function
+
+import multiprocessing
+
+import numpy
+
+import crosscat.cython_code.State as State
+import crosscat.utils.general_utils as gu
+import crosscat.utils.sample_utils as su
+import crosscat.utils.shared_data as sd
+
+
+def _get_chain_args(X_L, X_D, seed, n_chains):
+    """Return the X_L, X_D and seed to build each chain from, whether they
+    were given as a multistate, and the function the seeds were drawn
+    from, for the chains' later seeds.  Without X_L and X_D, there are
+    n_chains chains from the prior."""
+    get_next_seed = gu.make_get_next_seed(seed)
+    if X_L is None:
+        if X_D is not None:
+            raise ValueError('X_L and X_D must be given together')
+        X_L_list = [None] * n_chains
+        X_D_list = [None] * n_chains
+        was_multistate = n_chains != 1
+    else:
+        X_L_list, X_D_list, was_multistate = su.ensure_multistate(X_L, X_D)
+    chain_args = [
+        (X_L_i, X_D_i, get_next_seed())
+        for X_L_i, X_D_i in zip(X_L_list, X_D_list)
+    ]
+    return chain_args, was_multistate, get_next_seed
+
+
+class StateHandle(object):
+    """Keep the C++ States of one or more chains alive between calls.
+
+    LocalEngine rebuilds a p_State from X_L and X_D on every call and
+    serializes it back afterwards.  A StateHandle builds the p_States once
+    and runs analyze and insert against them directly; X_L and X_D are only
+    materialized when asked for, and are then cached until the next mutation.
+
+    Each chain continues its own random stream across calls, so the sequence
+    of states is determined by the seed the handle was built with.
+    """
+
+    def __init__(
+            self, M_c, T, X_L=None, X_D=None, seed=0, n_chains=1,
+            initialization=b'from_the_prior', row_initialization=-1,
+            ROW_CRP_ALPHA_GRID=(), COLUMN_CRP_ALPHA_GRID=(),
+            S_GRID=(), MU_GRID=(), N_GRID=31, CT_KERNEL=0):
+        """Build the chains, from X_L and X_D if given, else from the prior.
+
+        :param X_L: latent variables of the state(s) to resume from
+        :type X_L: dict or list of dicts
+        :param X_D: row cluster assignments of the state(s) to resume from
+        :type X_D: list of lists or list of list of lists
+        :param seed: the random seed
+        :type seed: int
+        :param n_chains: the number of chains to sample from the prior.
+            Ignored if X_L and X_D are given.
+        :type n_chains: int
+        """
+        chain_args, self.was_multistate, get_next_seed = _get_chain_args(
+            X_L, X_D, seed, n_chains)
+        # Convert T once so that every chain's C++ State borrows one buffer.
+        T = State.as_cpp_data(T)
+        self.M_c = M_c
+        self.num_rows = len(T)
+        self.p_State_list = [
+            State.p_State(
+                M_c, T, X_L=X_L_i, X_D=X_D_i, initialization=initialization,
+                row_initialization=row_initialization,
+                ROW_CRP_ALPHA_GRID=ROW_CRP_ALPHA_GRID,
+                COLUMN_CRP_ALPHA_GRID=COLUMN_CRP_ALPHA_GRID,
+                S_GRID=S_GRID, MU_GRID=MU_GRID, N_GRID=N_GRID,
+                SEED=seed_i, CT_KERNEL=CT_KERNEL)
+            for X_L_i, X_D_i, seed_i in chain_args
+        ]
+        self._get_next_seed = get_next_seed
+        self._latent_states = None
+        return
+
+    @property
+    def n_chains(self):
+        return len(self.p_State_list)
+
+    def analyze(
+            self, kernel_list=(), n_steps=1, c=(), r=(), max_iterations=-1,
+            max_time=-1, progress=None, n_threads=1):
+        """Evolve each chain in place by running MCMC transition kernels.
+
+        The arguments have the same meaning as in LocalEngine.analyze.
+
+        :returns: list of floats -- the score delta of each chain
+        """
+        if n_steps <= 0:
+            raise ValueError("You must do at least one analyze step.")
+        self._invalidate_latent_states()
+        score_deltas = []
+        for p_State in self.p_State_list:
+            p_State.set_num_threads(n_threads)
+            score_deltas.append(p_State.transition(
+                kernel_list, n_steps, c, r, max_iterations, max_time,
+                progress=progress))
+        return score_deltas
+
+    def insert(self, new_rows):
+        """Add new_rows to the data and to each chain's latent state.
+
+        Each new row is assigned a cluster by a row partition transition,
+        as in LocalEngine.insert.
+
+        :param new_rows: the rows to append, in mapped representation
+        :type new_rows: list of lists
+        """
+        if not isinstance(new_rows, list):
+            raise TypeError('new_rows must be list of lists')
+        self._invalidate_latent_states()
+        for p_State in self.p_State_list:
+            p_State.append_rows(new_rows)
+            row_idx = self.num_rows
+            for row_data in new_rows:
+                p_State.insert_row(row_data, row_idx)
+                p_State.transition(
+                    which_transitions=['row_partition_assignments'],
+                    r=[row_idx])
+                row_idx += 1
+        self.num_rows += len(new_rows)
+        return
+
+    def _invalidate_latent_states(self):
+        self._latent_states = None
+        return
+
+    def get_latent_states(self):
+        """Materialize the latent state of each chain.
+
+        The result is cached until the next analyze or insert, and must not
+        be mutated by the caller.
+
+        :returns: X_L, X_D -- a single state if the handle was built from
+            (or for) a single chain, else lists of states
+        """
+        if self._latent_states is None:
+            X_L_list = [p_State.get_X_L() for p_State in self.p_State_list]
+            X_D_list = [p_State.get_X_D() for p_State in self.p_State_list]
+            self._latent_states = X_L_list, X_D_list
+        X_L_list, X_D_list = self._latent_states
+        if not self.was_multistate:
+            return X_L_list[0], X_D_list[0]
+        return X_L_list, X_D_list
+
+    def simple_predictive_sample(self, Y, Q, n=1):
+        """Sample values from the predictive distribution of the chains.
+
+        See LocalEngine.simple_predictive_sample.
+        """
+        X_L, X_D = self.get_latent_states()
+        if self.was_multistate:
+            return su.simple_predictive_sample_multistate(
+                self.M_c, X_L, X_D, Y, Q, self._get_next_seed, n)
+        return su.simple_predictive_sample(
+            self.M_c, X_L, X_D, Y, Q, self._get_next_seed, n)
+
+    def predictive_probability(self, Y, Q):
+        """Calculate the joint log probability of the cells in Q.
+
+        See LocalEngine.predictive_probability.
+        """
+        X_L, X_D = self.get_latent_states()
+        if self.was_multistate:
+            return su.predictive_probability_multistate(
+                self.M_c, X_L, X_D, Y, Q)
+        return su.predictive_probability(self.M_c, X_L, X_D, Y, Q)
+
+
+def _serve_chains(conn, M_c, T, chain_args, kwargs):
+    """Hold a single-chain StateHandle per chain of chain_args, and run the
+    commands received on conn against them until told to close.
+
+    A command is the name of a StateHandle method and one tuple of arguments
+    per chain; the reply is (True, one result per chain), or (False, the
+    exception raised).
+    """
+    T = sd.get_table(T)
+    handles = [
+        StateHandle(M_c, T, X_L=X_L, X_D=X_D, seed=seed, **kwargs)
+        for X_L, X_D, seed in chain_args
+    ]
+    conn.send(None)
+    while True:
+        command, args_list = conn.recv()
+        if command == 'close':
+            break
+        try:
+            result = [
+                getattr(handle, command)(*args)
+                for handle, args in zip(handles, args_list)
+            ]
+        except Exception as e:
+            conn.send((False, e))
+        else:
+            conn.send((True, result))
+    conn.close()
+    return
+
+
+class PooledStateHandle(object):
+    """A StateHandle whose chains stay resident in worker processes.
+
+    Each chain is pinned to one of n_workers processes, which builds its
+    p_State once and keeps it across calls.  analyze, insert and the queries
+    are sent to the workers as commands, and only their results come back:
+    score deltas, log probabilities or samples.  X_L and X_D only cross
+    between processes when get_latent_states is called.
+
+    T is sent to the workers as a SharedTable, which they borrow until their
+    first insert.  Call close, or use the handle in a with block, to stop
+    the workers.
+    """
+
+    def __init__(
+            self, M_c, T, X_L=None, X_D=None, seed=0, n_chains=1,
+            n_workers=None, **kwargs):
+        """Start the workers and build the chains in them.
+
+        The other arguments have the same meaning as in StateHandle.
+
+        :param n_workers: the number of worker processes.  Defaults to the
+            number of CPUs, but never more than the number of chains.
+        :type n_workers: int
+        """
+        self._conns = []
+        self._workers = []
+        chain_args, self.was_multistate, get_next_seed = _get_chain_args(
+            X_L, X_D, seed, n_chains)
+        if n_workers is None:
+            n_workers = multiprocessing.cpu_count()
+        n_workers = max(1, min(n_workers, len(chain_args)))
+        self.M_c = M_c
+        self.num_rows = len(T)
+        self.n_chains = len(chain_args)
+        # Chain i lives in worker i % n_workers, as the i // n_workers'th
+        # chain of that worker.
+        self._worker_chains = [
+            list(range(self.n_chains))[i::n_workers]
+            for i in range(n_workers)
+        ]
+        self._get_next_seed = get_next_seed
+        self._latent_states = None
+        T_shared = T
+        if not isinstance(T, sd.SharedTable):
+            T_shared = sd.SharedTable.create(T)
+        try:
+            for chains in self._worker_chains:
+                conn, worker_conn = multiprocessing.Pipe()
+                worker = multiprocessing.Process(
+                    target=_serve_chains,
+                    args=(worker_conn, M_c, T_shared,
+                          [chain_args[i] for i in chains], kwargs))
+                worker.daemon = True
+                worker.start()
+                self._conns.append(conn)
+                self._workers.append(worker)
+            # Wait until every worker has mapped T before unlinking it.
+            for conn in self._conns:
+                conn.recv()
+        except:
+            self.close()
+            raise
+        finally:
+            if T_shared is not T:
+                T_shared.unlink()
+        return
+
+    def _command(self, command, args_list=None):
+        """Run command on every chain, with args_list[i] as the arguments
+        for chain i, and return the results in chain order."""
+        if args_list is None:
+            args_list = [()] * self.n_chains
+        for conn, chains in zip(self._conns, self._worker_chains):
+            conn.send((command, [args_list[i] for i in chains]))
+        results = [None] * self.n_chains
+        error = None
+        for conn, chains in zip(self._conns, self._worker_chains):
+            ok, worker_results = conn.recv()
+            if not ok:
+                error = error or worker_results
+                continue
+            for i, result in zip(chains, worker_results):
+                results[i] = result
+        if error is not None:
+            raise error
+        return results
+
+    def analyze(
+            self, kernel_list=(), n_steps=1, c=(), r=(), max_iterations=-1,
+            max_time=-1, progress=None, n_threads=1):
+        """Evolve each chain in its worker.  See StateHandle.analyze.
+
+        :returns: list of floats -- the score delta of each chain
+        """
+        if n_steps <= 0:
+            raise ValueError("You must do at least one analyze step.")
+        self._invalidate_latent_states()
+        args = (kernel_list, n_steps, c, r, max_iterations, max_time,
+                progress, n_threads)
+        results = self._command('analyze', [args] * self.n_chains)
+        return [score_deltas[0] for score_deltas in results]
+
+    def insert(self, new_rows):
+        """Add new_rows to the data and to each chain's latent state.
+        See StateHandle.insert."""
+        if not isinstance(new_rows, list):
+            raise TypeError('new_rows must be list of lists')
+        self._invalidate_latent_states()
+        self._command('insert', [(new_rows,)] * self.n_chains)
+        self.num_rows += len(new_rows)
+        return
+
+    def _invalidate_latent_states(self):
+        self._latent_states = None
+        return
+
+    def get_latent_states(self):
+        """Fetch the latent state of each chain from the workers.
+
+        See StateHandle.get_latent_states.
+        """
+        if self._latent_states is None:
+            results = self._command('get_latent_states')
+            X_L_list = [X_L for X_L, _X_D in results]
+            X_D_list = [X_D for _X_L, X_D in results]
+            self._latent_states = X_L_list, X_D_list
+        X_L_list, X_D_list = self._latent_states
+        if not self.was_multistate:
+            return X_L_list[0], X_D_list[0]
+        return X_L_list, X_D_list
+
+    def simple_predictive_sample(self, Y, Q, n=1):
+        """Sample values from the predictive distribution of the chains.
+
+        As simple_predictive_sample_multistate does, each chain draws n //
+        n_chains of the samples, and a random n % n_chains of the chains draw
+        one more.  The samples are drawn in the workers.
+        """
+        n_from_each, n_sampled = divmod(n, self.n_chains)
+        random_state = numpy.random.RandomState(self._get_next_seed())
+        which_sampled = set(
+            random_state.permutation(self.n_chains)[:n_sampled])
+        args_list = [
+            (Y, Q, n_from_each + (i in which_sampled))
+            for i in range(self.n_chains)
+        ]
+        results = self._command('simple_predictive_sample', args_list)
+        return [x for chain_x in results for x in chain_x]
+
+    def predictive_probability(self, Y, Q):
+        """Calculate the joint log probability of the cells in Q, in the
+        workers.  See LocalEngine.predictive_probability."""
+        logprobs = self._command(
+            'predictive_probability', [(Y, Q)] * self.n_chains)
+        if not self.was_multistate:
+            return logprobs[0]
+        return gu.logmeanexp(logprobs)
+
+    def close(self):
+        """Stop the workers.  The handle cannot be used afterwards."""
+        for conn in self._conns:
+            try:
+                conn.send(('close', None))
+                conn.close()
+            except (IOError, OSError):
+                pass
+        for worker in self._workers:
+            worker.join()
+        self._conns = []
+        self._workers = []
+        return
+
+    def __enter__(self):
+        return self
+
+    def __del__(self):
+        self.close()
+
+    def __exit__(self, type, value, traceback):
+        self.close()
@@ -21,6 +21,8 @@ from libcpp.vector cimport vector
 from libcpp.string cimport string as cpp_string
 from libcpp.map cimport map as cpp_map
 from cython.operator import dereference
+cimport numpy as np
+import numpy
 import six
 
 
@@ -55,6 +57,7 @@ cdef extern from "ContinuousComponentModel.h":
 		double calc_marginal_logp()
 		double calc_element_predictive_logp(double element)
 		double calc_element_predictive_logp_constrained(double element, vector[double] constraints)
+		vector[double] calc_element_predictive_logps_constrained(vector[double] elements, vector[double] constraints)
 	ContinuousComponentModel *new_ContinuousComponentModel "new ContinuousComponentModel" (cpp_map[cpp_string, double] &in_hypers)
 	ContinuousComponentModel *new_ContinuousComponentModel "new ContinuousComponentModel" (cpp_map[cpp_string, double] &in_hypers, int COUNT, double SUM_X, double SUM_X_SQ)
 	void del_ContinuousComponentModel "delete" (ContinuousComponentModel *ccm)
@@ -95,5 +98,20 @@ cdef class p_ContinuousComponentModel:
 		return self.thisptr.calc_element_predictive_logp(element)
 	def calc_element_predictive_logp_constrained(self, element, constraints):
 		return self.thisptr.calc_element_predictive_logp_constrained(element, constraints)
+	def calc_element_predictive_logps_constrained(self, elements, constraints):
+		cdef np.ndarray[np.float64_t, ndim=1] elements_array = \
+			numpy.ascontiguousarray(elements, dtype=numpy.float64)
+		cdef size_t i, num_elements = elements_array.shape[0]
+		cdef vector[double] elements_v
+		cdef vector[double] logps_v
+		cdef np.ndarray[np.float64_t, ndim=1] logps = numpy.empty(num_elements)
+		elements_v.resize(num_elements)
+		for i in range(num_elements):
+			elements_v[i] = elements_array[i]
+		logps_v = self.thisptr.calc_element_predictive_logps_constrained(
+			elements_v, constraints)
+		for i in range(num_elements):
+			logps[i] = logps_v[i]
+		return logps
 	def __repr__(self):
 		return self.thisptr.to_string()
@@ -21,6 +21,8 @@ from libcpp.vector cimport vector
 from libcpp.string cimport string as cpp_string
 from libcpp.map cimport map as cpp_map
 from cython.operator import dereference
+cimport numpy as np
+import numpy
 
 
 cdef extern from "string" namespace "std":
@@ -52,6 +54,7 @@ cdef extern from "CyclicComponentModel.h":
 		double calc_marginal_logp()
 		double calc_element_predictive_logp(double element)
 		double calc_element_predictive_logp_constrained(double element, vector[double] constraints)
+		vector[double] calc_element_predictive_logps_constrained(vector[double] elements, vector[double] constraints)
 	CyclicComponentModel *new_CyclicComponentModel "new CyclicComponentModel" (cpp_map[cpp_string, double] &in_hypers)
 	CyclicComponentModel *new_CyclicComponentModel "new CyclicComponentModel" (cpp_map[cpp_string, double] &in_hypers, int COUNT, double SUM_SIN_X, double SUM_COS_X)
 	void del_CyclicComponentModel "delete" (CyclicComponentModel *ccm)
@@ -90,5 +93,20 @@ cdef class p_CyclicComponentModel:
 		return self.thisptr.calc_element_predictive_logp(element)
 	def calc_element_predictive_logp_constrained(self, element, constraints):
 		return self.thisptr.calc_element_predictive_logp_constrained(element, constraints)
+	def calc_element_predictive_logps_constrained(self, elements, constraints):
+		cdef np.ndarray[np.float64_t, ndim=1] elements_array = \
+			numpy.ascontiguousarray(elements, dtype=numpy.float64)
+		cdef size_t i, num_elements = elements_array.shape[0]
+		cdef vector[double] elements_v
+		cdef vector[double] logps_v
+		cdef np.ndarray[np.float64_t, ndim=1] logps = numpy.empty(num_elements)
+		elements_v.resize(num_elements)
+		for i in range(num_elements):
+			elements_v[i] = elements_array[i]
+		logps_v = self.thisptr.calc_element_predictive_logps_constrained(
+			elements_v, constraints)
+		for i in range(num_elements):
+			logps[i] = logps_v[i]
+		return logps
 	def __repr__(self):
 		return self.thisptr.to_string()
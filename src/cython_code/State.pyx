@@ -27,6 +27,8 @@ from cython.operator import dereference
 
 cimport numpy as np
 
+np.import_array()
+
 import collections
 import numpy
 import six
@@ -67,18 +69,23 @@ cdef extern from "Matrix.h":
         size_t size2()
         double& operator()(size_t i, size_t j)
     matrix[double] *new_matrix "new matrix<double>" (size_t i, size_t j)
+    matrix[double] *new_borrowing_matrix "new matrix<double>" (
+        size_t i, size_t j, double *data)
     void del_matrix "delete" (matrix *m)
 
 
-cdef matrix[double]* convert_data_to_cpp(np.ndarray[np.float64_t, ndim=2] data):
-    cdef int num_rows = data.shape[0]
-    cdef int num_cols = data.shape[1]
-    dataptr = new_matrix(num_rows, num_cols)
-    cdef int i,j
-    for i from 0 <= i < num_rows:
-        for j from 0 <= j < num_cols:
-            set_double(dereference(dataptr)(i,j), data[i,j])
-    return dataptr
+def as_cpp_data(T):
+    """Return T as a C-contiguous float64 array, copying only if needed."""
+    return numpy.ascontiguousarray(T, dtype=numpy.float64)
+
+
+cdef matrix[double]* convert_data_to_cpp(np.ndarray data):
+    # The matrix borrows the elements of data, which must come from
+    # as_cpp_data and outlive it.
+    assert data.ndim == 2
+    assert data.dtype == numpy.float64 and data.flags.c_contiguous
+    return new_borrowing_matrix(
+        data.shape[0], data.shape[1], <double *> np.PyArray_DATA(data))
 
 
 cdef extern from "State.h":
@@ -128,6 +135,10 @@ cdef extern from "State.h":
         vector[vector[int]] get_X_D()
         void SaveResult()
 
+        # Threading.
+        int get_num_threads()
+        void set_num_threads(int num_threads)
+
     State *new_State "new State" (
         matrix[double] &data,
         vector[string] global_col_datatypes,
@@ -228,8 +239,9 @@ cdef class p_State:
         global_row_indices = range(len(T))
         global_col_indices = range(len(T[0]))
 
-        # FIXME: keeping TWO copies of the data here
-        self.T_array = numpy.array(T)
+        # The C++ matrix borrows T_array, so there is at most one copy of
+        # the data here, and none if T is already a float64 array.
+        self.T_array = as_cpp_data(T)
         self.dataptr = convert_data_to_cpp(self.T_array)
         self.column_types = convert_string_vector_to_cpp(column_types)
         self.event_counts = convert_int_vector_to_cpp(event_counts)
@@ -255,8 +267,7 @@ cdef class p_State:
                 N_GRID, SEED, CT_KERNEL
             )
         else:
-            # # !!! MUTATES X_L !!!
-            desparsify_X_L(M_c, X_L)
+            X_L = desparsify_X_L(M_c, X_L)
             constructor_args = transform_latent_state_to_constructor_args(
                 X_L, X_D)
             hypers_m = constructor_args['hypers_m']
@@ -320,6 +331,8 @@ cdef class p_State:
         return self.thisptr.calc_row_predictive_logp(in_vd)
     def get_draw(self, row_idx, random_seed):
         return self.thisptr.get_draw(row_idx, random_seed)
+    def get_num_threads(self):
+        return self.thisptr.get_num_threads()
 
     # get_X_L helpers helpers
     def get_row_partition_model_i(self, view_idx):
@@ -402,9 +415,22 @@ cdef class p_State:
             return retval
 
     # mutators
+    def set_num_threads(self, num_threads):
+        self.thisptr.set_num_threads(num_threads)
+
     def insert_row(self, row_data, matching_row_idx, row_idx=-1):
         return self.thisptr.insert_row(row_data, matching_row_idx, row_idx)
 
+    def append_rows(self, new_rows):
+        # Grow the data the transitions read from.  Only the data is
+        # touched: the rows still have to be added to the latent state
+        # with insert_row.
+        new_rows = numpy.array(new_rows, dtype=numpy.float64, ndmin=2)
+        T_array = as_cpp_data(numpy.vstack((self.T_array, new_rows)))
+        del_matrix(self.dataptr)
+        self.T_array = T_array
+        self.dataptr = convert_data_to_cpp(self.T_array)
+
     def transition(
             self, which_transitions=(), n_steps=1, c=(), r=(),
             max_iterations=-1, max_time=-1, progress=None,
@@ -648,9 +674,10 @@ def sparsify_column_component_suffstats(column_component_suffstats):
 
 def desparsify_column_component_suffstats(
         column_component_suffstats, N_keys):
-    for idx, suffstats_i in enumerate(column_component_suffstats):
-        insert_zero_values(suffstats_i, N_keys)
-    return None
+    return [
+        insert_zero_values(dict(suffstats_i), N_keys)
+        for suffstats_i in column_component_suffstats
+    ]
 
 
 def get_column_component_suffstats_by_global_col_idx(M_c, X_L, col_idx):
@@ -675,18 +702,32 @@ def sparsify_X_L(M_c, X_L):
     return None
 
 def desparsify_X_L(M_c, X_L):
+    """Return X_L with the zero counts of multinomial suffstats filled in.
+
+    X_L is not mutated.  The result shares with X_L everything but the
+    containers on the path to the desparsified suffstats, so this is cheap
+    next to a deepcopy.
+    """
+    X_L = dict(X_L)
+    X_L['view_state'] = [
+        dict(view_state_i, column_component_suffstats=list(
+            view_state_i['column_component_suffstats']))
+        for view_state_i in X_L['view_state']
+    ]
     for col_idx, col_i_metadata in enumerate(M_c['column_metadata']):
         modeltype = col_i_metadata['modeltype']
         if modeltype != 'symmetric_dirichlet_discrete':
             continue
-        column_component_suffstats_i = \
-            get_column_component_suffstats_by_global_col_idx(
-                M_c, X_L, col_idx)
+        col_name = M_c['idx_to_name'][str(col_idx)]
+        view_idx = X_L['column_partition']['assignments'][col_idx]
+        view_state_i = X_L['view_state'][view_idx]
+        within_view_idx = view_state_i['column_names'].index(col_name)
+        column_component_suffstats = view_state_i['column_component_suffstats']
         N_keys = len(col_i_metadata['value_to_code'])
-        desparsify_column_component_suffstats(
-            column_component_suffstats_i, N_keys)
-    return None
-
+        column_component_suffstats[within_view_idx] = \
+            desparsify_column_component_suffstats(
+                column_component_suffstats[within_view_idx], N_keys)
+    return X_L
 
 def get_modeltype_from_name(M_c, col_name):
     global_col_idx = M_c['name_to_idx'][col_name]
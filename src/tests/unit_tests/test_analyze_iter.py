@@ -0,0 +1,156 @@
+#
+#   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+#
+#   Lead Developers: Dan Lovell and Jay Baxter
+#   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+#   Research Leads: Vikash Mansinghka, Patrick Shafto
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import collections
+import os
+import time
+
+import pytest
+
+from crosscat.LocalEngine import LocalEngine
+from crosscat.MultiprocessingEngine import MultiprocessingEngine
+from crosscat.utils import data_utils as du
+
+N_ROWS = 20
+N_COLS = 4
+N_CHAINS = 3
+
+
+def quick_le(seed):
+    T, M_r, M_c = du.gen_factorial_data_objects(seed, 2, N_COLS, N_ROWS, 2)
+    engine = LocalEngine(seed=seed)
+    X_L, X_D = engine.initialize(M_c, M_r, T, seed, n_chains=N_CHAINS)
+    return T, M_c, X_L, X_D, engine
+
+
+def test_final_states_match_analyze():
+    T, M_c, X_L, X_D, engine = quick_le(0)
+    X_L_prime, X_D_prime = engine.analyze(M_c, T, X_L, X_D, 1, n_steps=3)
+    checkpoints = list(engine.analyze_iter(M_c, T, X_L, X_D, 1, n_steps=3))
+    assert len(checkpoints) == N_CHAINS
+    assert all(cp.done and cp.n_steps == 3 for cp in checkpoints)
+    by_chain = {cp.chain_idx: cp for cp in checkpoints}
+    assert [by_chain[i].X_L for i in range(N_CHAINS)] == list(X_L_prime)
+    assert [by_chain[i].X_D for i in range(N_CHAINS)] == list(X_D_prime)
+
+
+def test_checkpoints_same_in_every_engine():
+    T, M_c, X_L, X_D, engine = quick_le(0)
+
+    def run(engine):
+        steps = collections.defaultdict(list)
+        final = {}
+        for cp in engine.analyze_iter(
+                M_c, T, X_L, X_D, 2, n_steps=5, checkpoint_every=2,
+                do_timing=True):
+            steps[cp.chain_idx].append((cp.n_steps, cp.done))
+            assert cp.diagnostics >= 0
+            if cp.done:
+                final[cp.chain_idx] = cp.X_L, cp.X_D
+        return dict(steps), final
+
+    local_steps, local_final = run(engine)
+    assert local_steps == {
+        i: [(2, False), (4, False), (5, True)] for i in range(N_CHAINS)
+    }
+    with MultiprocessingEngine(cpu_count=2) as mp_engine:
+        mp_steps, mp_final = run(mp_engine)
+    assert mp_steps == local_steps
+    assert mp_final == local_final
+
+
+def test_close_cancels_remaining_segments():
+    T, M_c, X_L, X_D, engine = quick_le(0)
+    ran = []
+    engine.submit = lambda func, args, callback: \
+        ran.append(args[0]) or callback(func(*args))
+    checkpoints = engine.analyze_iter(
+        M_c, T, X_L, X_D, 3, n_steps=4, checkpoint_every=1)
+    first = next(checkpoints)
+    assert (first.chain_idx, first.n_steps, first.done) == (0, 1, False)
+    checkpoints.close()
+    assert ran == [0]
+
+
+def test_close_stops_running_segments():
+    T, M_c, X_L, X_D, engine = quick_le(0)
+    with MultiprocessingEngine(cpu_count=2) as mp_engine:
+        pool = mp_engine.pool
+        checkpoints = mp_engine.analyze_iter(
+            M_c, T, X_L, X_D, 3, n_steps=4, checkpoint_every=1)
+        next(checkpoints)
+        checkpoints.close()
+        assert mp_engine.pool is not pool
+        # The new pool runs chains as the old one did.
+        assert mp_engine.analyze(M_c, T, X_L, X_D, 1, n_steps=2) == \
+            engine.analyze(M_c, T, X_L, X_D, 1, n_steps=2)
+
+
+def test_failed_segment_raises():
+    T, M_c, X_L, X_D, engine = quick_le(0)
+    with MultiprocessingEngine(cpu_count=2) as mp_engine:
+        # A task that raises never calls back.
+        mp_engine.submit = lambda func, args, callback: \
+            mp_engine.pool.apply_async(int, ('x',), callback=callback)
+        with pytest.raises(ValueError):
+            list(mp_engine.analyze_iter(M_c, T, X_L, X_D, 3))
+        # Nor does one whose process dies.
+        mp_engine.submit = lambda func, args, callback: \
+            mp_engine.pool.apply_async(os._exit, (1,), callback=callback)
+        with pytest.raises(RuntimeError):
+            list(mp_engine.analyze_iter(M_c, T, X_L, X_D, 3))
+
+
+def test_budgeted_runs_capped_steps_in_every_engine():
+    T, M_c, X_L, X_D, engine = quick_le(0)
+    X_L_prime, X_D_prime, steps = engine.analyze_budgeted(
+        M_c, T, X_L, X_D, 4, max_time=60, slice_steps=2, n_steps=5)
+    assert steps == [5] * N_CHAINS
+    assert engine.analyze_budgeted(
+        M_c, T, X_L, X_D, 4, max_time=60, slice_steps=2, n_steps=5) == \
+        (X_L_prime, X_D_prime, steps)
+    with MultiprocessingEngine(cpu_count=2) as mp_engine:
+        mp_result = mp_engine.analyze_budgeted(
+            M_c, T, X_L, X_D, 4, max_time=60, slice_steps=2, n_steps=5)
+    assert mp_result == (X_L_prime, X_D_prime, steps)
+
+
+def test_budgeted_stops_at_the_deadline():
+    T, M_c, X_L, X_D, engine = quick_le(0)
+    start = time.time()
+    X_L_prime, X_D_prime, steps = engine.analyze_budgeted(
+        M_c, T, X_L[0], X_D[0], 5, max_time=0.5)
+    assert time.time() - start < 5
+    assert isinstance(steps, int) and 0 < steps
+    assert len(X_D_prime[0]) == N_ROWS
+
+
+def test_budgeted_cuts_slices_to_fit():
+    T, M_c, X_L, X_D, engine = quick_le(0)
+    ran = []
+    submit = engine.submit
+    engine.submit = lambda func, args, callback: \
+        ran.append(args[1][6]) or submit(func, args, callback=callback)
+    X_L_prime, X_D_prime, steps = engine.analyze_budgeted(
+        M_c, T, X_L[0], X_D[0], 5, max_time=0.5, slice_steps=10**6)
+    # A first step to time the chain, then as many as fit.
+    assert ran[0] == 1
+    assert 1 < ran[1] < 10**6
+    assert steps == sum(ran)
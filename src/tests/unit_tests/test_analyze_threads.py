@@ -0,0 +1,77 @@
+#
+#   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+#
+#   Lead Developers: Dan Lovell and Jay Baxter
+#   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+#   Research Leads: Vikash Mansinghka, Patrick Shafto
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import pytest
+
+from crosscat.LocalEngine import LocalEngine
+from crosscat.utils import data_utils as du
+
+N_ROWS = 200
+N_COLS = 6
+
+
+def quick_le(seed, n_chains=1):
+    T, M_r, M_c = du.gen_factorial_data_objects(seed, 2, N_COLS, N_ROWS, 2)
+    engine = LocalEngine(seed=seed)
+    X_L, X_D = engine.initialize(M_c, M_r, T, seed, n_chains=n_chains)
+    return T, M_r, M_c, X_L, X_D, engine
+
+
+def test_one_thread_is_sequential_gibbs():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    default = engine.analyze(M_c, T, X_L, X_D, 1, n_steps=3)
+    one_thread = engine.analyze(M_c, T, X_L, X_D, 1, n_steps=3, n_threads=1)
+    assert default == one_thread
+
+
+@pytest.mark.parametrize('n_threads', [2, 4])
+def test_threaded_row_sweep_is_reproducible(n_threads):
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0, n_chains=2)
+    kernel_list = ['row_partition_assignments']
+    results = [
+        engine.analyze(
+            M_c, T, X_L, X_D, 2, kernel_list=kernel_list, n_steps=3,
+            n_threads=n_threads)
+        for _ in range(2)
+    ]
+    assert results[0] == results[1]
+    X_L_list, X_D_list = results[0]
+    for X_D_i in X_D_list:
+        assert all(len(X_D_i_v) == N_ROWS for X_D_i_v in X_D_i)
+    # Threads also apply to the full set of kernels.
+    engine.analyze(M_c, T, X_L, X_D, 2, n_steps=2, n_threads=n_threads)
+
+
+def test_view_parallel_row_sweep_is_exact():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0, n_chains=2)
+    X_L, X_D = engine.analyze(M_c, T, X_L, X_D, 1, n_steps=5)
+    assert any(len(X_D_i) > 1 for X_D_i in X_D)
+    # With several views, each view is swept by one thread using its own
+    # random stream, so the result does not depend on the thread count.
+    kernel_list = ['row_partition_assignments']
+    results = [
+        engine.analyze(
+            M_c, T, X_L, X_D, 2, kernel_list=kernel_list, n_steps=3,
+            n_threads=n_threads)
+        for n_threads in [1, 3]
+    ]
+    for X_L_i, X_D_i, X_L_j, X_D_j in zip(*(results[0] + results[1])):
+        if len(X_D_i) > 1:
+            assert X_D_i == X_D_j
@@ -0,0 +1,108 @@
+#
+#   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+#
+#   Lead Developers: Dan Lovell and Jay Baxter
+#   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+#   Research Leads: Vikash Mansinghka, Patrick Shafto
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import copy
+
+import crosscat.tests.synthetic_data_generator as sdg
+import crosscat.utils.sample_utils as su
+from crosscat.LocalEngine import LocalEngine
+
+N_ROWS = 50
+
+
+def quick_le(seed):
+    cctypes = ['continuous', 'multinomial', 'cyclic']
+    distargs = [None, dict(K=4), None]
+    cols_to_views = [0, 0, 1]
+    separation = [0.6, 0.9]
+    cluster_weights = [[.5, .5], [.9, .1]]
+    T, M_c, M_r = sdg.gen_data(cctypes, N_ROWS, cols_to_views,
+        cluster_weights, separation, seed=seed, distargs=distargs,
+        return_structure=True)
+    engine = LocalEngine()
+    X_L, X_D = engine.initialize(M_c, M_r, T, seed)
+    X_L, X_D = engine.analyze(M_c, T, X_L, X_D, seed, n_steps=3)
+    return T, M_r, M_c, X_L, X_D, engine
+
+
+def test_repeated_gets_hit():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    cache = su.ClusterModelCache()
+    model = cache.get(M_c, X_L, 0, 0)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert cache.get(M_c, X_L, 0, 0) is model
+    assert (cache.hits, cache.misses) == (1, 1)
+    # The empty cluster is cached apart from the others.
+    num_clusters = len(X_L['view_state'][0]['row_partition_model']['counts'])
+    cache.get(M_c, X_L, 0, num_clusters)
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert len(cache) == 2
+
+
+def test_other_state_misses():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    cache = su.ClusterModelCache()
+    cache.get(M_c, X_L, 0, 0)
+    # Keyed by identity, so even an equal copy misses.
+    X_L_prime = copy.deepcopy(X_L)
+    cache.get(M_c, X_L_prime, 0, 0)
+    assert (cache.hits, cache.misses) == (0, 2)
+    column = X_L_prime['view_state'][0]['column_names'][0]
+    X_L_prime['column_hypers'][M_c['name_to_idx'][column]]['r'] += 1
+    # A state mutated in place must be invalidated.
+    cache.invalidate(M_c, X_L_prime)
+    cache.get(M_c, X_L_prime, 0, 0)
+    assert (cache.hits, cache.misses) == (0, 3)
+    cache.get(M_c, X_L, 0, 0)
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_invalidate():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    cache = su.ClusterModelCache()
+    for view_idx, view_state_i in enumerate(X_L['view_state']):
+        num_clusters = len(view_state_i['row_partition_model']['counts'])
+        for cluster_idx in range(num_clusters + 1):
+            cache.get(M_c, X_L, view_idx, cluster_idx)
+    assert len(cache) > 0
+    cache.invalidate(M_c, [X_L])
+    assert len(cache) == 0
+    assert cache.num_bytes == 0
+
+
+def test_byte_budget_evicts_least_recently_used():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    X_L_list = [copy.deepcopy(X_L) for _ in range(3)]
+    cache = su.ClusterModelCache()
+    cache.get(M_c, X_L, 0, 0)
+    state_bytes = cache.num_bytes
+    cache = su.ClusterModelCache(max_bytes=2 * state_bytes)
+    cache.get(M_c, X_L_list[0], 0, 0)
+    cache.get(M_c, X_L_list[1], 0, 0)
+    # Touch the first state, so that the second is the least recently used.
+    cache.get(M_c, X_L_list[0], 0, 0)
+    cache.get(M_c, X_L_list[2], 0, 0)
+    assert cache.evictions == 1
+    assert cache.num_bytes <= cache.max_bytes
+    hits = cache.hits
+    cache.get(M_c, X_L_list[0], 0, 0)
+    assert cache.hits == hits + 1
+    cache.get(M_c, X_L_list[1], 0, 0)
+    assert cache.hits == hits + 1
@@ -0,0 +1,132 @@
+#
+#   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+#
+#   Lead Developers: Dan Lovell and Jay Baxter
+#   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+#   Research Leads: Vikash Mansinghka, Patrick Shafto
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import copy
+
+import numpy
+
+import crosscat.tests.synthetic_data_generator as sdg
+import crosscat.utils.sample_utils as su
+from crosscat.LocalEngine import LocalEngine
+
+N_ROWS = 50
+
+
+def quick_le(seed, n_chains=1):
+    cctypes = ['continuous', 'multinomial', 'cyclic', 'multinomial']
+    distargs = [None, dict(K=5), None, dict(K=3)]
+    cols_to_views = [0, 0, 1, 1]
+    separation = [0.6, 0.9]
+    cluster_weights = [[.5, .5], [.9, .1]]
+    T, M_c, M_r = sdg.gen_data(cctypes, N_ROWS, cols_to_views,
+        cluster_weights, separation, seed=seed, distargs=distargs,
+        return_structure=True)
+    engine = LocalEngine()
+    X_L, X_D = engine.initialize(M_c, M_r, T, seed, n_chains=n_chains)
+    X_L, X_D = engine.analyze(M_c, T, X_L, X_D, seed, n_steps=3)
+    return T, M_r, M_c, X_L, X_D, engine
+
+
+def test_ensure_multistate_does_not_copy_states():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0, n_chains=2)
+    X_L_list, X_D_list, was_multistate = su.ensure_multistate(X_L, X_D)
+    assert was_multistate
+    assert all(a is b for a, b in zip(X_L_list, X_L))
+    assert all(a is b for a, b in zip(X_D_list, X_D))
+    # The lists are fresh, so callers may replace their elements.
+    assert X_L_list is not X_L and X_D_list is not X_D
+
+
+def test_engine_calls_do_not_mutate_states():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0, n_chains=2)
+    X_L_0, X_D_0 = copy.deepcopy(X_L), copy.deepcopy(X_D)
+    engine.analyze(M_c, T, X_L, X_D, 1, n_steps=2)
+    engine.predictive_probability_multistate(
+        M_c, X_L, X_D, [], [(N_ROWS, 1, 0)])
+    engine.mutual_information(M_c, X_L, X_D, [(0, 1)], 2, n_samples=10)
+    engine.insert(M_c, list(T), X_L, X_D, new_rows=[list(T[0])])
+    assert X_L == X_L_0
+    assert X_D == X_D_0
+
+
+def test_chain_queries_match_serial():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0, n_chains=3)
+    Y = [(N_ROWS, 0, T[0][0])]
+    Q = [(N_ROWS, 1, T[0][1]), (N_ROWS, 2, T[0][2])]
+    assert engine.predictive_probability_multistate(M_c, X_L, X_D, Y, Q) \
+        == su.predictive_probability_multistate(M_c, X_L, X_D, Y, Q)
+    assert engine.simple_predictive_probability_multistate(
+            M_c, X_L, X_D, Y, Q[:1]) \
+        == su.simple_predictive_probability_multistate(
+            M_c, X_L, X_D, Y, Q[:1])
+    for target_columns in [None, 1, [0, 3]]:
+        assert engine.similarity(M_c, X_L, X_D, 0, 1, target_columns) \
+            == su.similarity(M_c, X_L, X_D, 0, 1, target_columns)
+
+
+def test_chain_samples_and_mutual_information():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0, n_chains=3)
+    Q = [(N_ROWS, 0), (N_ROWS, 1)]
+    samples = engine.simple_predictive_sample(M_c, X_L, X_D, [], Q, 1, n=8)
+    assert len(samples) == 8
+    assert samples == engine.simple_predictive_sample(
+        M_c, X_L, X_D, [], Q, 1, n=8)
+    MI, Linfoot = engine.mutual_information(
+        M_c, X_L, X_D, [(0, 2), (1, 3)], 1, n_samples=10)
+    assert len(MI) == len(Linfoot) == 2
+    assert all(len(MI_q) == 3 for MI_q in MI)
+    assert (MI, Linfoot) == engine.mutual_information(
+        M_c, X_L, X_D, [(0, 2), (1, 3)], 1, n_samples=10)
+
+
+def test_structural_typicality_batch():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0, n_chains=3)
+    row_typicality = engine.row_structural_typicality_batch(X_L, X_D)
+    assert row_typicality.shape == (N_ROWS,)
+    num_cols = len(M_c['column_metadata'])
+    for row_id in [0, 7, N_ROWS - 1]:
+        # Count the cells in the same category, cell by cell.
+        count = 0
+        for X_L_i, X_D_i in zip(X_L, X_D):
+            for c in range(num_cols):
+                view = X_D_i[X_L_i['column_partition']['assignments'][c]]
+                count += sum(cluster == view[row_id] for cluster in view)
+        expected = float(count) / (len(X_L) * N_ROWS * num_cols)
+        assert row_typicality[row_id] == expected
+        assert engine.row_structural_typicality(X_L, X_D, row_id) == expected
+    column_typicality = engine.column_structural_typicality_batch(X_L)
+    for col_id in range(num_cols):
+        assert column_typicality[col_id] \
+            == engine.column_structural_typicality(X_L, col_id)
+
+
+def test_similarity_matrix():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0, n_chains=3)
+    given_row_ids = [0, 5, 9]
+    for target_columns in [None, 2, [0, 3]]:
+        similarities = engine.similarity_matrix(
+            M_c, X_L, X_D, given_row_ids, target_columns=target_columns)
+        assert similarities.shape == (len(given_row_ids), N_ROWS)
+        for i, given_row_id in enumerate(given_row_ids):
+            for target_row_id in [0, 1, 5, N_ROWS - 1]:
+                assert similarities[i, target_row_id] == su.similarity(
+                    M_c, X_L, X_D, given_row_id, target_row_id,
+                    target_columns)
+    assert numpy.all(engine.similarity_matrix(M_c, X_L, X_D, [0], [0]) == 1)
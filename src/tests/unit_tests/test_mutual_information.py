@@ -0,0 +1,111 @@
+#
+#   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+#
+#   Lead Developers: Dan Lovell and Jay Baxter
+#   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+#   Research Leads: Vikash Mansinghka, Patrick Shafto
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import numpy
+
+import crosscat.tests.synthetic_data_generator as sdg
+import crosscat.utils.inference_utils as iu
+from crosscat.LocalEngine import LocalEngine
+from crosscat.LocalEngine import make_get_next_seed
+
+N_ROWS = 100
+
+
+def quick_le(seed):
+    cctypes = ['continuous', 'cyclic', 'continuous', 'multinomial']
+    distargs = [None, None, None, dict(K=3)]
+    cols_to_views = [0, 0, 0, 1]
+    separation = [0.9, 0.9]
+    cluster_weights = [[.3, .3, .4], [.5, .5]]
+    T, M_c, M_r = sdg.gen_data(cctypes, N_ROWS, cols_to_views,
+        cluster_weights, separation, seed=seed, distargs=distargs,
+        return_structure=True)
+    engine = LocalEngine()
+    X_L, X_D = engine.initialize(M_c, M_r, T, seed)
+    X_L, X_D = engine.analyze(M_c, T, X_L, X_D, seed, n_steps=20)
+    return T, M_r, M_c, X_L, X_D, engine
+
+
+def test_pairs_share_draws_within_view():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    view_assignments = X_L['column_partition']['assignments']
+    assert view_assignments[0] == view_assignments[1] == view_assignments[2]
+    MI = iu.estimate_MI_samples([(0, 1), (0, 2)], M_c, X_L, X_D,
+        make_get_next_seed(1), n_samples=200)
+    # Columns 0 and 1 are drawn first either way, from the same stream.
+    MI_01 = iu.estimate_MI_sample(0, 1, M_c, X_L, X_D,
+        make_get_next_seed(1), n_samples=200)
+    assert MI[0] == MI_01
+    assert numpy.all(MI > 0)
+
+
+def test_independent_pairs():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    X_L['column_partition']['assignments'][3] = 1
+    MI = iu.estimate_MI_samples([(0, 3), (3, 1)], M_c, X_L, X_D,
+        make_get_next_seed(1), n_samples=200)
+    assert numpy.all(MI == 0)
+
+
+def test_mutual_information_mixed_pairs():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    Q = [(0, 1), (3, 3), (1, 2)]
+    MI, Linfoot = iu.mutual_information(M_c, [X_L, X_L], [X_D, X_D], Q,
+        make_get_next_seed(1), n_samples=200)
+    assert len(MI) == len(Linfoot) == len(Q)
+    assert all(len(MI_q) == 2 for MI_q in MI)
+    # The MI of a discrete column with itself is exact, and is its entropy.
+    assert MI[1][0] == MI[1][1] > 0
+    assert all(0 <= l < 1 for Linfoot_q in Linfoot for l in Linfoot_q)
+
+
+def test_dependence_probability_matrix():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    X_L_2 = {'column_partition': {'assignments': [0, 1, 1, 0]}}
+    Z = iu.dependence_probability_matrix([X_L, X_L_2])
+    assert Z.shape == (4, 4)
+    assert numpy.all(numpy.diag(Z) == 1)
+    assert numpy.all(Z == Z.T)
+    assignments = X_L['column_partition']['assignments']
+    for i in range(4):
+        for j in range(4):
+            expected = (assignments[i] == assignments[j]) \
+                + (X_L_2['column_partition']['assignments'][i]
+                    == X_L_2['column_partition']['assignments'][j])
+            assert Z[i, j] == expected / 2.
+    assert numpy.all(iu.dependence_probability_matrix([X_L], [3, 0])
+        == iu.dependence_probability_matrix([X_L])[[3, 0]][:, [3, 0]])
+
+
+def test_mutual_information_matrix():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    cols = [0, 1, 2, 3]
+    MI = engine.mutual_information_matrix(
+        M_c, [X_L, X_L], [X_D, X_D], cols, 1, n_samples=200)
+    assert MI.shape == (2, 4, 4)
+    assert numpy.all(numpy.isnan(MI[:, range(4), range(4)]))
+    off_diagonal = ~numpy.eye(4, dtype=bool)
+    assert numpy.all(MI[:, off_diagonal] >= 0)
+    assert numpy.all(MI[:, off_diagonal] == MI.transpose(0, 2, 1)[:, off_diagonal])
+    assignments = X_L['column_partition']['assignments']
+    for i in cols:
+        for j in cols:
+            if assignments[i] != assignments[j]:
+                assert numpy.all(MI[:, i, j] == 0)
@@ -229,3 +229,28 @@ def test_predictive_probability_unobserved(seed=0):
     Y = [(N_ROWS, 3, 4), (N_ROWS, 4, 1.3)]
     val = engine.predictive_probability(M_c, X_L, X_D, Y, Q)
     assert isinstance(val, float)
+
+def test_simple_predictive_probability_batch(seed=0):
+    # Each entry of the batch should agree with simple_predictive_probability
+    # of the same hypothetical cell.
+    T, M_r, M_c, X_L, X_D, engine = quick_le(seed)
+    query_columns = [0, 2, 3, 4]
+    Q = [[row[c] for c in query_columns] for row in T[:20]]
+    Q[3][0] = float('nan')
+    Y = [(0, 0, 1), (N_ROWS//2, 4, 5), (N_ROWS, 1, 0.5)]
+    vals = engine.simple_predictive_probability_batch(
+        M_c, X_L, X_D, Y, Q, query_columns=query_columns)
+    assert vals.shape == (20, len(query_columns))
+    for i, row in enumerate(Q):
+        for j, c in enumerate(query_columns):
+            val = engine.simple_predictive_probability(
+                M_c, X_L, X_D, Y, [(N_ROWS, c, row[j])])
+            assert abs(vals[i][j] - val[0]) < 1e-10
+
+    # By default, Q has a column for every column of the table.
+    vals = engine.simple_predictive_probability_batch(M_c, X_L, X_D, [], T[:5])
+    assert vals.shape == (5, len(M_c['column_metadata']))
+
+    with pytest.raises(ValueError):
+        engine.simple_predictive_probability_batch(
+            M_c, X_L, X_D, [], Q, query_columns=[0, 1])
@@ -0,0 +1,136 @@
+#
+#   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+#
+#   Lead Developers: Dan Lovell and Jay Baxter
+#   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+#   Research Leads: Vikash Mansinghka, Patrick Shafto
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import copy
+import math
+
+import numpy
+
+import crosscat.tests.synthetic_data_generator as sdg
+from crosscat.LocalEngine import LocalEngine
+
+N_ROWS = 200
+
+
+def quick_le(seed, n_chains=1):
+    cctypes = ['continuous', 'multinomial', 'cyclic', 'continuous']
+    distargs = [None, dict(K=5), None, None]
+    cols_to_views = [0, 0, 1, 1]
+    separation = [0.6, 0.9]
+    cluster_weights = [[.2, .3, .5], [.9, .1]]
+    T, M_c, M_r = sdg.gen_data(cctypes, N_ROWS, cols_to_views,
+        cluster_weights, separation, seed=seed, distargs=distargs,
+        return_structure=True)
+    engine = LocalEngine()
+    X_L, X_D = engine.initialize(M_c, M_r, T, seed, n_chains=n_chains)
+    X_L, X_D = engine.analyze(M_c, T, X_L, X_D, seed, n_steps=5)
+    return T, M_r, M_c, X_L, X_D, engine
+
+
+def test_batch_sample_reproducible():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    Q = [(N_ROWS, 0), (N_ROWS, 1), (N_ROWS, 2), (N_ROWS, 3)]
+    samples = engine.simple_predictive_sample_batch(
+        M_c, X_L, X_D, [], Q, 1, n=100)
+    assert samples.shape == (100, 4)
+    again = engine.simple_predictive_sample_batch(
+        M_c, X_L, X_D, [], Q, 1, n=100)
+    assert (samples == again).all()
+    assert set(samples[:, 1]) <= set(range(5))
+    assert ((0 <= samples[:, 2]) & (samples[:, 2] < 2 * math.pi)).all()
+
+
+def test_batch_sample_constraints():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    # A constrained cell of a hypothetical row comes back as given.
+    Q = [(N_ROWS, 0), (N_ROWS, 1)]
+    Y = [(N_ROWS, 1, 3), (0, 0, 1.5)]
+    samples = engine.simple_predictive_sample_batch(
+        M_c, X_L, X_D, Y, Q, 2, n=10)
+    assert (samples[:, 1] == 3).all()
+    # Observed rows and multiple states are handled too.
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0, n_chains=3)
+    samples = engine.simple_predictive_sample_batch(
+        M_c, X_L, X_D, [], [(5, 0), (5, 2)], 3, n=10)
+    assert samples.shape == (10, 2)
+
+
+def test_batch_sample_matches_predictive_probability():
+    # The frequencies of the categories of a multinomial column should
+    # match the predictive probabilities.
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    n = 20000
+    samples = engine.simple_predictive_sample_batch(
+        M_c, X_L, X_D, [], [(N_ROWS, 1)], 4, n=n)
+    for k in range(5):
+        logp = engine.simple_predictive_probability(
+            M_c, X_L, X_D, [], [(N_ROWS, 1, k)])
+        assert abs(numpy.mean(samples[:, 0] == k) - math.exp(logp[0])) < .02
+
+
+def test_impute_batch():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0, n_chains=3)
+    # Cells of observed and hypothetical rows, in no particular order.
+    Q = [(5, 0), (N_ROWS, 1), (5, 1), (N_ROWS, 3), (7, 3), (N_ROWS, 0)]
+    Y = [(N_ROWS, 0, 1.5)]
+    imputed, confidence = engine.impute_and_confidence_batch(
+        M_c, X_L, X_D, Y, Q, 1, 200)
+    assert imputed.shape == confidence.shape == (len(Q),)
+    assert (imputed == engine.impute_batch(M_c, X_L, X_D, Y, Q, 1, 200)).all()
+    # The constrained cell of the hypothetical row comes back as given.
+    assert imputed[5] == 1.5
+    assert imputed[1] in range(5) and imputed[2] in range(5)
+    assert ((0 < confidence) & (confidence <= 1)).all()
+    # The states agree on the clusters of these observed rows.
+    assert confidence[0] == confidence[4] == 1
+
+
+def test_impute_confidence_pools_states():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    view_idx = X_L['column_partition']['assignments'][0]
+    view_state_i = X_L['view_state'][view_idx]
+    local_col_idx = view_state_i['column_names'].index(M_c['idx_to_name']['0'])
+    cluster_idx = X_D[view_idx][5]
+    # A copy of the state with the cluster of row 5 shifted far away.
+    X_L_far = copy.deepcopy(X_L)
+    suffstats = X_L_far['view_state'][view_idx] \
+        ['column_component_suffstats'][local_col_idx][cluster_idx]
+    shift = 100.
+    suffstats['sum_x_squared'] += \
+        2 * shift * suffstats['sum_x'] + shift ** 2 * suffstats['N']
+    suffstats['sum_x'] += shift * suffstats['N']
+    imputed, confidence = engine.impute_and_confidence_batch(
+        M_c, [X_L, X_L_far], [X_D, X_D], [], [(5, 0)], 1, 200)
+    # Each state is sure of the cell, but they disagree: two equal modes.
+    assert abs(confidence[0] - .5) < .05
+    imputed, confidence = engine.impute_and_confidence_batch(
+        M_c, [X_L, X_L], [X_D, X_D], [], [(5, 0)], 1, 200)
+    assert confidence[0] == 1
+
+
+def test_impute_batch_matches_impute():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    n = 4000
+    for cell in [(N_ROWS, 0), (3, 3)]:
+        imputed = engine.impute_batch(M_c, X_L, X_D, [], [cell], 5, n)[0]
+        expected = engine.impute(M_c, X_L, X_D, [], [cell], 5, n)
+        std = numpy.std(engine.simple_predictive_sample_batch(
+            M_c, X_L, X_D, [], [cell], 5, n=n))
+        assert abs(imputed - expected) < .2 * std
@@ -0,0 +1,58 @@
+#
+#   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+#
+#   Lead Developers: Dan Lovell and Jay Baxter
+#   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+#   Research Leads: Vikash Mansinghka, Patrick Shafto
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import os
+import pickle
+
+import numpy
+
+from crosscat.LocalEngine import LocalEngine
+from crosscat.MultiprocessingEngine import MultiprocessingEngine
+from crosscat.utils import data_utils as du
+from crosscat.utils.shared_data import SharedTable
+
+
+def test_shared_table_pickles_by_name():
+    T, M_r, M_c = du.gen_factorial_data_objects(0, 2, 4, 20, 2)
+    with SharedTable.create(T) as table:
+        assert len(table) == 20
+        assert (table.attach() == numpy.array(T)).all()
+        pickled = pickle.dumps(table, protocol=2)
+        assert len(pickled) < 200
+        assert (pickle.loads(pickled).attach() == numpy.array(T)).all()
+    assert not os.path.exists(table.filename)
+
+
+def test_engines_on_shared_table():
+    T, M_r, M_c = du.gen_factorial_data_objects(0, 2, 4, 20, 2)
+    engine = LocalEngine()
+    X_L, X_D = engine.initialize(M_c, M_r, T, 0, n_chains=2)
+    X_L, X_D = engine.analyze(M_c, T, X_L, X_D, 1, n_steps=3)
+    with SharedTable.create(T) as table:
+        X_L_s, X_D_s = engine.initialize(M_c, M_r, table, 0, n_chains=2)
+        X_L_s, X_D_s = engine.analyze(M_c, table, X_L_s, X_D_s, 1, n_steps=3)
+        assert (X_L_s, X_D_s) == (X_L, X_D)
+    with MultiprocessingEngine(cpu_count=2) as mp_engine:
+        X_L_m, X_D_m = mp_engine.initialize(M_c, M_r, T, 0, n_chains=2)
+        X_L_m, X_D_m = mp_engine.analyze(M_c, T, X_L_m, X_D_m, 1, n_steps=3)
+        assert (X_L_m, X_D_m) == (X_L, X_D)
+        X_L_m, X_D_m, T_m = mp_engine.insert(
+            M_c, list(T), X_L_m, X_D_m, new_rows=[list(T[0])])
+        assert len(T_m) == 21
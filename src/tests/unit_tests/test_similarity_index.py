@@ -0,0 +1,93 @@
+#
+#   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+#
+#   Lead Developers: Dan Lovell and Jay Baxter
+#   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+#   Research Leads: Vikash Mansinghka, Patrick Shafto
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import pickle
+
+import numpy
+
+import crosscat.tests.synthetic_data_generator as sdg
+import crosscat.utils.sample_utils as su
+from crosscat.LocalEngine import LocalEngine
+from crosscat.utils.similarity_index import RowSimilarityIndex
+
+N_ROWS = 60
+
+
+def quick_le(seed, n_chains=3):
+    cctypes = ['continuous', 'multinomial', 'cyclic', 'continuous']
+    distargs = [None, dict(K=4), None, None]
+    cols_to_views = [0, 0, 1, 1]
+    separation = [0.8, 0.8]
+    cluster_weights = [[.3, .3, .4], [.5, .5]]
+    T, M_c, M_r = sdg.gen_data(cctypes, N_ROWS, cols_to_views,
+        cluster_weights, separation, seed=seed, distargs=distargs,
+        return_structure=True)
+    engine = LocalEngine()
+    X_L, X_D = engine.initialize(M_c, M_r, T, seed, n_chains=n_chains)
+    X_L, X_D = engine.analyze(M_c, T, X_L, X_D, seed, n_steps=5)
+    return T, M_r, M_c, X_L, X_D, engine
+
+
+def check_index(index, M_c, X_L, X_D, target_columns=None):
+    num_rows = len(X_D[0][0])
+    for row_id in [0, 11, num_rows - 1]:
+        expected = su.similarity_matrix(
+            M_c, X_L, X_D, [row_id], target_column=target_columns)[0]
+        row_ids, similarities = index.similarities(row_id, target_columns)
+        dense = numpy.zeros(num_rows)
+        dense[row_ids] = similarities
+        assert numpy.all(dense == expected)
+        assert numpy.all(similarities > 0)
+        top = index.top_k_similar(row_id, 5, target_columns)
+        assert len(top) == 5
+        assert row_id not in [r for r, _ in top]
+        expected[row_id] = -1
+        order = numpy.argsort(-expected, kind='mergesort')[:5]
+        assert top == [(r, expected[r]) for r in order]
+
+
+def test_top_k_similar():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    index = engine.get_row_similarity_index(M_c, X_L, X_D)
+    for target_columns in [None, 1, [0, 2]]:
+        check_index(index, M_c, X_L, X_D, target_columns)
+
+
+def test_update_after_insert():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    index = engine.get_row_similarity_index(M_c, X_L, X_D)
+    new_rows = [list(T[0]), list(T[1]), list(T[2])]
+    X_L, X_D, T = engine.insert(M_c, T, X_L, X_D, new_rows=new_rows)
+    index.update(X_L, X_D)
+    assert index.num_rows == N_ROWS + 3
+    check_index(index, M_c, X_L, X_D)
+    # Analyze moves rows between clusters, and views between columns.
+    X_L, X_D = engine.analyze(M_c, T, X_L, X_D, 1, n_steps=2)
+    index.update(X_L, X_D)
+    check_index(index, M_c, X_L, X_D)
+
+
+def test_serialize():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    index = engine.get_row_similarity_index(M_c, X_L, X_D)
+    restored = RowSimilarityIndex.from_dict(M_c, index.to_dict())
+    check_index(restored, M_c, X_L, X_D)
+    unpickled = pickle.loads(pickle.dumps(index))
+    assert unpickled.top_k_similar(3, 10) == index.top_k_similar(3, 10)
@@ -0,0 +1,139 @@
+#
+#   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+#
+#   Lead Developers: Dan Lovell and Jay Baxter
+#   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+#   Research Leads: Vikash Mansinghka, Patrick Shafto
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import copy
+import math
+
+from crosscat.LocalEngine import LocalEngine
+from crosscat.MultiprocessingEngine import MultiprocessingEngine
+from crosscat.StateHandle import StateHandle
+from crosscat.utils import data_utils as du
+from crosscat.utils import general_utils as gu
+
+N_ROWS = 20
+N_COLS = 4
+
+
+def quick_le(seed, n_chains=1):
+    T, M_r, M_c = du.gen_factorial_data_objects(seed, 2, N_COLS, N_ROWS, 2)
+    engine = LocalEngine(seed=seed)
+    X_L, X_D = engine.initialize(M_c, M_r, T, seed, n_chains=n_chains)
+    return T, M_r, M_c, X_L, X_D, engine
+
+
+def test_analyze_does_not_touch_inputs():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    X_L_0, X_D_0 = copy.deepcopy(X_L), copy.deepcopy(X_D)
+    handle = engine.get_state_handle(M_c, T, X_L, X_D, 1)
+    handle.analyze(n_steps=3)
+    handle.analyze(n_steps=3)
+    assert X_L == X_L_0
+    assert X_D == X_D_0
+    X_L_prime, X_D_prime = handle.get_latent_states()
+    assert len(X_D_prime[0]) == N_ROWS
+    assert len(X_L_prime['column_partition']['assignments']) == N_COLS
+
+
+def test_same_seed_same_states():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0, n_chains=2)
+    states = []
+    for _ in range(2):
+        handle = engine.get_state_handle(M_c, T, X_L, X_D, 3)
+        handle.analyze(n_steps=2)
+        handle.analyze(n_steps=2)
+        states.append(handle.get_latent_states())
+    assert states[0] == states[1]
+
+
+def test_insert_then_query():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0, n_chains=2)
+    handle = engine.get_state_handle(M_c, T, X_L, X_D, 4)
+    new_rows = [list(T[0]), list(T[1])]
+    handle.insert(new_rows)
+    # Transitions after an insert must see the new rows.
+    handle.analyze(n_steps=2)
+    X_L_list, X_D_list = handle.get_latent_states()
+    for X_D_i in X_D_list:
+        assert all(len(X_D_i_v) == N_ROWS + 2 for X_D_i_v in X_D_i)
+
+    Q = [(N_ROWS + 2, 0, T[0][0]), (N_ROWS + 2, 1, T[0][1])]
+    logp = handle.predictive_probability([], Q)
+    assert not math.isnan(logp)
+    samples = handle.simple_predictive_sample([], [(N_ROWS + 2, 0)], n=3)
+    assert len(samples) == 3
+
+
+def test_prior_initialization():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    handle = engine.get_state_handle(M_c, T, None, None, 5, n_chains=3)
+    assert handle.n_chains == 3
+    handle.analyze(n_steps=1)
+    X_L_list, X_D_list = handle.get_latent_states()
+    assert len(X_L_list) == len(X_D_list) == 3
+
+
+def test_pooled_matches_in_process_chains():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0, n_chains=3)
+    with MultiprocessingEngine(cpu_count=2) as mp_engine:
+        with mp_engine.get_state_handle(M_c, T, X_L, X_D, 6) as pooled:
+            assert pooled.n_chains == 3
+            score_deltas = pooled.analyze(n_steps=2)
+            pooled.insert([list(T[0])])
+            pooled.analyze(n_steps=2)
+            X_L_list, X_D_list = pooled.get_latent_states()
+            Q = [(N_ROWS + 1, 0, T[0][0])]
+            logp = pooled.predictive_probability([], Q)
+            samples = pooled.simple_predictive_sample([], [(N_ROWS + 1, 0)], 4)
+    # Each chain is a single-chain StateHandle seeded from the handle's seed.
+    get_next_seed = gu.make_get_next_seed(6)
+    handles = [
+        StateHandle(M_c, T, X_L_i, X_D_i, seed=get_next_seed())
+        for X_L_i, X_D_i in zip(X_L, X_D)
+    ]
+    assert score_deltas == [h.analyze(n_steps=2)[0] for h in handles]
+    for h in handles:
+        h.insert([list(T[0])])
+        h.analyze(n_steps=2)
+    assert [h.get_latent_states() for h in handles] == \
+        list(zip(X_L_list, X_D_list))
+    assert len(X_D_list[0][0]) == N_ROWS + 1
+    assert not math.isnan(logp)
+    assert len(samples) == 4
+
+
+def test_pooled_single_chain_and_errors():
+    T, M_r, M_c, X_L, X_D, engine = quick_le(0)
+    with MultiprocessingEngine(cpu_count=2) as mp_engine:
+        pooled = mp_engine.get_state_handle(M_c, T, X_L, X_D, 7)
+        try:
+            pooled.analyze(n_steps=1)
+            X_L_prime, X_D_prime = pooled.get_latent_states()
+            assert len(X_D_prime[0]) == N_ROWS
+            # Errors in the workers are raised in the caller, and the
+            # workers keep serving.
+            try:
+                pooled.predictive_probability([], [(0, N_COLS + 5, 0.)])
+            except Exception:
+                pass
+            else:
+                assert False, 'expected an error'
+            pooled.analyze(n_steps=1)
+        finally:
+            pooled.close()
@@ -98,6 +98,10 @@ def int_generator(prngstate=None):
         with lock:
             yield prngstate.randint(0, 2147483646)
 
+def make_get_next_seed(seed):
+    generator = int_generator(seed)
+    return lambda: generator.next()
+
 def roundrobin(*iterables):
     "roundrobin('ABC', 'D', 'EF') --> A D E B F C"
     # Recipe credited to George Sakkis
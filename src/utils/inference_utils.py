@@ -20,7 +20,6 @@
 import numpy
 import math
 
-from crosscat.utils.general_utils import logsumexp
 import crosscat.utils.sample_utils as su
 
 def column_is_bounded_discrete(M_c, col_index):
@@ -55,31 +54,32 @@ def mutual_information(M_c, X_Ls, X_Ds, Q, get_next_seed, n_samples=1000):
         assert query[0] >= 0 and query[0] < n_cols
         assert query[1] >= 0 and query[1] < n_cols
 
-        X = query[0]
-        Y = query[1]
+        MI.append([0.0]*n_postertior_samples)
+        Linfoot.append([0.0]*n_postertior_samples)
 
-        MI_sample = []
-        Linfoot_sample = []
+    # pairs of bounded discrete columns have exact MI; the rest are
+    # estimated together, sharing draws within each view
+    is_exact = [column_is_bounded_discrete(M_c, X) and column_is_bounded_discrete(M_c, Y)
+        for X, Y in Q]
+    Q_estimated = [query for query, exact in zip(Q, is_exact) if not exact]
 
-        for sample in range(n_postertior_samples):
+    for sample in range(n_postertior_samples):
 
-            X_L = X_Ls[sample]
-            X_D = X_Ds[sample]
+        X_L = X_Ls[sample]
+        X_D = X_Ds[sample]
 
-            # get column data types
-            if column_is_bounded_discrete(M_c, X) and column_is_bounded_discrete(M_c, Y):
+        if Q_estimated:
+            MI_estimated = iter(estimate_MI_samples(Q_estimated, M_c, X_L, X_D,
+                get_next_seed, n_samples=n_samples))
+
+        for q, (X, Y) in enumerate(Q):
+            if is_exact[q]:
                 MI_s = calculate_MI_bounded_discrete(X, Y, M_c, X_L, X_D)
             else:
-                MI_s = estimate_MI_sample(X, Y, M_c, X_L, X_D, get_next_seed, n_samples=n_samples)
-
-            linfoot = mutual_information_to_linfoot(MI_s)
-
-            MI_sample.append(MI_s)
+                MI_s = float(next(MI_estimated))
 
-            Linfoot_sample.append(linfoot)
-
-        MI.append(MI_sample)
-        Linfoot.append(Linfoot_sample)
+            MI[q][sample] = MI_s
+            Linfoot[q][sample] = mutual_information_to_linfoot(MI_s)
 
 
     assert len(MI) == len(Q)
@@ -97,145 +97,206 @@ def calculate_MI_bounded_discrete(X, Y, M_c, X_L, _X_D):
     if view_X != view_Y:
         return 0.0
 
+    return float(calculate_MI_bounded_discrete_view([(X, Y)], M_c, X_L, view_X)[0])
+
+# calculates the mutual information of each pair of bounded discrete columns
+# in Q, all of which are in view view_idx. Returns an array with the MI of
+# each pair. The predictive logps of each column's values are calculated
+# once, and shared by all pairs.
+def calculate_MI_bounded_discrete_view(Q, M_c, X_L, view_idx):
     # get cluster logps
-    view_state = X_L['view_state'][view_X]
+    view_state = X_L['view_state'][view_idx]
     cluster_logps = numpy.array(su.determine_cluster_crp_logps(view_state))
     n_clusters = len(cluster_logps)
 
-    # get X values
-    x_values = M_c['column_metadata'][X]['code_to_value'].values()
-    # get Y values
-    y_values = M_c['column_metadata'][Y]['code_to_value'].values()
-
-    # get components models for each cluster for columns X and Y
-    component_models_X = [0]*n_clusters
-    component_models_Y = [0]*n_clusters
-    for i in range(n_clusters):
-        cluster_models = su.create_cluster_model_from_X_L(M_c, X_L, view_X, i)
-        component_models_X[i] = cluster_models[X]
-        component_models_Y[i] = cluster_models[Y]
-
-    def marginal_predictive_logps_by_cluster(value, component_models):
-        return numpy.array([
-            component_models[j].calc_element_predictive_logp(value)
-            + cluster_logps[j]
-            for j in range(n_clusters)])
-
-    x_marginal_predictive_logps_by_cluster = \
-        [marginal_predictive_logps_by_cluster(x, component_models_X)
-         for x in x_values]
-
-    # \sum_c P(x|c)P(c)
-    x_net_marginal_predictive_logps = \
-        [logsumexp(ps) for ps in x_marginal_predictive_logps_by_cluster]
-
-    y_marginal_predictive_logps_by_cluster = \
-        [marginal_predictive_logps_by_cluster(y, component_models_Y)
-         for y in y_values]
-
-    # \sum_c P(y|c)P(c)
-    y_net_marginal_predictive_logps = \
-        [logsumexp(ps) for ps in y_marginal_predictive_logps_by_cluster]
-
-    MI = 0.0
-
-    for (i,x) in enumerate(x_values):
-        x_marginals = x_marginal_predictive_logps_by_cluster[i]
-        for (j,y) in enumerate(y_values):
-            y_marginals = y_marginal_predictive_logps_by_cluster[j]
-            # cluster prob is double-counted in sum of marginals
-            joint_predictive_logp_by_cluster = \
-                x_marginals + y_marginals - cluster_logps
-
-            # \sum_c P(x|c)P(y|c)P(c), Joint distribution
-            joint_predictive_logp = logsumexp(joint_predictive_logp_by_cluster)
-
-            MI += math.exp(joint_predictive_logp) * \
-                  (joint_predictive_logp - \
-                   (x_net_marginal_predictive_logps[i] + \
-                    y_net_marginal_predictive_logps[j]))
-
-    # ignore MI < 0
-    if MI <= 0.0:
-        MI = 0.0
+    cluster_models = [su.create_cluster_model_from_X_L(M_c, X_L, view_idx, j)
+        for j in range(n_clusters)]
+
+    # P(v|c)P(c) for each value v of each column: (n_values, n_clusters)
+    marginal_predictive_logps_by_cluster = {}
+    for column in set(column for query in Q for column in query):
+        values = numpy.array(
+            list(M_c['column_metadata'][column]['code_to_value'].values()),
+            dtype=float)
+        marginal_predictive_logps_by_cluster[column] = numpy.column_stack([
+            cluster_models[j][column].calc_element_predictive_logps_constrained(
+                values, [])
+            for j in range(n_clusters)]) + cluster_logps
+
+    MI = numpy.zeros(len(Q))
+
+    for q, (X, Y) in enumerate(Q):
+        x_marginals = marginal_predictive_logps_by_cluster[X]
+        y_marginals = marginal_predictive_logps_by_cluster[Y]
+
+        # \sum_c P(x|c)P(c) and \sum_c P(y|c)P(c)
+        x_net_marginal_predictive_logps = _logsumexp_rows(x_marginals)
+        y_net_marginal_predictive_logps = _logsumexp_rows(y_marginals)
+
+        # cluster prob is double-counted in sum of marginals
+        joint_predictive_logp_by_cluster = x_marginals[:, numpy.newaxis] \
+            + y_marginals[numpy.newaxis] - cluster_logps
+
+        # \sum_c P(x|c)P(y|c)P(c), Joint distribution: (n_x_values, n_y_values)
+        joint_predictive_logp = _logsumexp_rows(
+            joint_predictive_logp_by_cluster.reshape(-1, n_clusters)).reshape(
+                len(x_marginals), len(y_marginals))
+
+        MI_q = numpy.sum(numpy.exp(joint_predictive_logp) *
+            (joint_predictive_logp -
+                (x_net_marginal_predictive_logps[:, numpy.newaxis] +
+                 y_net_marginal_predictive_logps[numpy.newaxis])))
+
+        # ignore MI < 0
+        if MI_q > 0.0:
+            MI[q] = MI_q
 
     return MI
 
+# returns the probability that each pair of columns in cols (default: all
+# columns) is dependent, i.e. assigned to the same view, over the samples in
+# X_Ls, as an array of shape (len(cols), len(cols)).
+def dependence_probability_matrix(X_Ls, cols=None):
+    assignments = numpy.array(
+        [X_L['column_partition']['assignments'] for X_L in X_Ls])
+    if cols is not None:
+        assignments = assignments[:, cols]
+    n_cols = assignments.shape[1]
+
+    Z = numpy.zeros((n_cols, n_cols))
+    for assignments_i in assignments:
+        Z += assignments_i[:, numpy.newaxis] == assignments_i[numpy.newaxis]
+
+    return Z / len(X_Ls)
+
+# returns the mutual information of each pair of columns in cols given each
+# sample in X_Ls and X_Ds, as an array of shape (len(X_Ls), len(cols),
+# len(cols)). Pairs in different views are independent, with MI 0, and are
+# skipped. The pairs of a view share its component models, and estimated
+# pairs share its draws. The diagonal is not calculated, and is NaN.
+def mutual_information_matrix(M_c, X_Ls, X_Ds, cols, get_next_seed, n_samples=1000):
+    assert len(X_Ds) == len(X_Ls)
+    cols = list(cols)
+    n_cols = len(cols)
+    is_bounded_discrete = numpy.array(
+        [column_is_bounded_discrete(M_c, col) for col in cols])
+
+    MI = numpy.zeros((len(X_Ls), n_cols, n_cols))
+
+    for sample, (X_L, X_D) in enumerate(zip(X_Ls, X_Ds)):
+        assignments = numpy.array(X_L['column_partition']['assignments'])[cols]
+
+        # the pairs (i, j), i < j, of columns in the same view
+        I, J = numpy.nonzero(numpy.triu(
+            assignments[:, numpy.newaxis] == assignments[numpy.newaxis], 1))
+        is_exact = is_bounded_discrete[I] & is_bounded_discrete[J]
+
+        MI_sample = numpy.zeros(len(I))
+
+        # exact pairs, by view
+        exact = numpy.flatnonzero(is_exact)
+        for view_idx in numpy.unique(assignments[I[exact]]):
+            which = exact[assignments[I[exact]] == view_idx]
+            Q = [(cols[i], cols[j]) for i, j in zip(I[which], J[which])]
+            MI_sample[which] = calculate_MI_bounded_discrete_view(
+                Q, M_c, X_L, view_idx)
+
+        # estimated pairs, sharing draws within each view
+        estimated = numpy.flatnonzero(~is_exact)
+        if len(estimated):
+            Q = [(cols[i], cols[j]) for i, j in zip(I[estimated], J[estimated])]
+            MI_sample[estimated] = estimate_MI_samples(
+                Q, M_c, X_L, X_D, get_next_seed, n_samples=n_samples)
+
+        MI[sample, I, J] = MI_sample
+        MI[sample, J, I] = MI_sample
+        numpy.fill_diagonal(MI[sample], numpy.nan)
 
+    return MI
 
 # estimates the mutual information for columns X and Y.
-def estimate_MI_sample(X, Y, M_c, X_L, _X_D, get_next_seed, n_samples=1000):
+def estimate_MI_sample(X, Y, M_c, X_L, X_D, get_next_seed, n_samples=1000):
+    return estimate_MI_samples([(X, Y)], M_c, X_L, X_D, get_next_seed,
+        n_samples=n_samples)[0]
+
+# estimates the mutual information for each pair of columns in Q, returning
+# an array with the MI of each pair. The n_samples draws of a view are made
+# at once, and shared by all pairs in that view; the predictive logps of the
+# draws are evaluated in each cluster in one call per column.
+def estimate_MI_samples(Q, M_c, X_L, _X_D, get_next_seed, n_samples=1000):
     random_state = numpy.random.RandomState(get_next_seed())
 
     get_view_index = lambda which_column: X_L['column_partition']['assignments'][which_column]
 
-    view_X = get_view_index(X)
-    view_Y = get_view_index(Y)
+    MI = numpy.zeros(len(Q))
+
+    # the columns of the dependent pairs, by view
+    view_columns = {}
+    for X, Y in Q:
+        view_X = get_view_index(X)
+        # independent
+        if view_X != get_view_index(Y):
+            continue
+        columns = view_columns.setdefault(view_X, [])
+        columns.extend(c for c in (X, Y) if c not in columns)
+
+    for view_idx in sorted(view_columns):
+        # get cluster logps
+        view_state = X_L['view_state'][view_idx]
+        cluster_logps = su.determine_cluster_crp_logps(view_state)
+        cluster_crps = numpy.exp(cluster_logps)
+        n_clusters = len(cluster_crps)
+
+        # draw a cluster for each sample
+        cluster_idxs = random_state.choice(
+            n_clusters, size=n_samples, p=cluster_crps/cluster_crps.sum())
+
+        # logp of each column's draws in each cluster: (n_samples, n_clusters)
+        column_logps = {}
+        cluster_models = [su.create_cluster_model_from_X_L(M_c, X_L, view_idx, j)
+            for j in range(n_clusters)]
+        for column in view_columns[view_idx]:
+            column_suffstats = su.get_view_column_suffstats(
+                M_c, X_L, view_idx, column)
+            draws = numpy.zeros(n_samples)
+            for j in numpy.unique(cluster_idxs):
+                which_samples = numpy.flatnonzero(cluster_idxs == j)
+                if j < len(column_suffstats):
+                    suffstats = column_suffstats[j]
+                else:
+                    # the empty cluster
+                    suffstats = {b'N': 0}
+                draws[which_samples] = su.draw_predictive_batch(
+                    M_c['column_metadata'][column]['modeltype'],
+                    X_L['column_hypers'][column], suffstats, [],
+                    len(which_samples), random_state)
+            column_logps[column] = numpy.column_stack([
+                cluster_models[j][column].calc_element_predictive_logps_constrained(
+                    draws, [])
+                for j in range(n_clusters)])
+
+        for q, (X, Y) in enumerate(Q):
+            if get_view_index(X) != view_idx or get_view_index(Y) != view_idx:
+                continue
+            Px = column_logps[X] + cluster_logps    # P(x|c)P(c)
+            Py = column_logps[Y] + cluster_logps    # P(y|c)P(c)
+            Pxy = Px + column_logps[Y]              # P(x|c)P(y|c)P(c)
+
+            # sum over clusters
+            Px = _logsumexp_rows(Px)
+            Py = _logsumexp_rows(Py)
+            Pxy = _logsumexp_rows(Pxy)
+
+            # do weighted average with underflow protection
+            weights = numpy.exp(Pxy - _logsumexp_rows(Pxy[numpy.newaxis]))
+            MI_q = numpy.sum((Pxy - (Px + Py))*weights)
+
+            # ignore MI < 0
+            if MI_q > 0.0:
+                MI[q] = MI_q
 
-    # independent
-    if view_X != view_Y:
-        return 0.0
+    return MI
 
-    # get cluster logps
-    view_state = X_L['view_state'][view_X]
-    cluster_logps = su.determine_cluster_crp_logps(view_state)
-    cluster_crps = numpy.exp(cluster_logps) # get exp'ed values for multinomial
-    n_clusters = len(cluster_crps)
-
-    # get components models for each cluster for columns X and Y
-    component_models_X = [0]*n_clusters
-    component_models_Y = [0]*n_clusters
-    for i in range(n_clusters):
-        cluster_models = su.create_cluster_model_from_X_L(M_c, X_L, view_X, i)
-        component_models_X[i] = cluster_models[X]
-        component_models_Y[i] = cluster_models[Y]
-
-    # MI = 0.0    # mutual information
-    MI = numpy.zeros(n_samples)
-    weights = numpy.zeros(n_samples)
-
-    for i in range(n_samples):
-        # draw a cluster
-        cluster_idx = numpy.nonzero(random_state.multinomial(1, cluster_crps))[0][0]
-
-        # get a sample from each cluster
-        x = component_models_X[cluster_idx].get_draw(get_next_seed())
-        y = component_models_Y[cluster_idx].get_draw(get_next_seed())
-
-        # calculate marginal logs
-        Pxy = numpy.zeros(n_clusters)   # P(x,y), Joint distribution
-        Px = numpy.zeros(n_clusters)    # P(x)
-        Py = numpy.zeros(n_clusters)    # P(y)
-
-        # get logp of x and y in each cluster. add cluster logp's
-        for j in range(n_clusters):
-
-            Px[j] = component_models_X[j].calc_element_predictive_logp(x)
-            Py[j] = component_models_Y[j].calc_element_predictive_logp(y)
-            Pxy[j] = Px[j] + Py[j] + cluster_logps[j]   # \sum_c P(x|c)P(y|c)P(c), Joint distribution
-            Px[j] += cluster_logps[j]                   # \sum_c P(x|c)P(c)
-            Py[j] += cluster_logps[j]                   # \sum_c P(y|c)P(c)
-
-        # pdb.set_trace()
-
-        # sum over clusters
-        Px = logsumexp(Px)
-        Py = logsumexp(Py)
-        Pxy = logsumexp(Pxy)
-
-        # add to MI
-        # MI += Pxy - (Px + Py)
-        MI[i] = Pxy - (Px + Py)
-        weights[i] = Pxy
-
-    # do weighted average with underflow protection
-    # MI /= float(n_samples)
-    Z = logsumexp(weights)
-    weights = numpy.exp(weights-Z)
-    MI_ret = numpy.sum(MI*weights)
-
-    # ignore MI < 0
-    if MI_ret <= 0.0:
-        MI_ret = 0.0
-
-    return MI_ret
+def _logsumexp_rows(array):
+    m = array.max(axis=1)
+    return m + numpy.log(numpy.exp(array - m[:, numpy.newaxis]).sum(axis=1))
@@ -18,6 +18,7 @@
 #   limitations under the License.
 
 
+import collections
 import copy
 import itertools
 import numpy
@@ -209,32 +210,106 @@ def simple_predictive_probability_unobserved(
     return answer
 
 
+def simple_predictive_probability_batch(
+        M_c, X_L, X_D, Y, Q, query_columns=None):
+    """Score many hypothetical rows at once.
+
+    Row i of Q holds the values of query_columns (by default, all columns)
+    for a new hypothetical row.  Entry [i, j] of the result is what
+    simple_predictive_probability returns for the query
+    (num_rows, query_columns[j], Q[i][j]).  Y may constrain the hypothetical
+    row, as row num_rows, and then constrains every row of Q.
+
+    Each column of Q is scored against each cluster of its view in a single
+    call into the component model, so the cost in Python objects does not
+    grow with the number of rows of Q.
+    """
+    num_rows = len(X_D[0])
+    num_cols = len(M_c['column_metadata'])
+    if query_columns is None:
+        query_columns = range(num_cols)
+    query_columns = list(query_columns)
+    Q = numpy.array(Q, dtype=float, ndmin=2)
+    if Q.shape[1] != len(query_columns):
+        raise ValueError('Q must have one column per query column.')
+    if not all(0 <= column < num_cols for column in query_columns):
+        raise ValueError('Cannot specify hypothetical query column.')
+    query_row = num_rows
+
+    answer = numpy.zeros(Q.shape)
+    view_cluster_logps = dict()
+    for j, query_column in enumerate(query_columns):
+        view_idx = X_L['column_partition']['assignments'][query_column]
+        # The cluster weights depend on the view and Y, not on the query.
+        if view_idx not in view_cluster_logps:
+            view_cluster_logps[view_idx] = determine_cluster_logps(
+                M_c, X_L, X_D, Y, query_row, view_idx)
+        cluster_logps = view_cluster_logps[view_idx]
+        draw_constraints = get_draw_constraints(
+            X_L, X_D, Y, query_row, query_column)
+        answers_j = numpy.zeros((len(cluster_logps), Q.shape[0]))
+        for cluster_idx in range(len(cluster_logps)):
+            cluster_model = create_cluster_model_from_X_L(
+                M_c, X_L, view_idx, cluster_idx)
+            component_model = cluster_model[query_column]
+            answers_j[cluster_idx] = \
+                component_model.calc_element_predictive_logps_constrained(
+                    Q[:, j], draw_constraints)
+            answers_j[cluster_idx] += cluster_logps[cluster_idx]
+        # logsumexp over the clusters, for all rows of Q at once
+        m = answers_j.max(axis=0)
+        answer[:, j] = m + numpy.log(numpy.exp(answers_j - m).sum(axis=0))
+
+    return answer
+
+
 def row_structural_typicality(X_L_list, X_D_list, row_id):
     """Returns how typical the row is (opposite of how anomalous)."""
-    count = 0
+    return row_structural_typicality_batch(X_L_list, X_D_list, [row_id])[0]
+
+
+def row_structural_typicality_batch(X_L_list, X_D_list, row_ids=None):
+    """Returns how typical each row in row_ids is, as row_structural_typicality
+    does, as an array.  Defaults to all rows.
+
+    The typicality of a row is the mean, over states and columns, of the
+    fraction of rows in its cluster of the column's view, so it is computed
+    for all rows at once from the cluster sizes of each view.
+    """
     assert len(X_L_list) == len(X_D_list)
+    num_rows = len(X_D_list[0][0])
+    num_cols = len(X_L_list[0]['column_partition']['assignments'])
+    if row_ids is None:
+        row_ids = numpy.arange(num_rows)
+    counts = numpy.zeros(len(row_ids), dtype=int)
     for X_L, X_D in zip(X_L_list, X_D_list):
-        for r in range(len(X_D[0])):
-            for c in range(
-                    len(X_L['column_partition']['assignments'])):
-                if X_D[X_L['column_partition']['assignments'][c]][r] == \
-                        X_D[X_L['column_partition']['assignments'][c]][row_id]:
-                    count += 1
-    return float(count) / \
-        (len(X_D_list) * len(X_D[0]) *
-            len(X_L_list[0]['column_partition']['assignments']))
+        X_D = numpy.asarray(X_D, dtype=int)
+        view_num_cols = numpy.bincount(
+            X_L['column_partition']['assignments'], minlength=len(X_D))
+        for view_idx, X_D_v in enumerate(X_D):
+            cluster_sizes = numpy.bincount(X_D_v)
+            counts += view_num_cols[view_idx] * cluster_sizes[X_D_v[row_ids]]
+    return counts / float(len(X_D_list) * num_rows * num_cols)
 
 
 def column_structural_typicality(X_L_list, col_id):
     """Returns how typical column is (opposite of how anomalous)."""
-    count = 0
+    return column_structural_typicality_batch(X_L_list, [col_id])[0]
+
+
+def column_structural_typicality_batch(X_L_list, col_ids=None):
+    """Returns how typical each column in col_ids is, as
+    column_structural_typicality does, as an array.  Defaults to all
+    columns."""
+    num_cols = len(X_L_list[0]['column_partition']['assignments'])
+    if col_ids is None:
+        col_ids = numpy.arange(num_cols)
+    counts = numpy.zeros(len(col_ids), dtype=int)
     for X_L in X_L_list:
-        for c in range(len(X_L['column_partition']['assignments'])):
-            if X_L['column_partition']['assignments'][col_id] ==\
-                    X_L['column_partition']['assignments'][c]:
-                count += 1
-    return float(count) / \
-        (len(X_L_list) * len(X_L_list[0]['column_partition']['assignments']))
+        assignments = numpy.asarray(X_L['column_partition']['assignments'])
+        view_num_cols = numpy.bincount(assignments)
+        counts += view_num_cols[assignments[col_ids]]
+    return counts / float(len(X_L_list) * num_cols)
 
 
 def simple_predictive_probability_multistate(M_c, X_L_list, X_D_list, Y, Q):
@@ -262,9 +337,20 @@ def similarity(
     Similarity is defined as the proportion of times that two cells are in the same
     view and category.
     """
+    col_idxs = get_similarity_columns(M_c, target_column)
+
+    ## Iterate over all latent states.
     score = 0.0
+    for X_L, X_D in zip(X_L_list, X_D_list):
+        score += count_similar_columns(
+            X_L, X_D, given_row_id, target_row_id, col_idxs)
+
+    return score / (len(X_L_list)*len(col_idxs))
 
-    # Set col_idxs: defaults to all columns.
+
+def get_similarity_columns(M_c, target_column=None):
+    """Returns the column indexes similarity averages over: defaults to all
+    columns."""
     if target_column:
         if type(target_column) == str:
             col_idxs = [M_c['name_to_idx'][target_column]]
@@ -274,16 +360,50 @@ def similarity(
             col_idxs = [target_column]
     else:
         col_idxs = M_c['idx_to_name'].keys()
-    col_idxs = [int(col_idx) for col_idx in col_idxs]
+    return [int(col_idx) for col_idx in col_idxs]
 
-    ## Iterate over all latent states.
+
+def count_similar_columns(X_L, X_D, given_row_id, target_row_id, col_idxs):
+    """Returns the number of columns in col_idxs in which the two rows are in
+    the same category, in one latent state."""
+    count = 0
+    for col_idx in col_idxs:
+        view_idx = X_L['column_partition']['assignments'][col_idx]
+        if X_D[view_idx][given_row_id] == X_D[view_idx][target_row_id]:
+            count += 1
+    return count
+
+
+def similarity_matrix(
+        M_c, X_L_list, X_D_list, given_row_ids, target_row_ids=None,
+        target_column=None):
+    """Returns the similarity of each given row to each target row, as
+    similarity does, as an array of shape (len(given_row_ids),
+    len(target_row_ids)).  target_row_ids defaults to all rows.
+
+    The same-category counts are accumulated a view at a time, weighted by
+    the number of the columns in the view, rather than a column at a time.
+    """
+    col_idxs = get_similarity_columns(M_c, target_column)
+    if target_row_ids is None:
+        target_row_ids = numpy.arange(len(X_D_list[0][0]))
+    given_row_ids = numpy.asarray(given_row_ids, dtype=int)
+    target_row_ids = numpy.asarray(target_row_ids, dtype=int)
+
+    counts = numpy.zeros((len(given_row_ids), len(target_row_ids)), dtype=int)
     for X_L, X_D in zip(X_L_list, X_D_list):
-        for col_idx in col_idxs:
-            view_idx = X_L['column_partition']['assignments'][col_idx]
-            if X_D[view_idx][given_row_id] == X_D[view_idx][target_row_id]:
-                score += 1.0
+        X_D = numpy.asarray(X_D, dtype=int)
+        assignments = numpy.asarray(X_L['column_partition']['assignments'])
+        view_num_cols = numpy.bincount(
+            assignments[col_idxs], minlength=len(X_D))
+        for view_idx in numpy.flatnonzero(view_num_cols):
+            given_clusters = X_D[view_idx, given_row_ids]
+            target_clusters = X_D[view_idx, target_row_ids]
+            counts += view_num_cols[view_idx] * (
+                given_clusters[:, numpy.newaxis]
+                == target_clusters[numpy.newaxis, :])
 
-    return score / (len(X_L_list)*len(col_idxs))
+    return counts / float(len(X_L_list) * len(col_idxs))
 
 
 def simple_predictive_sample(M_c, X_L, X_D, Y, Q, get_next_seed, n=1):
@@ -330,6 +450,174 @@ def simple_predictive_sample_multistate(
     return x
 
 
+def simple_predictive_sample_batch(M_c, X_L, X_D, Y, Q, get_next_seed, n=1):
+    """Draw n samples of the cells in Q, as simple_predictive_sample does,
+    but in bulk.
+
+    The cluster of every sample is drawn per view in one call, and then the
+    values of each column are drawn per cluster in one call, from the
+    cluster's posterior predictive: Student's t for continuous columns,
+    Dirichlet-categorical for multinomial columns, and a von Mises whose mean
+    is itself drawn from the posterior for cyclic columns.
+
+    All draws come from one RandomState seeded by get_next_seed, so the
+    samples are reproducible from the seed, though they differ from those of
+    simple_predictive_sample.
+
+    :returns: array of shape (n, len(Q)) -- row i is the i-th sample
+    """
+    num_rows = len(X_D[0])
+    num_cols = len(M_c['column_metadata'])
+    query_row = Q[0][0]
+    query_columns = [query[1] for query in Q]
+    # Enforce query rows all same row.
+    assert all([query[0]==query_row for query in Q])
+    # Enforce query columns observed column.
+    assert all([query_column<num_cols for query_column in query_columns])
+    is_observed_row = query_row < num_rows
+    if Y is None:
+        Y = []
+    row_constraints = dict(
+        (col, val) for row, col, val in Y if row == query_row)
+    if is_observed_row:
+        # See simple_predictive_sample_observed.
+        assert not set(c for c in query_columns if c in row_constraints), \
+            'Query for constrained column in observed row makes no sense!'
+    random_state = numpy.random.RandomState(get_next_seed())
+
+    samples = numpy.zeros((n, len(query_columns)))
+    view_cluster_draws = dict()
+    for j, query_column in enumerate(query_columns):
+        # Give the specified value for a constrained column of a
+        # hypothetical row, as simple_predictive_sample_unobserved does.
+        if query_column in row_constraints:
+            samples[:, j] = row_constraints[query_column]
+            continue
+        view_idx = X_L['column_partition']['assignments'][query_column]
+        if view_idx not in view_cluster_draws:
+            if is_observed_row:
+                draws = numpy.repeat(X_D[view_idx][query_row], n)
+            else:
+                cluster_logps = determine_cluster_logps(
+                    M_c, X_L, X_D, Y, query_row, view_idx)
+                probs = numpy.exp(cluster_logps)
+                probs /= sum(probs)
+                draws = random_state.choice(len(probs), size=n, p=probs)
+            view_cluster_draws[view_idx] = draws
+        cluster_draws = view_cluster_draws[view_idx]
+        draw_constraints = get_draw_constraints(
+            X_L, X_D, Y, query_row, query_column)
+        column_suffstats = get_view_column_suffstats(
+            M_c, X_L, view_idx, query_column)
+        for cluster_idx in numpy.unique(cluster_draws):
+            which_samples = numpy.flatnonzero(cluster_draws == cluster_idx)
+            if cluster_idx < len(column_suffstats):
+                suffstats = column_suffstats[cluster_idx]
+            else:
+                # Drew a new cluster.
+                suffstats = {b'N': 0}
+            samples[which_samples, j] = draw_predictive_batch(
+                M_c['column_metadata'][query_column]['modeltype'],
+                X_L['column_hypers'][query_column], suffstats,
+                draw_constraints, len(which_samples), random_state)
+
+    return samples
+
+
+def simple_predictive_sample_batch_multistate(
+        M_c, X_L_list, X_D_list, Y, Q, get_next_seed, n=1):
+    """Split n among the states as simple_predictive_sample_multistate does,
+    and stack the samples of each state."""
+    num_states = len(X_L_list)
+    assert num_states==len(X_D_list)
+    n_from_each = n / num_states
+    n_sampled = n % num_states
+
+    random_state = numpy.random.RandomState(get_next_seed())
+    which_sampled = random_state.permutation(range(num_states))[:n_sampled]
+    which_sampled = set(which_sampled)
+
+    x = []
+    for state_idx, (X_L, X_D) in enumerate(zip(X_L_list, X_D_list)):
+        this_n = n_from_each
+        if state_idx in which_sampled:
+            this_n += 1
+        x.append(simple_predictive_sample_batch(
+            M_c, X_L, X_D, Y, Q, get_next_seed, this_n))
+
+    return numpy.vstack(x)
+
+
+def get_view_column_suffstats(M_c, X_L, view_idx, column):
+    """Returns the suffstats of column in each cluster of view view_idx."""
+    view_state_i = X_L['view_state'][view_idx]
+    global_column_indices = names_to_global_indices(
+        view_state_i['column_names'], M_c)
+    local_column_idx = global_column_indices.index(column)
+    return view_state_i['column_component_suffstats'][local_column_idx]
+
+
+def draw_predictive_batch(
+        modeltype, column_hypers, suffstats, constraints, n, random_state):
+    """Draw n values from the posterior predictive of one component model.
+
+    The posterior is updated with constraints as get_draw_constrained
+    updates it.
+    """
+    count = suffstats.get(b'N', 0)
+    if modeltype == 'normal_inverse_gamma':
+        sum_x = suffstats.get(b'sum_x', 0.)
+        sum_x_squared = suffstats.get(b'sum_x_squared', 0.)
+        for constraint in constraints:
+            count += 1
+            sum_x += constraint
+            sum_x_squared += constraint * constraint
+        r = column_hypers[b'r']
+        nu = column_hypers[b'nu']
+        s = column_hypers[b's']
+        mu = column_hypers[b'mu']
+        # numerics::update_continuous_hypers
+        r_prime = r + count
+        nu_prime = nu + count
+        mu_prime = ((r * mu) + sum_x) / r_prime
+        s_prime = s + sum_x_squared + (r * mu * mu) \
+            - (r_prime * mu_prime * mu_prime)
+        coeff = numpy.sqrt((s_prime * (r_prime + 1)) / (nu_prime * r_prime))
+        return random_state.standard_t(nu_prime, size=n) * coeff + mu_prime
+    elif modeltype == 'symmetric_dirichlet_discrete':
+        K = int(column_hypers[b'K'])
+        dirichlet_alpha = column_hypers[b'dirichlet_alpha']
+        counts = numpy.zeros(K)
+        for key, value in six.iteritems(suffstats):
+            if key != b'N':
+                counts[int(key)] += value
+        for constraint in constraints:
+            counts[int(constraint)] += 1
+        probs = counts + dirichlet_alpha
+        probs /= probs.sum()
+        return random_state.choice(K, size=n, p=probs).astype(float)
+    elif modeltype == 'vonmises':
+        sum_sin_x = suffstats.get(b'sum_sin_x', 0.)
+        sum_cos_x = suffstats.get(b'sum_cos_x', 0.)
+        for constraint in constraints:
+            sum_sin_x += numpy.sin(constraint)
+            sum_cos_x += numpy.cos(constraint)
+        kappa = column_hypers[b'kappa']
+        a = column_hypers[b'a']
+        b = column_hypers[b'b']
+        # numerics::update_cyclic_hypers
+        p_cos = kappa * sum_cos_x + a * numpy.cos(b)
+        p_sin = kappa * sum_sin_x + a * numpy.sin(b)
+        a_prime = numpy.sqrt(p_cos * p_cos + p_sin * p_sin)
+        b_prime = -numpy.arctan2(p_cos, p_sin) + numpy.pi / 2.
+        # Draw the mean from its posterior, then the value given the mean.
+        means = random_state.vonmises(b_prime, a_prime, size=n)
+        draws = random_state.vonmises(means, kappa)
+        return numpy.mod(draws, 2 * numpy.pi)
+    else:
+        raise ValueError('unknown modeltype: %r' % (modeltype,))
+
+
 def simple_predictive_sample_observed(
         M_c, X_L, X_D, Y, which_row, which_columns, get_next_seed, n=1):
     # Reject attempts to query columns on which we are conditioned for
@@ -618,28 +906,98 @@ def sample_from_cluster(cluster_model, random_state):
     return sample
 
 
-# LRU replacement, size 1
-__cache = (-1, None)
-def _cache_for(M_c):
-    global __cache
-    (cur_id, cur_cache) = __cache
-    if cur_id == id(M_c):
-        return cur_cache
-    else:
-        ans = {}
-        __cache = (id(M_c), ans)
-        return ans
+class ClusterModelCache(object):
+    """A least-recently-used cache of cluster models.
+
+    Entries are grouped by state and keyed by the identity of X_L and M_c,
+    so a lookup costs a dict access no matter how large the state is.
+    Each group holds a reference to its X_L and M_c, which keeps their
+    ids from being reused while they are cached.  A state mutated in place
+    must be invalidated; copies of a state do not share entries.
+
+    The cache holds at most max_bytes, by an estimate of the size of each
+    state it keeps alive and of each of its cluster models, evicting the
+    least recently used states first.  hits, misses and evictions count
+    what the cache has done.
+
+    Cluster models are shared between callers and must not be mutated.
+    """
+
+    # Rough sizes of a component model, and of the hypers and suffstats
+    # of one column in one cluster of a cached state, for the byte budget.
+    component_model_bytes = 512
+    suffstats_bytes = 256
+
+    def __init__(self, max_bytes=64 * 2**20):
+        self.max_bytes = max_bytes
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._states = collections.OrderedDict()
+
+    def __len__(self):
+        return sum(len(state[2]) for state in six.itervalues(self._states))
+
+    def get(self, M_c, X_L, view_idx, cluster_idx):
+        """Return the cluster model of cluster_idx in view view_idx of X_L,
+        building it if it is not cached."""
+        key = (id(X_L), id(M_c))
+        state = self._states.pop(key, None)
+        if state is None:
+            state = [X_L, M_c, dict(), self._estimate_state_bytes(X_L)]
+            self.num_bytes += state[3]
+        # Reinsert, to mark as most recently used.
+        self._states[key] = state
+        cluster_models = state[2]
+        cluster_model = cluster_models.get((view_idx, cluster_idx))
+        if cluster_model is not None:
+            self.hits += 1
+            return cluster_model
+        self.misses += 1
+        cluster_model = do_create_cluster_model_from_X_L(
+            M_c, X_L, view_idx, cluster_idx)
+        cluster_models[(view_idx, cluster_idx)] = cluster_model
+        num_bytes = self.component_model_bytes * len(cluster_model)
+        state[3] += num_bytes
+        self.num_bytes += num_bytes
+        self._evict(self.max_bytes)
+        return cluster_model
+
+    def invalidate(self, M_c, X_L):
+        """Drop the cluster models of the state(s) X_L.
+
+        Call this after mutating X_L in place, or to free the entries of a
+        superseded state before they would be evicted.
+        """
+        X_L_list = X_L if isinstance(X_L, (list, tuple)) else [X_L]
+        for X_L_i in X_L_list:
+            state = self._states.pop((id(X_L_i), id(M_c)), None)
+            if state is not None:
+                self.num_bytes -= state[3]
+
+    def clear(self):
+        self._evict(0)
+
+    def _evict(self, max_bytes):
+        while max_bytes < self.num_bytes:
+            _key, state = self._states.popitem(last=False)
+            self.num_bytes -= state[3]
+            self.evictions += 1
+
+    def _estimate_state_bytes(self, X_L):
+        num_suffstats = 0
+        for view_state_i in X_L['view_state']:
+            num_clusters = len(view_state_i['row_partition_model']['counts'])
+            num_suffstats += num_clusters * len(view_state_i['column_names'])
+        return self.suffstats_bytes * num_suffstats
+
+
+cluster_model_cache = ClusterModelCache()
 
 
 def create_cluster_model_from_X_L(M_c, X_L, view_idx, cluster_idx):
-    cache = _cache_for(M_c)
-    key = ('cluster_model', id(X_L), view_idx, cluster_idx)
-    if key in cache:
-        return cache[key]
-    else:
-        ans = do_create_cluster_model_from_X_L(M_c, X_L, view_idx, cluster_idx)
-        cache[key] = ans
-        return ans
+    return cluster_model_cache.get(M_c, X_L, view_idx, cluster_idx)
 
 
 def do_create_cluster_model_from_X_L(M_c, X_L, view_idx, cluster_idx):
@@ -928,6 +1286,133 @@ def impute_and_confidence(M_c, X_L, X_D, Y, Q, n, get_next_seed):
     return imputed, imputation_confidence
 
 
+# The number of evenly spaced points, besides the samples themselves, at
+# which the pooled predictive density of a continuous cell is evaluated to
+# find its modes.
+N_MODE_GRID = 256
+
+
+def get_largest_mode_fraction(samples, points, density):
+    """Return the fraction of samples in the largest mode of a density.
+
+    The density is given, up to a constant, at sorted points, and is split
+    into modes at its local minima.
+    """
+    interior = density[1:-1]
+    is_minimum = (density[:-2] > interior) & (interior <= density[2:])
+    boundaries = points[numpy.flatnonzero(is_minimum) + 1]
+    mode_counts = numpy.bincount(numpy.searchsorted(boundaries, samples))
+    return mode_counts.max() / float(len(samples))
+
+
+def impute_batch(M_c, X_L, X_D, Y, Q, n, get_next_seed):
+    """Impute many cells at once, as impute does each cell.
+
+    The cells are grouped by row, and the n samples of all the cells of a
+    row are drawn together by simple_predictive_sample_batch_multistate.
+
+    :returns: array -- the imputed value of each cell in Q
+    """
+    imputed, _confidence = _impute_batch(
+        M_c, X_L, X_D, Y, Q, n, get_next_seed, False)
+    return imputed
+
+
+def impute_and_confidence_batch(M_c, X_L, X_D, Y, Q, n, get_next_seed):
+    """Impute many cells at once, with the confidence of each.
+
+    The confidence of a multinomial cell is, as in impute_and_confidence,
+    the fraction of samples equal to the imputed value.  The confidence of
+    a continuous cell is the mass of the largest mode of its predictive
+    distribution, pooled over states, which continuous_imputation_confidence
+    approximates by running a DPMM on the samples: the fraction of samples
+    in that mode.  See get_largest_mode_fraction.
+
+    :returns: imputed, confidence -- arrays, one value per cell in Q
+    """
+    return _impute_batch(M_c, X_L, X_D, Y, Q, n, get_next_seed, True)
+
+
+def _impute_batch(M_c, X_L, X_D, Y, Q, n, get_next_seed, return_confidence):
+    X_L_list, X_D_list, _was_multistate = ensure_multistate(X_L, X_D)
+    num_rows = len(X_D_list[0][0])
+    if Y is None:
+        Y = []
+    for row, col in Q:
+        modeltype = M_c['column_metadata'][col]['modeltype']
+        assert modeltype in modeltype_to_imputation_function
+    random_state = numpy.random.RandomState(get_next_seed())
+
+    row_query_idxs = collections.OrderedDict()
+    for query_idx, (row, col) in enumerate(Q):
+        row_query_idxs.setdefault(row, []).append(query_idx)
+
+    imputed = numpy.zeros(len(Q))
+    confidence = numpy.zeros(len(Q))
+    for row, query_idxs in six.iteritems(row_query_idxs):
+        Q_row = [(row, Q[query_idx][1]) for query_idx in query_idxs]
+        samples = simple_predictive_sample_batch_multistate(
+            M_c, X_L_list, X_D_list, Y, Q_row, get_next_seed, n)
+        # The cluster logps of the row in each view, in each state.
+        view_cluster_logps = dict()
+        for j, query_idx in enumerate(query_idxs):
+            col = Q[query_idx][1]
+            modeltype = M_c['column_metadata'][col]['modeltype']
+            samples_j = samples[:, j]
+            if modeltype == 'symmetric_dirichlet_discrete':
+                counts = numpy.bincount(samples_j.astype(int))
+                # If there is a tie, draw randomly, as
+                # multinomial_imputation does.
+                modes = numpy.flatnonzero(counts == counts.max())
+                imputed[query_idx] = modes[random_state.randint(len(modes))]
+                confidence[query_idx] = counts.max() / float(len(samples_j))
+                continue
+            imputed[query_idx] = numpy.median(samples_j)
+            if not return_confidence:
+                continue
+            lo, hi = samples_j.min(), samples_j.max()
+            if lo == hi:
+                # All the mass is at one point, e.g. a constrained cell.
+                confidence[query_idx] = 1.0
+                continue
+            # The samples put points where the mass is, and the grid
+            # between them, so that no valley goes unseen.
+            points = numpy.union1d(
+                samples_j, numpy.linspace(lo, hi, N_MODE_GRID))
+            # The predictive logps at the points of every cluster of every
+            # state, weighted so that their logsumexp is the pooled mixture.
+            component_logps = []
+            for state_idx, (X_L_i, X_D_i) in enumerate(
+                    zip(X_L_list, X_D_list)):
+                view_idx = X_L_i['column_partition']['assignments'][col]
+                key = (state_idx, view_idx)
+                if key not in view_cluster_logps:
+                    if row < num_rows:
+                        # An observed row is in one cluster.
+                        cluster_logps = {X_D_i[view_idx][row]: 0.0}
+                    else:
+                        cluster_logps = dict(enumerate(determine_cluster_logps(
+                            M_c, X_L_i, X_D_i, Y, row, view_idx)))
+                    view_cluster_logps[key] = cluster_logps
+                draw_constraints = get_draw_constraints(
+                    X_L_i, X_D_i, Y, row, col)
+                for cluster_idx, cluster_logp in six.iteritems(
+                        view_cluster_logps[key]):
+                    component_model = create_cluster_model_from_X_L(
+                        M_c, X_L_i, view_idx, cluster_idx)[col]
+                    logps = component_model \
+                        .calc_element_predictive_logps_constrained(
+                            points, draw_constraints)
+                    component_logps.append(cluster_logp + logps)
+            component_logps = numpy.array(component_logps)
+            density = numpy.exp(
+                component_logps - component_logps.max()).sum(axis=0)
+            confidence[query_idx] = get_largest_mode_fraction(
+                samples_j, points, density)
+
+    return imputed, confidence
+
+
 def determine_replicating_samples_params(X_L, X_D):
     view_assignments_array = X_L['column_partition']['assignments']
     view_assignments_array = numpy.array(view_assignments_array)
@@ -968,9 +1453,7 @@ def ensure_multistate(X_L_list, X_D_list):
     was_multistate = get_is_multistate(X_L_list, X_D_list)
     if not was_multistate:
         X_L_list, X_D_list = [X_L_list], [X_D_list]
-    # NOTE: We must do deepcopy or changes made to X_L (but, curiously,
-    # not X_D)  hereafter shall be present in the original variables in
-    # the original scope.
-    # FIXME: The culprits are likely sparsify_X_L and desparsify_X_L in
-    # State.pyx
-    return copy.deepcopy(X_L_list), copy.deepcopy(X_D_list), was_multistate
+    # NOTE: The states themselves are not copied: nothing downstream
+    # mutates them (State.p_State desparsifies a copy of X_L).  The lists
+    # are, as callers may replace their elements.
+    return list(X_L_list), list(X_D_list), was_multistate
@@ -0,0 +1,99 @@
+#
+#   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+#
+#   Lead Developers: Dan Lovell and Jay Baxter
+#   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+#   Research Leads: Vikash Mansinghka, Patrick Shafto
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import os
+import tempfile
+
+import numpy
+
+
+class SharedTable(object):
+    """A data table in a memory-mapped file, shared between processes.
+
+    A SharedTable pickles to the name of its file and its shape, so sending
+    one to the processes of a MultiprocessingEngine costs nothing, however
+    large the table: each process maps the same file, rather than unpickling
+    its own copy of T.
+
+    Create one with create, and pass it as T wherever the engines take T,
+    except to insert, which extends T.  The file lasts until unlink is
+    called, or the with block it is used in exits.
+    """
+
+    def __init__(self, filename, shape):
+        self.filename = filename
+        self.shape = tuple(shape)
+        self._array = None
+        return
+
+    @classmethod
+    def create(cls, T, dir=None):
+        """Copy T to a new memory-mapped file, in dir if given, else in
+        shared memory if there is a /dev/shm, else in the temp directory."""
+        T = numpy.asarray(T, dtype=numpy.float64)
+        if T.ndim != 2:
+            raise ValueError('T must be a table, not %d-dimensional' % T.ndim)
+        if dir is None and os.path.isdir('/dev/shm'):
+            dir = '/dev/shm'
+        fd, filename = tempfile.mkstemp(prefix='crosscat-T-', dir=dir)
+        os.close(fd)
+        array = numpy.memmap(
+            filename, dtype=numpy.float64, mode='w+', shape=T.shape)
+        array[:] = T
+        array.flush()
+        del array
+        return cls(filename, T.shape)
+
+    def attach(self):
+        """Return the table, as a read-only array mapping the file."""
+        if self._array is None:
+            self._array = numpy.memmap(
+                self.filename, dtype=numpy.float64, mode='r',
+                shape=self.shape)
+        return self._array
+
+    def unlink(self):
+        """Remove the file.  Processes already attached keep their map."""
+        self._array = None
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+        return
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getstate__(self):
+        return {'filename': self.filename, 'shape': self.shape}
+
+    def __setstate__(self, state):
+        self.__init__(state['filename'], state['shape'])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.unlink()
+
+
+def get_table(T):
+    """Return T as p_State takes it: attached, if it is a SharedTable."""
+    if isinstance(T, SharedTable):
+        return T.attach()
+    return T
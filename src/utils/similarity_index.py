@@ -0,0 +1,174 @@
+#
+#   Copyright (c) 2010-2016, MIT Probabilistic Computing Project
+#
+#   Lead Developers: Dan Lovell and Jay Baxter
+#   Authors: Dan Lovell, Baxter Eaves, Jay Baxter, Vikash Mansinghka
+#   Research Leads: Vikash Mansinghka, Patrick Shafto
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import numpy
+
+import crosscat.utils.sample_utils as su
+
+
+class RowSimilarityIndex(object):
+    """Answer row similarity queries from inverted lists of the latent states.
+
+    For each state and each view, the index keeps the ids of the rows in
+    each cluster.  The rows similar to a row are those sharing at least one
+    of its clusters, so a query touches only them, rather than every row as
+    a loop over su.similarity does.
+
+    Similarities are as defined by su.similarity: the fraction of states
+    and target columns in which two rows are in the same category.
+    """
+
+    def __init__(self, M_c, X_L_list, X_D_list):
+        """Build the index of the states X_L_list, X_D_list."""
+        self.M_c = M_c
+        self._chains = []
+        self.num_rows = 0
+        self.update(X_L_list, X_D_list)
+        return
+
+    def update(self, X_L_list, X_D_list):
+        """Bring the index up to date with the states X_L_list, X_D_list.
+
+        Views whose rows kept their clusters, as after LocalEngine.insert,
+        only have the new rows added to their inverted lists.  Other views
+        are rebuilt.
+        """
+        assert len(X_L_list) == len(X_D_list)
+        num_rows = len(X_D_list[0][0])
+        if len(X_L_list) != len(self._chains) or num_rows < self.num_rows:
+            self._chains = [None] * len(X_L_list)
+        chains = []
+        for chain, X_L, X_D in zip(self._chains, X_L_list, X_D_list):
+            assignments = numpy.asarray(
+                X_L['column_partition']['assignments'], dtype=int)
+            views = []
+            for view_idx, X_D_v in enumerate(X_D):
+                X_D_v = numpy.asarray(X_D_v, dtype=int)
+                view = None
+                if chain is not None and view_idx < len(chain['views']) \
+                        and numpy.array_equal(
+                            chain['assignments'] == view_idx,
+                            assignments == view_idx):
+                    view = _update_view(
+                        chain['views'][view_idx], X_D_v, self.num_rows)
+                if view is None:
+                    view = _build_view(X_D_v)
+                views.append(view)
+            chains.append({'assignments': assignments, 'views': views})
+        self._chains = chains
+        self.num_rows = num_rows
+        return self
+
+    def similarities(self, row_id, target_columns=None):
+        """Return the rows similar to row_id, and their similarities.
+
+        Rows not returned have similarity 0.
+
+        :returns: row_ids, similarities -- arrays, in order of row id
+        """
+        col_idxs = su.get_similarity_columns(self.M_c, target_columns)
+        members = []
+        weights = []
+        for chain in self._chains:
+            view_num_cols = numpy.bincount(
+                chain['assignments'][col_idxs],
+                minlength=len(chain['views']))
+            for view_idx in numpy.flatnonzero(view_num_cols):
+                view = chain['views'][view_idx]
+                cluster_rows = view['clusters'][view['labels'][row_id]]
+                members.append(cluster_rows)
+                weights.append(
+                    numpy.repeat(view_num_cols[view_idx], len(cluster_rows)))
+        row_ids, inverse = numpy.unique(
+            numpy.concatenate(members), return_inverse=True)
+        counts = numpy.bincount(inverse, weights=numpy.concatenate(weights))
+        return row_ids, counts / (len(self._chains) * len(col_idxs))
+
+    def top_k_similar(self, row_id, k, target_columns=None):
+        """Return the k rows most similar to row_id, other than itself.
+
+        Ties are broken by row id.
+
+        :returns: list of (row_id, similarity) tuples, most similar first
+        """
+        row_ids, similarities = self.similarities(row_id, target_columns)
+        other = row_ids != row_id
+        row_ids, similarities = row_ids[other], similarities[other]
+        # Stable, so equal similarities stay in order of row id.
+        order = numpy.argsort(-similarities, kind='mergesort')[:k]
+        return [(int(row_ids[i]), float(similarities[i])) for i in order]
+
+    def to_dict(self):
+        """Return the index as plain lists and dicts, to store alongside
+        X_L and X_D.  See from_dict."""
+        return {
+            'num_rows': self.num_rows,
+            'chains': [
+                {
+                    'assignments': chain['assignments'].tolist(),
+                    'labels': [view['labels'].tolist()
+                        for view in chain['views']],
+                }
+                for chain in self._chains
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, M_c, index_dict):
+        """Rebuild an index saved by to_dict."""
+        index = cls.__new__(cls)
+        index.M_c = M_c
+        index.num_rows = index_dict['num_rows']
+        index._chains = [
+            {
+                'assignments': numpy.asarray(chain['assignments'], dtype=int),
+                'views': [_build_view(numpy.asarray(labels, dtype=int))
+                    for labels in chain['labels']],
+            }
+            for chain in index_dict['chains']
+        ]
+        return index
+
+
+def _build_view(labels):
+    # Stable, so the rows of each cluster are in order of row id.
+    order = numpy.argsort(labels, kind='mergesort')
+    offsets = numpy.cumsum(numpy.bincount(labels))
+    return {'labels': labels, 'clusters': numpy.split(order, offsets[:-1])}
+
+
+def _update_view(view, labels, num_rows):
+    # Add rows num_rows onward to the view, if the rows before kept their
+    # clusters; else return None.
+    if not numpy.array_equal(view['labels'], labels[:num_rows]):
+        return None
+    clusters = list(view['clusters'])
+    new_labels = labels[num_rows:]
+    for cluster_idx in numpy.unique(new_labels):
+        new_rows = num_rows + numpy.flatnonzero(new_labels == cluster_idx)
+        if cluster_idx < len(clusters):
+            clusters[cluster_idx] = numpy.concatenate(
+                [clusters[cluster_idx], new_rows])
+        else:
+            # A new cluster: the labels of a view are contiguous.
+            clusters.extend([numpy.zeros(0, dtype=int)]
+                * (cluster_idx + 1 - len(clusters)))
+            clusters[cluster_idx] = new_rows
+    return {'labels': labels, 'clusters': clusters}